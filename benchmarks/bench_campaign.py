@@ -0,0 +1,85 @@
+"""
+Per-hit cost of the "__utmz" campaign cookie: building it the original way
+from all campaign fields, compared to splicing the visit and response
+counts around the data cached by Campaign.get_utmz_data(), and pageviews of
+campaign-tagged traffic built per second with and without that cache.
+
+    python benchmarks/bench_campaign.py --hits 20000
+"""
+
+import argparse
+
+import common
+
+from analytics.Campaign import Campaign
+from analytics.Config import Config
+from analytics.Page import Page
+from analytics.Session import Session
+from analytics.Tracker import Tracker
+from analytics.Visitor import Visitor
+from analytics.internals import utils
+
+
+class UncachedCampaign(Campaign):
+
+    def get_utmz_data(self):
+        self._utmz = None
+        return Campaign.get_utmz_data(self)
+
+
+def make_campaign(campaign_class):
+    campaign = campaign_class(Campaign.TYPE_REFERRAL)
+    campaign.source = 'newsletter.example.com'
+    campaign.name = 'Spring Sale 2024'
+    campaign.medium = 'email'
+    campaign.term = 'running shoes+socks'
+    campaign.content = '/issues/42/header banner'
+    return campaign
+
+
+def original_utmz(domain_hash, campaign, visitor):
+    # Request.buildCampaignParameters() before the cache
+    utmz  = '%s.' % domain_hash
+    utmz += '%d.' % utils.totimestamp(campaign.getCreationTime())
+    utmz += '%s.' % visitor.visit_count
+    utmz += '%s.' % campaign.getResponselen()
+    for key, attribute in Campaign.UTMZ_KEYS:
+        value = getattr(campaign, attribute)
+        if value:
+            utmz += key + '=' + utils.replace_all(value, {'+': '%20', ' ': '%20'}) + Campaign.UTMZ_DELIMITER
+    return utmz.rstrip(Campaign.UTMZ_DELIMITER)
+
+
+def cached_utmz(domain_hash, campaign, visitor):
+    timestamp, data = campaign.get_utmz_data()
+    return '%s.%d.%s.%s.%s' % (domain_hash, timestamp, visitor.visit_count, campaign.getResponselen(), data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hits', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    campaign = make_campaign(Campaign)
+    visitor = Visitor()
+    domain_hash = utils.generate_hash('www.example.com')
+    assert original_utmz(domain_hash, campaign, visitor) == cached_utmz(domain_hash, campaign, visitor)
+
+    for name, build in (('__utmz, original', original_utmz), ('__utmz, cached', cached_utmz)):
+        seconds = common.best_of(lambda: [build(domain_hash, campaign, visitor) for i in range(args.hits)],
+                                 args.repeat)
+        common.report(name, args.hits, seconds, 'hit')
+
+    config = Config({'EndPointHost': None, 'SessionHitLimit': None})
+    session = Session()
+    hits = [(Tracker.HIT_PAGEVIEW, Page('/landing'), session, visitor)] * args.hits
+    for name, campaign_class in (('Pageviews, uncached', UncachedCampaign), ('Pageviews, cached', Campaign)):
+        tracker = Tracker('UA-1234567-8', 'www.example.com', config)
+        tracker.campaign = make_campaign(campaign_class)
+        seconds = common.best_of(lambda: tracker.track_many(hits, common.build_only), args.repeat)
+        common.report(name, args.hits, seconds, 'hit')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Hits per second sent synchronously against a StubCollector on localhost,
+over pooled keep-alive connections and with a new connection per hit
+(Config.useConnectionPool disabled).
+
+    python benchmarks/bench_connection_pool.py --hits 2000 [--latency 0.001]
+"""
+
+import argparse
+
+import common
+
+from analytics.Config import Config
+from analytics.Page import Page
+from analytics.Session import Session
+from analytics.Tracker import Tracker
+from analytics.Visitor import Visitor
+
+from StubCollector import StubCollector
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hits', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0, help='Seconds the collector delays every response by')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with StubCollector(latency=args.latency, max_recorded=0) as collector:
+        for pooled in (False, True):
+            tracker = Tracker('UA-1234567-8', 'www.example.com', Config({
+                'EndPointHost': collector.endpoint_host,
+                'UseConnectionPool': pooled,
+                'SessionHitLimit': None,
+            }))
+            session = Session()
+            visitor = Visitor()
+
+            def track():
+                for i in range(args.hits):
+                    tracker.track_pageview(Page('/page'), session, visitor)
+
+            seconds = common.best_of(track, args.repeat)
+            common.report('Connection pool' if pooled else 'New connection per hit', args.hits, seconds, 'hit')
+
+        print('Collector: %(requests)d requests, %(errors)d errors' % collector.stats())
+
+
+if __name__ == '__main__':
+    main()
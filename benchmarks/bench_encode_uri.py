@@ -0,0 +1,67 @@
+"""
+Values and query strings encoded per second by the table-driven
+utils.encode_uri_component() and utils.build_query_string(), compared to
+urllib's quote() and urlencode() followed by the five replace() passes of
+utils.convert_to_uri_component_encoding(), which they replaced.
+
+    python benchmarks/bench_encode_uri.py --count 100000
+"""
+
+import argparse
+
+import common
+
+from analytics.internals import utils
+from analytics.internals.compat import PY2, to_bytes
+
+if PY2:
+    from urllib import quote, urlencode
+else:
+    from urllib.parse import quote, urlencode
+
+
+# Typical parameter values of a pageview, from short ASCII to escaped UTF-8
+VALUES = [
+    '/shop/category/item-1234.html',
+    'Product (Special Edition) - 50% off!',
+    u'M\u00fcnchen \u2013 Stra\u00dfe & Caf\u00e9',
+    '5(category*action*label)(3)',
+    '__utma=1.2.3.4.5.6;+__utmz=1.2.3.4.utmcsr=(direct)|utmccn=(direct)|utmcmd=(none);',
+]
+
+PARAMETERS = [
+    ('utmt', 'event'), ('utmn', '1234567890'), ('utmp', VALUES[0]), ('utmdt', VALUES[1]),
+    ('utme', VALUES[3]), ('utmcs', 'UTF-8'), ('utmul', 'de-de'), ('utmcc', VALUES[4]),
+]
+
+
+def old_encode_uri_component(value):
+    return utils.convert_to_uri_component_encoding(quote(to_bytes(value)))
+
+
+def old_build_query_string(parameters):
+    return utils.convert_to_uri_component_encoding(urlencode(parameters))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    values = (VALUES * (args.count // len(VALUES) + 1))[:args.count]
+
+    for name, encode in (('quote() + replace passes', old_encode_uri_component),
+                         ('encode_uri_component()', utils.encode_uri_component)):
+        seconds = common.best_of(lambda: [encode(value) for value in values], args.repeat)
+        common.report(name, args.count, seconds, 'value')
+
+    count = args.count // len(PARAMETERS)
+    for name, build in (('urlencode() + replace passes', old_build_query_string),
+                        ('build_query_string()', utils.build_query_string)):
+        seconds = common.best_of(lambda: [build(PARAMETERS) for i in range(count)], args.repeat)
+        common.report(name, count, seconds, 'query string')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Strings hashed per second by utils.generate_hash() one at a time, and by
+utils.generate_hash_many() with NumPy and with its pure Python fallback.
+
+    python benchmarks/bench_generate_hash.py --count 1000000
+"""
+
+import argparse
+import random
+
+import common
+
+from analytics.internals import utils
+
+
+def make_strings(count, seed=0):
+    # Shaped like the user agent and visitor ID strings hashed by Visitor
+    rnd = random.Random(seed)
+    agents = ['Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/%d.0',
+              'Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) Version/%d.0 Mobile/15E148 Safari/604.1',
+              '%d.example.com']
+    return ['%s|%d' % (rnd.choice(agents) % rnd.randint(1, 120), rnd.getrandbits(31)) for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    strings = make_strings(args.count)
+
+    def scalar():
+        utils.GENERATE_HASH_CACHE.clear()
+        return [utils.generate_hash(string) for string in strings]
+
+    expected = scalar()
+    common.report('generate_hash()', args.count, common.best_of(scalar, args.repeat), 'string')
+
+    numpy = utils.numpy
+    try:
+        utils.numpy = None
+        common.report('generate_hash_many(), fallback', args.count,
+                      common.best_of(lambda: utils.generate_hash_many(strings), args.repeat), 'string')
+    finally:
+        utils.numpy = numpy
+
+    if numpy is None:
+        print('NumPy is not installed, skipping the vectorized path')
+        return
+
+    assert utils.generate_hash_many(strings) == expected
+    common.report('generate_hash_many(), NumPy', args.count,
+                  common.best_of(lambda: utils.generate_hash_many(strings), args.repeat), 'string')
+
+
+if __name__ == '__main__':
+    main()
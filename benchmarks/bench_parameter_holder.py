@@ -0,0 +1,110 @@
+"""
+Cost of the per-hit parameter container: filling a ParameterHolder with the
+parameters of a typical pageview and serializing it with items(), compared
+to the AttrDict (a dict with attribute access) it replaced. On Python 3 the
+memory allocated per hit is measured with tracemalloc as well.
+
+    python benchmarks/bench_parameter_holder.py --count 100000
+"""
+
+import argparse
+
+import common
+
+from analytics.internals.ParameterHolder import ParameterHolder
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2
+    tracemalloc = None
+
+
+class AttrDictHolder(dict):
+    """
+    The AttrDict based ParameterHolder, minus its shared mutable default.
+    """
+
+    defaults = {'utmcs': '-', 'utmr': '-', 'utmfl': '-', 'utmje': '-'}
+
+    def __init__(self):
+        dict.__init__(self, self.defaults)
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+def fill(p):
+    # What Request.build_parameters() sets for a pageview
+    p.utmt = None
+    p.utmn = 1234567890
+    p.utms = 3
+    p.utmhid = 987654321
+    p.utmip = '203.0.113.0'
+    p.utmcs = 'UTF-8'
+    p.utmsr = '1920x1080'
+    p.utmsc = '24-bit'
+    p.utmul = 'de-de'
+    p.utmje = '1'
+    p.utmdt = 'Product Page'
+    p.utmp = '/shop/item-1234.html'
+    p.utmr = 'http://www.example.com/'
+    p._utma = '1123.1234567890.1234567890.1234567890.1234567890.1'
+    p._utmb = '1123.3.10.1234567890'
+    p._utmc = '1123'
+    p._utmz = '1123.1234567890.1.1.utmcsr=(direct)|utmccn=(direct)|utmcmd=(none)'
+    return p
+
+
+def build(holder_class):
+    return [(name, value) for name, value in fill(holder_class()).items() if value is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    holders = (('AttrDict', AttrDictHolder), ('ParameterHolder', ParameterHolder))
+
+    for name, holder_class in holders:
+        seconds = common.best_of(lambda: [build(holder_class) for i in range(args.count)], args.repeat)
+        common.report('%s, fill and items()' % name, args.count, seconds, 'hit')
+
+        holder = fill(holder_class())
+        # list(), as the items() of a dict is a view on Python 3
+        seconds = common.best_of(lambda: [list(holder.items()) for i in range(args.count)], args.repeat)
+        common.report('%s, items() only' % name, args.count, seconds, 'hit')
+
+    if tracemalloc is None:
+        print('tracemalloc needs Python 3, skipping the memory comparison')
+        return
+
+    for name, holder_class in holders:
+        tracemalloc.start()
+        holders_alive = [fill(holder_class()) for i in range(1000)]
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print('%-40s %8.0f bytes per live holder' % (name, current / 1000.0))
+
+        del holders_alive
+
+        # Warmed up, so only the allocations of the hit itself are traced
+        build(holder_class)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        build(holder_class)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print('%-40s %8d bytes peak per hit' % (name, peak - before))
+
+
+if __name__ == '__main__':
+    main()
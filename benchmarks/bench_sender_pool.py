@@ -0,0 +1,61 @@
+"""
+Hits per second sent by SenderPool with a growing amount of worker
+processes, against a StubCollector on localhost, compared to a single
+process tracking the same hits with Tracker.track_many().
+
+    python benchmarks/bench_sender_pool.py --hits 20000
+"""
+
+import argparse
+import multiprocessing
+
+import common
+
+from analytics.Config import Config
+from analytics.Page import Page
+from analytics.SenderPool import SenderPool
+from analytics.Session import Session
+from analytics.Tracker import Tracker
+from analytics.Visitor import Visitor
+
+from StubCollector import StubCollector
+
+
+def pageviews(count, visitors):
+    sessions = [(Session(), Visitor()) for i in range(visitors)]
+    return [(Tracker.HIT_PAGEVIEW, Page('/page/%d' % i)) + sessions[i % visitors] for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hits', type=int, default=20000)
+    parser.add_argument('--visitors', type=int, default=1000)
+    parser.add_argument('--max-processes', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--build-only', action='store_true', help='Build the requests without sending them')
+    args = parser.parse_args()
+    transport = common.build_only if args.build_only else None
+
+    # Only keeps counters, recording every hit would make the collector the bottleneck
+    with StubCollector(max_recorded=0) as collector:
+        tracker = Tracker('UA-1234567-8', 'www.example.com', Config({
+            'EndPointHost': collector.endpoint_host,
+            'SessionHitLimit': None,
+        }))
+
+        hits = pageviews(args.hits, args.visitors)
+        seconds = common.best_of(lambda: tracker.track_many(hits, transport), repeat=1)
+        common.report('Tracker.track_many()', args.hits, seconds, 'hit')
+
+        processes = 1
+        while processes <= args.max_processes:
+            pool = SenderPool(tracker, processes)
+            hits = pageviews(args.hits, args.visitors)
+            seconds = common.best_of(lambda: pool.track_many(hits, transport), repeat=1)
+            common.report('SenderPool, %d processes' % processes, args.hits, seconds, 'hit')
+            processes *= 2
+
+        print('Collector: %(hits)d hits, %(errors)d errors' % collector.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Record size and round trips per second of the binary to_bytes() and
+from_bytes() format of Visitor, Session and Campaign, compared to pickle
+with the highest protocol.
+
+    python benchmarks/bench_serialization.py --count 20000
+"""
+
+import argparse
+import pickle
+
+import common
+
+from analytics.Campaign import Campaign
+from analytics.Session import Session
+from analytics.Visitor import Visitor
+
+
+def make_visitor():
+    visitor = Visitor()
+    visitor.ip_address = '203.0.113.42'
+    visitor.user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0'
+    visitor.locale = 'de_DE'
+    visitor.flash_version = '11.1 r102'
+    visitor.java_enabled = True
+    visitor.screen_color_depth = 24
+    visitor.screen_resolution = '1920x1080'
+    visitor.unique_id
+    return visitor
+
+
+def make_campaign():
+    campaign = Campaign(Campaign.TYPE_REFERRAL)
+    campaign.source = 'newsletter.example.com'
+    campaign.name = 'Spring Sale 2024'
+    campaign.medium = 'email'
+    campaign.content = '/issues/42'
+    return campaign
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for name, instance in (('Visitor', make_visitor()), ('Session', Session()), ('Campaign', make_campaign())):
+        cls = type(instance)
+        data = instance.to_bytes()
+        pickled = pickle.dumps(instance, pickle.HIGHEST_PROTOCOL)
+        print('%s: %d bytes, pickled %d bytes' % (name, len(data), len(pickled)))
+
+        seconds = common.best_of(lambda: [cls.from_bytes(instance.to_bytes()) for i in range(args.count)],
+                                 args.repeat)
+        common.report('%s to_bytes()/from_bytes()' % name, args.count, seconds, 'round trip')
+
+        seconds = common.best_of(lambda: [pickle.loads(pickle.dumps(instance, pickle.HIGHEST_PROTOCOL))
+                                          for i in range(args.count)], args.repeat)
+        common.report('%s pickle' % name, args.count, seconds, 'round trip')
+
+
+if __name__ == '__main__':
+    main()
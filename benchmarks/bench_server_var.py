@@ -0,0 +1,87 @@
+"""
+WSGI environs per second run through Visitor.from_server_var(), with the
+parse results cached by raw header value (as headers repeat heavily across
+visitors) and with every header parsed anew.
+
+    python benchmarks/bench_server_var.py --count 50000
+"""
+
+import argparse
+import random
+
+import common
+
+from analytics.Visitor import Visitor
+
+
+# Header values as sent by common browsers and proxies
+ACCEPT_LANGUAGES = [
+    'en-US,en;q=0.9',
+    'de-DE,de;q=0.9,en-US;q=0.8,en;q=0.7',
+    'fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7',
+    'en-GB,en-US;q=0.9,en;q=0.8',
+    'es-419,es;q=0.9',
+    'zh-CN,zh;q=0.9',
+    'ja,en-US;q=0.9,en;q=0.8',
+    'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
+    'en-us',
+    '*',
+]
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:120.0) Gecko/20100101 Firefox/120.0',
+]
+
+
+class NoCache(object):
+
+    def get(self, key, default=None):
+        return default
+
+    def put(self, key, value):
+        pass
+
+
+def make_environs(count, clients, seed=0):
+    rnd = random.Random(seed)
+    # A limited pool of clients, each behind a load balancer or a proxy chain
+    pool = []
+    for i in range(clients):
+        client = '%d.%d.%d.%d' % (rnd.randint(1, 223), rnd.randint(0, 255), rnd.randint(0, 255), rnd.randint(1, 254))
+        forwarded = rnd.choice([client, '10.0.0.%d, %s' % (rnd.randint(1, 254), client), '192.168.1.10'])
+        pool.append({
+            'REMOTE_ADDR': '10.1.2.3',
+            'HTTP_X_FORWARDED_FOR': forwarded,
+            'HTTP_USER_AGENT': rnd.choice(USER_AGENTS),
+            'HTTP_ACCEPT_LANGUAGE': rnd.choice(ACCEPT_LANGUAGES),
+        })
+    return [rnd.choice(pool) for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=50000)
+    parser.add_argument('--clients', type=int, default=2000, help='Distinct clients the environs come from')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    environs = make_environs(args.count, args.clients)
+    visitor = Visitor()
+
+    caches = Visitor.IP_ADDRESS_CACHE, Visitor.LOCALE_CACHE
+    try:
+        Visitor.IP_ADDRESS_CACHE = Visitor.LOCALE_CACHE = NoCache()
+        seconds = common.best_of(lambda: [visitor.from_server_var(environ) for environ in environs], args.repeat)
+        common.report('Uncached', args.count, seconds, 'environ')
+    finally:
+        Visitor.IP_ADDRESS_CACHE, Visitor.LOCALE_CACHE = caches
+
+    seconds = common.best_of(lambda: [visitor.from_server_var(environ) for environ in environs], args.repeat)
+    common.report('Cached by header value', args.count, seconds, 'environ')
+
+
+if __name__ == '__main__':
+    main()
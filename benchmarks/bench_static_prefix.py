@@ -0,0 +1,45 @@
+"""
+Pageview requests built per second, with the static query string prefix
+("utmwv", "utmac", "utmhn" and "aip") cached per Tracker and with it being
+rebuilt for every request, as before the cache existed.
+
+    python benchmarks/bench_static_prefix.py --hits 20000
+"""
+
+import argparse
+
+import common
+
+from analytics.Config import Config
+from analytics.Page import Page
+from analytics.Session import Session
+from analytics.Tracker import Tracker
+from analytics.Visitor import Visitor
+
+
+class UncachedTracker(Tracker):
+
+    def get_static_query_string(self, config):
+        self._static_query_string = None
+        return Tracker.get_static_query_string(self, config)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hits', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    config = Config({'EndPointHost': None, 'SessionHitLimit': None, 'AnonymizeIpAddresses': True})
+    session = Session()
+    visitor = Visitor()
+    hits = [(Tracker.HIT_PAGEVIEW, Page('/page'), session, visitor)] * args.hits
+
+    for name, tracker_class in (('Prefix rebuilt per hit', UncachedTracker), ('Prefix cached', Tracker)):
+        tracker = tracker_class('UA-1234567-8', 'www.example.com', config)
+        seconds = common.best_of(lambda: tracker.track_many(hits, common.build_only), args.repeat)
+        common.report(name, args.hits, seconds, 'hit')
+
+
+if __name__ == '__main__':
+    main()
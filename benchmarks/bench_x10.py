@@ -0,0 +1,83 @@
+"""
+Event "utme" fragments rendered per second by X10, compared to the
+original per-character escaping and to rendering memoized by the contents
+of the project. Measured for payloads repeating across hits (the usual case
+of a fixed set of events) and for payloads unique to every hit.
+
+    python benchmarks/bench_x10.py --count 100000
+"""
+
+import argparse
+
+import common
+
+from analytics.internals import utils
+from analytics.internals.X10 import X10
+
+
+class OriginalX10(X10):
+    """
+    Escaping one character at a time, as before.
+    """
+
+    def escapeExtensibleValue(self, value):
+        result = ''
+        for char in str(value):
+            result += X10.ESCAPE_CHAR_MAP.get(char, char)
+        return result
+
+
+class MemoizedX10(X10):
+    """
+    Rendering memoized by the contents of the project, including the types of
+    its values, as e.g. 1, 1.0 and True are equal but render differently.
+    """
+
+    RENDERED_PROJECTS = utils.LRUCache(1024)
+
+    def renderProject(self, project):
+        key = tuple((type, tuple(sorted((num, value.__class__, value) for num, value in project[type].items())))
+                    for type in X10.SET if type in project)
+        result = MemoizedX10.RENDERED_PROJECTS.get(key)
+        if result is None:
+            result = X10.renderProject(self, project)
+            MemoizedX10.RENDERED_PROJECTS.put(key, result)
+
+        return result
+
+
+def events(count, distinct):
+    categories = ['Videos', 'Downloads', 'Outbound Links', 'Forms', 'Scroll Depth']
+    actions = ['Play', 'Pause', 'Click', 'Submit (step 2)', '75%*']
+    return [(categories[i % 5], actions[i // 5 % 5], "Label 'number' %d!" % (i % distinct), i % 7 or None)
+            for i in range(count)]
+
+
+def render(x10_class, payloads):
+    for category, action, label, value in payloads:
+        # The same steps as EventRequest.build_parameters()
+        x10 = x10_class()
+        x10.set_key(5, X10.OBJECT_KEY_NUM, category)
+        x10.set_key(5, X10.TYPE_KEY_NUM, action)
+        x10.set_key(5, X10.LABEL_KEY_NUM, label)
+        if value is not None:
+            x10.set_value(5, X10.VALUE_VALUE_NUM, value)
+        x10.render_url_string()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for payloads_name, distinct in (('repeating', 50), ('unique', args.count)):
+        payloads = events(args.count, distinct)
+        for name, x10_class in (('original', OriginalX10), ('memoized', MemoizedX10), ('current', X10)):
+            MemoizedX10.RENDERED_PROJECTS.clear()
+            seconds = common.best_of(lambda: render(x10_class, payloads), args.repeat)
+            common.report('%s payloads, %s' % (payloads_name, name), args.count, seconds, 'event')
+
+
+if __name__ == '__main__':
+    main()
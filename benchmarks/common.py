@@ -0,0 +1,47 @@
+"""
+Shared helpers of the benchmark scripts, which are run directly, e.g.
+
+    python benchmarks/bench_sender_pool.py
+
+The package lives in src/ and is not installed, the stub collector in tools/.
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+
+def build_only(config, requests):
+    """
+    Transport for Tracker.track_many() which only builds requests, answering
+    each with the GIF of the collector without sending it.
+    """
+    from StubCollector import StubCollector
+    return [StubCollector.GIF] * len(requests)
+
+
+def best_of(func, repeat=5):
+    """
+    @param callable func Run without arguments
+    @param int repeat
+    @return float Seconds the fastest run took
+    """
+    timings = []
+    for i in range(repeat):
+        started = time.time()
+        func()
+        timings.append(time.time() - started)
+    return min(timings)
+
+
+def report(name, count, seconds, unit='op'):
+    """
+    Prints the throughput and per-operation cost of a measurement.
+
+    @param string unit Singular name of what was counted
+    """
+    print('%-40s %12.0f %ss/s %10.2f us/%s' % (name, count / seconds, unit, seconds * 1e6 / count, unit))
@@ -0,0 +1,287 @@
+"""
+Generic Server-Side Google Analytics PHP Client
+
+This library is free software you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License (LGPL) as published by the Free Software Foundation either
+version 3 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA.
+
+Google Analytics is a registered trademark of Google Inc.
+
+@link      http://code.google.com/p/php-ga
+
+@license   http://www.gnu.org/licenses/lgpl.html
+@author    Thomas Bachem <tb@unitedprototype.com>
+@copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
+"""
+
+# NOTE: Requires an interpreter that ships asyncio (Python 3.5+), which is why
+# this module is not imported anywhere else in the package.
+
+import asyncio
+from urllib.parse import urlsplit
+
+from analytics.Tracker import Tracker
+
+
+class AsyncTransportError(Exception):
+    pass
+
+
+class StaleConnectionError(AsyncTransportError):
+    """
+    A kept-alive connection was closed by the server before any of the
+    response was read, so the request can safely be sent again.
+    """
+    pass
+
+
+class AsyncTracker(Tracker):
+    """
+    Tracker with awaitable track_* methods for asyncio applications.
+
+    Requests are built by the same Request.build_parameters() pipeline as for
+    the blocking Tracker, but sent over asyncio streams. Idle keep-alive
+    connections are reused and at most max_concurrency requests are in flight
+    at any time.
+
+    WATCH OUT: Requests are always sent right away, one attempt each. None of
+    the delivery machinery of HttpRequest is applied, i.e. Config.fireAndForget,
+    Config.sendOnShutdown, Config.batchRequests, Config.spoolDirectory, the
+    retry and circuit breaker settings and the rate limits are ignored.
+
+    @ivar max_concurrency:
+        Maximum amount of requests sent concurrently, defaults to Config.connectionPoolSize
+    """
+
+    def __init__(self, account_id, domain_name, config=None, max_concurrency=None):
+        super(AsyncTracker, self).__init__(account_id, domain_name, config)
+
+        if max_concurrency is None:
+            max_concurrency = self.config.getConnectionPoolSize()
+
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._idle = {}
+
+
+    async def track_pageview(self, page, session, visitor):
+        """
+        Equivalent of _trackPageview() in GA Javascript client.
+        """
+        return await self._send(self._pageview_request(page, session, visitor))
+
+
+    async def track_event(self, event, session, visitor):
+        """
+        Equivalent of _trackEvent() in GA Javascript client.
+        """
+        return await self._send(self._event_request(event, session, visitor))
+
+
+    async def track_transaction(self, transaction, session, visitor):
+        """
+        Combines _addTrans(), _addItem() (indirectly) and _trackTrans() of GA Javascript client.
+        The item requests are sent concurrently, after the transaction request
+        has been answered if Config.transactionOrder asks for that.
+
+        @raise Exception The first error any of the requests failed with. With
+                         Config.TRANSACTION_ORDER_TRANSACTION_FIRST, the items
+                         are not sent at all if the transaction request failed.
+        @return list One response per request that was not dropped by Config.sessionLimitPolicy
+        """
+        from analytics.Config import Config
+
+        requests = self._transaction_requests(transaction, session, visitor)
+        config = requests[0].getConfig()
+        http_requests = [request.buildHttpRequest() for request in requests]
+        # Requests dropped by Config.sessionLimitPolicy
+        http_requests = [request for request in http_requests if request is not None]
+
+        responses = []
+        if config.getTransactionOrder() == Config.TRANSACTION_ORDER_TRANSACTION_FIRST and http_requests:
+            # Items of a transaction GA did not get would be orphaned
+            responses.append(await self._send_http(config, http_requests[0]))
+            http_requests = http_requests[1:]
+
+        results = await asyncio.gather(*[self._send_http(config, request) for request in http_requests],
+                                       return_exceptions=True)
+
+        # All requests got sent, now report the first failure, if any
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        return responses + results
+
+
+    async def track_social(self, social_interaction, page, session, visitor):
+        """
+        Equivalent of _track_social() in GA Javascript client.
+        """
+        return await self._send(self._social_request(social_interaction, page, session, visitor))
+
+
+    async def _send(self, request):
+        """
+        Async counterpart of HttpRequest._send().
+
+        @return bytes|None
+        """
+        http_request = request.buildHttpRequest()
+        if http_request is None:
+            # Dropped by Config.sessionLimitPolicy
+            return None
+
+        return await self._send_http(request.getConfig(), http_request)
+
+
+    async def _send_http(self, config, http_request):
+        """
+        Sends an already built urllib.request.Request and calls the logging callback.
+
+        @return bytes|None
+        """
+        response = None
+
+        # Do not actually send the request if endpoint host is set to None
+        if config.getEndPointHost():
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            async with self._semaphore:
+                response = await self._roundtrip(http_request, config.getRequestTimeout())
+
+        logging_callback = config.getLoggingCallback()
+        if logging_callback:
+            logging_callback(http_request, response)
+
+        return response
+
+
+    async def _connect(self, netloc, timeout):
+        """
+        @return tuple (reader, writer, reused)
+        """
+        idle = self._idle.setdefault(netloc, [])
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+
+        host, _, port = netloc.partition(':')
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, int(port or 80)), timeout)
+        return reader, writer, False
+
+
+    async def _roundtrip(self, http_request, timeout):
+        url = urlsplit(http_request.get_full_url())
+        selector = url.path + ('?' + url.query if url.query else '')
+        body = http_request.data or b''
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        headers = dict(http_request.header_items())
+        headers['Host'] = url.netloc
+        headers['Content-Length'] = str(len(body))
+        head = '%s %s HTTP/1.1\r\n' % (http_request.get_method(), selector)
+        head += ''.join('%s: %s\r\n' % item for item in headers.items()) + '\r\n'
+        payload = head.encode('latin-1') + body
+
+        reader, writer, reused = await self._connect(url.netloc, timeout)
+        try:
+            try:
+                status, keep_alive, data = await asyncio.wait_for(
+                    self._exchange(reader, writer, payload), timeout)
+            except StaleConnectionError:
+                writer.close()
+                if not reused:
+                    raise
+
+                # The kept-alive connection was closed by the server, reconnect once
+                reader, writer, reused = await self._connect(url.netloc, timeout)
+                status, keep_alive, data = await asyncio.wait_for(
+                    self._exchange(reader, writer, payload), timeout)
+        except BaseException:
+            writer.close()
+            raise
+
+        if keep_alive:
+            self._idle[url.netloc].append((reader, writer))
+        else:
+            writer.close()
+
+        if not 200 <= status < 300:
+            raise AsyncTransportError('Google Analytics endpoint responded with HTTP status %d' % status)
+
+        return data
+
+
+    async def _exchange(self, reader, writer, payload):
+        """
+        Writes one request and reads its complete response.
+
+        @return tuple (int status, bool keep_alive, bytes body)
+        """
+        try:
+            writer.write(payload)
+            await writer.drain()
+            status_line = await reader.readline()
+        except ConnectionResetError as e:
+            raise StaleConnectionError(str(e))
+
+        if not status_line:
+            raise StaleConnectionError('Connection closed before receiving a response')
+
+        version, status = status_line.split(None, 2)[:2]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if not size:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            data = b''.join(chunks)
+            keep_alive = True
+        elif 'content-length' in headers:
+            data = await reader.readexactly(int(headers['content-length']))
+            keep_alive = True
+        else:
+            data = await reader.read()
+            keep_alive = False
+
+        connection = headers.get('connection', '').lower()
+        if connection == 'close' or (version == b'HTTP/1.0' and connection != 'keep-alive'):
+            keep_alive = False
+
+        return int(status), keep_alive, data
+
+
+    async def close(self):
+        """
+        Closes all idle keep-alive connections.
+        """
+        for idle in self._idle.values():
+            for reader, writer in idle:
+                writer.close()
+        self._idle = {}
@@ -25,7 +25,11 @@ Google Analytics is a registered trademark of Google Inc.
 """
 
 from datetime import datetime
-from urlparse import urlparse
+import struct
+import threading
+
+from analytics.internals import utils
+from analytics.internals.compat import urlparse
 
 
 """ 
@@ -154,12 +158,64 @@ class Campaign(object):
     TYPE_REFERRAL = 'referral'
     TYPES = [TYPE_DIRECT, TYPE_ORGANIC, TYPE_REFERRAL]
 
+    """ 
+    Keys of the campaign fields within the "__utmz" parameter, in order.
+
+    @link http://code.google.com/p/gaforflash/source/browse/trunk/src/com/google/analytics/campaign/CampaignTracker.as#236
+    """
+    UTMZ_KEYS = [
+        ('utmcid', 'id'),
+        ('utmcsr', 'source'),
+        ('utmgclid', 'gClickId'),
+        ('utmdclid', 'dClickId'),
+        ('utmccn', 'name'),
+        ('utmcmd', 'medium'),
+        ('utmctr', 'term'),
+        ('utmcct', 'content'),
+    ]
+
+    UTMZ_DELIMITER = '|'
+
+    """ 
+    Attributes the cached "__utmz" data depends on, setting any of them drops the cache.
+    """
+    UTMZ_ATTRIBUTES = frozenset(['creationTime'] + [attribute for key, attribute in UTMZ_KEYS])
+
+    __slots__ = ('_utmz', '_lock', 'type', 'creationTime', 'responseCount') + tuple(attribute for key, attribute in UTMZ_KEYS)
+
+    """ 
+    Version of the to_bytes() format, stored as its first byte.
+    """
+    SERIALIZATION_VERSION = 1
+
+    """ 
+    Version, flags, type, creation timestamp, response count and ID, followed by
+    the strings of SERIALIZED_STRINGS.
+    """
+    SERIALIZATION_HEADER = struct.Struct('!BBBqIq')
+
+    SERIALIZED_STRINGS = ('source', 'gClickId', 'dClickId', 'name', 'medium', 'term', 'content')
+
+    FLAG_ID = 1
+
     """ 
     @see createFromReferrer
     @param string type See TYPE_ constants
     """
     def __init__(self, type_):
+        self._utmz = None
+        # Guards responseCount, as the campaign of a tracker is shared by all of its requests
+        self._lock = threading.Lock()
         self.responseCount = 0
+        self.id = None
+        self.source = None
+        self.gClickId = None
+        self.dClickId = None
+        self.name = None
+        self.medium = None
+        self.term = None
+        self.content = None
+
         if type_ not in Campaign.TYPES:
             raise ValueError('Campaign type has to be one of the Campaign::TYPE_ constant values.')
         
@@ -180,18 +236,109 @@ class Campaign(object):
             self.name   = '(organic)'
             self.medium = 'organic'
         
-        self.creationTime = datetime.datetime.now()
+        self.creationTime = datetime.now()
+    
+    
+    def __setattr__(self, name, value):
+        if name in Campaign.UTMZ_ATTRIBUTES:
+            object.__setattr__(self, '_utmz', None)
+        object.__setattr__(self, name, value)
+
+
+    def __getstate__(self):
+        # The cache is cheap to rebuild, don't persist it along with the campaign
+        return dict((name, getattr(self, name)) for name in Campaign.__slots__ if name not in ('_utmz', '_lock'))
+
+
+    def __setstate__(self, state):
+        self._utmz = None
+        self._lock = threading.Lock()
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+    """ 
+    Compact binary representation to store instead of a pickle, with the
+    creation time truncated to whole seconds.
+
+    @return string
+    """
+    def to_bytes(self):
+        header = Campaign.SERIALIZATION_HEADER.pack(
+            Campaign.SERIALIZATION_VERSION,
+            Campaign.FLAG_ID if self.id is not None else 0,
+            Campaign.TYPES.index(self.type),
+            int(utils.totimestamp(self.creationTime)),
+            self.responseCount,
+            int(self.id or 0),
+        )
+
+        return header + utils.pack_strings([getattr(self, name) for name in Campaign.SERIALIZED_STRINGS])
+
+
+    """ 
+    @param string data As returned by to_bytes()
+    @return Campaign
+    """
+    @classmethod
+    def from_bytes(cls, data):
+        if not data or ord(data[:1]) != Campaign.SERIALIZATION_VERSION:
+            raise ValueError('Unsupported campaign serialization format')
+
+        try:
+            version, flags, type_, creation_time, response_count, id_ = Campaign.SERIALIZATION_HEADER.unpack_from(data)
+            type_ = Campaign.TYPES[type_]
+        except (struct.error, IndexError):
+            raise ValueError('Invalid campaign data')
+
+        strings, offset = utils.unpack_strings(data, Campaign.SERIALIZATION_HEADER.size,
+                                               len(Campaign.SERIALIZED_STRINGS))
+
+        instance = cls.__new__(cls)
+        instance._utmz = None
+        instance._lock = threading.Lock()
+        instance.type = type_
+        instance.creationTime = datetime.fromtimestamp(creation_time)
+        instance.responseCount = response_count
+        instance.id = id_ if flags & Campaign.FLAG_ID else None
+        for name, value in zip(Campaign.SERIALIZED_STRINGS, strings):
+            setattr(instance, name, value)
+
+        return instance
+
+
+    """ 
+    Returns the parts of the "__utmz" parameter that only change along with
+    the campaign itself: the creation timestamp and the already escaped
+    "key=value|key=value" campaign data. Built once and cached until one of
+    the campaign attributes is set again.
+
+    @return tuple (int timestamp, string data)
+    """
+    def get_utmz_data(self):
+        utmz = self._utmz
+        if utmz is None:
+            data = []
+            for key, attribute in Campaign.UTMZ_KEYS:
+                value = getattr(self, attribute)
+                if value:
+                    # Only spaces and pluses get escaped in gaforflash and ga.js, so we do the same
+                    data.append(key + '=' + utils.replace_all('%s' % value, {'+': '%20', ' ': '%20'}))
+
+            utmz = self._utmz = (utils.totimestamp(self.creationTime), Campaign.UTMZ_DELIMITER.join(data))
+
+        return utmz
     
     
     """ 
     @link http://code.google.com/p/gaforflash/source/browse/trunk/src/com/google/analytics/campaign/CampaignManager.as#333
     @param string url
-    @return \UnitedPrototype\GoogleAnalytics\Campaign
+    @return Campaign
     """
     @classmethod
     def createFromReferrer(cls, url):
         instance = cls(Campaign.TYPE_REFERRAL)
-        urlInfo = urlparse(url)
+        urlInfo = urlparse.urlparse(url)
         instance.source  = urlInfo.hostname
         instance.content = urlInfo.path
         
@@ -252,10 +399,15 @@ class Campaign(object):
     
     
     """ 
+    Atomic, so no increments get lost if the campaign is shared between threads.
+
     @param int byAmount
+    @return int The new response count
     """
     def increaseResponselen(self, byAmount = 1):
-        self.responseCount += byAmount
+        with self._lock:
+            self.responseCount += byAmount
+            return self.responseCount
     
 
     """ 
@@ -51,6 +51,20 @@ class Config(object):
   Throw UnitedPrototype\GoogleAnalytics\Exception exceptions.
   """
 
+  DISPATCH_OVERFLOW_DROP_OLDEST = 'drop-oldest'
+  DISPATCH_OVERFLOW_DROP_NEWEST = 'drop-newest'
+  DISPATCH_OVERFLOW_BLOCK       = 'block'
+  DISPATCH_OVERFLOW_POLICIES = [DISPATCH_OVERFLOW_DROP_OLDEST, DISPATCH_OVERFLOW_DROP_NEWEST, DISPATCH_OVERFLOW_BLOCK]
+
+  TRANSACTION_ORDER_TRANSACTION_FIRST = 'transaction-first'
+  TRANSACTION_ORDER_NONE              = 'none'
+  TRANSACTION_ORDERS = [TRANSACTION_ORDER_TRANSACTION_FIRST, TRANSACTION_ORDER_NONE]
+
+  SESSION_LIMIT_RAISE    = 'raise'
+  SESSION_LIMIT_DROP     = 'drop'
+  SESSION_LIMIT_ROLLOVER = 'rollover'
+  SESSION_LIMIT_POLICIES = [SESSION_LIMIT_RAISE, SESSION_LIMIT_DROP, SESSION_LIMIT_ROLLOVER]
+
   """ 
     How strict should errors get handled? After all, we do just do some
     tracking stuff here, and errors shouldn't break an application's
@@ -65,15 +79,31 @@ class Config(object):
 
   """ 
   Whether to just queue all requests on HttpRequest::fire() and actually send
-  them on PHP script shutdown after all other tasks are done.
+  them on interpreter shutdown after all other tasks are done.
 
-  This has two advantages:
-  1) It effectively doesn't affect app performance
-  2) It can e.g. handle custom variables that were set after scheduling a request
+  This effectively doesn't affect app performance. Requests are built right
+  away though, so custom variables that are set after scheduling a request
+  are not included.
 
   @see Internals\Request\HttpRequest::fire()
+  @see Internals\ShutdownBuffer
   @var bool
   """
+
+  """
+  Maximum memory footprint in bytes of the requests queued for sending on
+  shutdown, further requests get dropped.
+
+  @see Internals\ShutdownBuffer::stats()
+  @var int
+  """
+
+  """
+  Seconds (float allowed) sending the requests queued for shutdown may take
+  in total, the remaining requests get dropped afterwards.
+
+  @var float
+  """
     
   """ 
   Whether to make asynchronous requests to GA without waiting for any
@@ -83,6 +113,99 @@ class Config(object):
   @var bool
   """
 
+  """
+  Maximum amount of requests waiting to be sent in "fireAndForget" mode.
+
+  @see Internals\Dispatcher
+  @var int
+  """
+
+  """
+  Amount of background threads sending queued requests in "fireAndForget" mode.
+
+  @see Internals\Dispatcher
+  @var int
+  """
+
+  """
+  What to do with a request when the "fireAndForget" queue is full, one of the
+  DISPATCH_OVERFLOW_ constants: drop the oldest queued request, drop the new
+  request or block for at most "dispatchBlockTimeout" seconds before dropping it.
+
+  @see Internals\Dispatcher::put()
+  @var string
+  """
+
+  """
+  Seconds (float allowed) to block HttpRequest::fire() for when the queue is full
+  and the DISPATCH_OVERFLOW_BLOCK policy is used.
+
+  @var float
+  """
+
+  """
+  Whether to pack many hits, newline-separated, into a single POST request to
+  "batchEndPointPath" instead of sending one request per hit.
+
+  @see Internals\Batcher
+  @var bool
+  """
+
+  """
+  Maximum amount of hits per batch request.
+
+  @var int
+  """
+
+  """
+  Maximum size of a batch request body in bytes.
+
+  @var int
+  """
+
+  """
+  Seconds (float allowed) a hit may wait for its batch to fill up before the
+  batch gets sent anyway.
+
+  @var float
+  """
+
+  """
+  Google Analytics batch request endpoint path
+
+  @var string
+  """
+
+  """
+  Directory of the write-ahead spool that every request gets written to before
+  it is sent, so that requests which could not be delivered can be resent
+  later on. None disables the spool.
+
+  @see Internals\Spool
+  @var string|null
+  """
+
+  """
+  Size in bytes after which a new spool segment file is started.
+
+  @var int
+  """
+
+  """
+  Seconds (float allowed) between two fsync() calls of the current spool
+  segment, i.e. the amount of spooled requests that may be lost on an OS crash.
+
+  @var float
+  """
+
+  """
+  Whether to resend unacknowledged spooled requests of a previous run as soon
+  as the spool gets opened.
+
+  @see Internals\Spool::replay()
+  @var bool
+  """
+
   """ 
   Logging callback, registered via setLoggingCallback(). Will be fired
   whenever a request gets sent out and receives the full HTTP request
@@ -135,23 +258,197 @@ class Config(object):
   @link http://code.google.com/apis/analytics/docs/gaJS/gaJSApiBasicConfiguration.html#_gat.GA_Tracker_._setSiteSpeedSampleRate
   @var int
   """
+
+  """
+  Whether to send requests over persistent keep-alive connections from a
+  per-process pool instead of opening a new connection for every request.
+
+  @see Internals\ConnectionPool
+  @var bool
+  """
+
+  """
+  Maximum amount of idle keep-alive connections kept per endpoint host.
+
+  @see Internals\ConnectionPool::size
+  @var int
+  """
+
+  """
+  Seconds after which an idle keep-alive connection gets discarded instead
+  of being reused.
+
+  @see Internals\ConnectionPool::idle_timeout
+  @var float
+  """
+
+  """
+  Maximum amount of attempts per request, including the first one. Only
+  requests that failed to connect and responses with a status from
+  retryOnStatus are retried, never timeouts, as the server may have counted
+  the hit already. 1 disables retries.
+
+  @see Internals\RetryPolicy
+  @var int
+  """
+
+  """
+  Base delay in seconds of the exponential backoff between attempts, the
+  actual delay is chosen randomly between 0 and retryBackoff * 2 ^ (attempt - 1).
+
+  @var float
+  """
+
+  """
+  Upper bound in seconds of the backoff between attempts.
+
+  @var float
+  """
+
+  """
+  HTTP status codes that are considered transient and retried.
+
+  @var list
+  """
+
+  """
+  Amount of consecutive failures of an endpoint host after which requests to
+  it are rejected right away with a CircuitOpenError, 0 disables the circuit
+  breaker.
+
+  @see Internals\CircuitBreaker
+  @var int
+  """
+
+  """
+  Seconds the circuit breaker stays open before letting a probe request through.
+
+  @var float
+  """
+
+  """
+  Maximum amount of hits sent per second, across all accounts. A batch
+  request counts with each of its hits. Bursts are smoothed out by making
+  senders wait for their turn. None disables the global rate limit.
+
+  @see Internals\RateLimiter
+  @var float
+  """
+
+  """
+  Amount of hits that may be sent back to back before rateLimit applies.
+  Batches of more hits than that are sent once the bucket is full, the hits
+  beyond the burst delay the requests after them.
+
+  @var int
+  """
+
+  """
+  Maximum amount of hits sent per second for each Google Analytics
+  account, None disables the per-account rate limit.
+
+  @var float
+  """
+
+  """
+  Amount of hits per account that may be sent back to back before
+  accountRateLimit applies.
+
+  @var int
+  """
+
+  """
+  Maximum amount of seconds a request waits for the rate limiter, requests
+  that would have to wait longer fail with a RateLimitError.
+
+  @var float
+  """
+
+  """
+  Maximum amount of requests per session, see
+  http://code.google.com/intl/de-DE/apis/analytics/docs/tracking/eventTrackerGuide.html#implementationConsiderations
+  None disables the limit.
+
+  @var int
+  """
+
+  """
+  What to do with a request once its session reached sessionHitLimit, one of
+  the SESSION_LIMIT_ constants: raise a Session.LimitExceededError, silently
+  drop the request, or start a new session for the visitor. Applied before the
+  request is built.
+
+  @see Internals\Request\Request::apply_session_limit()
+  @var string
+  """
+
+  """
+  Maximum amount of item requests of a transaction sent concurrently by
+  Tracker::track_transaction(), 1 sends them one after another. Only applies
+  when requests are sent synchronously. Concurrent requests beyond
+  connectionPoolSize open additional connections which are not kept alive.
+
+  @see Internals\Request\HttpRequest::dispatch_concurrently()
+  @var int
+  """
+
+  """
+  Ordering guarantee for the requests of a transaction, one of the
+  TRANSACTION_ORDER_ constants. With "transaction-first", the transaction
+  request is completed before its item requests are sent.
+
+  @var string
+  """
     
 
   """ 
-  @param array properties
+  @param array properties Optional, defaults are used for all properties not given
   """
-  def __init__(self, properties):
+  def __init__(self, properties=None):
     self.errorSeverity = Config.ERROR_SEVERITY_EXCEPTIONS
     self.sendOnShutdown = False
+    self.shutdownBufferMaxBytes = 8388608
+    self.shutdownFlushTimeout = 5
     self.fireAndForget = False
+    self.dispatchQueueSize = 1000
+    self.dispatchThreads = 1
+    self.dispatchOverflowPolicy = Config.DISPATCH_OVERFLOW_DROP_OLDEST
+    self.dispatchBlockTimeout = 0.1
+    self.batchRequests = False
+    self.batchMaxHits = 20
+    self.batchMaxBytes = 16384
+    self.batchFlushInterval = 1
+    self.batchEndPointPath = '/batch'
+    self.spoolDirectory = None
+    self.spoolSegmentSize = 4194304
+    self.spoolFsyncInterval = 0.05
+    self.spoolReplayOnStartup = True
     self.loggingCallback = None
     self.requestTimeout = 1
     self.endPointHost = 'www.google-analytics.com'
     self.endPointPath = '/__utm.gif'
     self.anonymizeIpAddresses = False
     self.sitespeedSampleRate = 1
-
-    for prop, value in properties.items():
+    self.useConnectionPool = True
+    self.connectionPoolSize = 4
+    self.connectionIdleTimeout = 30
+    self.retryMaxAttempts = 1
+    self.retryBackoff = 0.1
+    self.retryMaxBackoff = 2
+    self.retryOnStatus = [500, 502, 503, 504]
+    self.circuitBreakerThreshold = 5
+    self.circuitBreakerResetTimeout = 30
+    self.rateLimit = None
+    self.rateLimitBurst = 10
+    self.accountRateLimit = None
+    self.accountRateLimitBurst = 10
+    self.rateLimitMaxWait = 1
+    self.sessionHitLimit = 500
+    self.sessionLimitPolicy = Config.SESSION_LIMIT_RAISE
+    self.transactionConcurrency = 4
+    self.transactionOrder = Config.TRANSACTION_ORDER_TRANSACTION_FIRST
+
+    for prop, value in (properties or {}).items():
       setterName = 'set' + prop
       setter = getattr(self, setterName)
       if setter:
@@ -188,6 +485,34 @@ class Config(object):
     self.sendOnShutdown = sendOnShutdown
 
 
+  """
+  @return int
+  """
+  def getShutdownBufferMaxBytes(self):
+    return self.shutdownBufferMaxBytes
+
+
+  """
+  @param int shutdownBufferMaxBytes
+  """
+  def setShutdownBufferMaxBytes(self, shutdownBufferMaxBytes):
+    self.shutdownBufferMaxBytes = shutdownBufferMaxBytes
+
+
+  """
+  @return float
+  """
+  def getShutdownFlushTimeout(self):
+    return self.shutdownFlushTimeout
+
+
+  """
+  @param float shutdownFlushTimeout
+  """
+  def setShutdownFlushTimeout(self, shutdownFlushTimeout):
+    self.shutdownFlushTimeout = shutdownFlushTimeout
+
+
   """ 
   @return bool
   """
@@ -202,6 +527,200 @@ class Config(object):
     self.fireAndForget = fireAndForget
 
 
+  """
+  @return int
+  """
+  def getDispatchQueueSize(self):
+    return self.dispatchQueueSize
+
+
+  """
+  @param int dispatchQueueSize
+  """
+  def setDispatchQueueSize(self, dispatchQueueSize):
+    if dispatchQueueSize < 1:
+      raise ValueError('The dispatch queue size must be at least 1.')
+
+    self.dispatchQueueSize = dispatchQueueSize
+
+
+  """
+  @return int
+  """
+  def getDispatchThreads(self):
+    return self.dispatchThreads
+
+
+  """
+  @param int dispatchThreads
+  """
+  def setDispatchThreads(self, dispatchThreads):
+    if dispatchThreads < 1:
+      raise ValueError('At least one dispatch thread is required.')
+
+    self.dispatchThreads = dispatchThreads
+
+
+  """
+  @return string See self::DISPATCH_OVERFLOW_ constants
+  """
+  def getDispatchOverflowPolicy(self):
+    return self.dispatchOverflowPolicy
+
+
+  """
+  @param string dispatchOverflowPolicy See self::DISPATCH_OVERFLOW_ constants
+  """
+  def setDispatchOverflowPolicy(self, dispatchOverflowPolicy):
+    if dispatchOverflowPolicy not in Config.DISPATCH_OVERFLOW_POLICIES:
+      raise ValueError('Dispatch overflow policy has to be one of the Config.DISPATCH_OVERFLOW_ constant values.')
+
+    self.dispatchOverflowPolicy = dispatchOverflowPolicy
+
+
+  """
+  @return float
+  """
+  def getDispatchBlockTimeout(self):
+    return self.dispatchBlockTimeout
+
+
+  """
+  @param float dispatchBlockTimeout
+  """
+  def setDispatchBlockTimeout(self, dispatchBlockTimeout):
+    self.dispatchBlockTimeout = dispatchBlockTimeout
+
+
+  """
+  @return bool
+  """
+  def getBatchRequests(self):
+    return self.batchRequests
+
+
+  """
+  @param bool batchRequests
+  """
+  def setBatchRequests(self, batchRequests):
+    self.batchRequests = batchRequests
+
+
+  """
+  @return int
+  """
+  def getBatchMaxHits(self):
+    return self.batchMaxHits
+
+
+  """
+  @param int batchMaxHits
+  """
+  def setBatchMaxHits(self, batchMaxHits):
+    if batchMaxHits < 1:
+      raise ValueError('A batch has to consist of at least one hit.')
+
+    self.batchMaxHits = batchMaxHits
+
+
+  """
+  @return int
+  """
+  def getBatchMaxBytes(self):
+    return self.batchMaxBytes
+
+
+  """
+  @param int batchMaxBytes
+  """
+  def setBatchMaxBytes(self, batchMaxBytes):
+    self.batchMaxBytes = batchMaxBytes
+
+
+  """
+  @return float
+  """
+  def getBatchFlushInterval(self):
+    return self.batchFlushInterval
+
+
+  """
+  @param float batchFlushInterval
+  """
+  def setBatchFlushInterval(self, batchFlushInterval):
+    self.batchFlushInterval = batchFlushInterval
+
+
+  """
+  @return string
+  """
+  def getBatchEndPointPath(self):
+    return self.batchEndPointPath
+
+
+  """
+  @param string batchEndPointPath
+  """
+  def setBatchEndPointPath(self, batchEndPointPath):
+    self.batchEndPointPath = batchEndPointPath
+
+
+  """
+  @return string|null
+  """
+  def getSpoolDirectory(self):
+    return self.spoolDirectory
+
+
+  """
+  @param string|null spoolDirectory
+  """
+  def setSpoolDirectory(self, spoolDirectory):
+    self.spoolDirectory = spoolDirectory
+
+
+  """
+  @return int
+  """
+  def getSpoolSegmentSize(self):
+    return self.spoolSegmentSize
+
+
+  """
+  @param int spoolSegmentSize
+  """
+  def setSpoolSegmentSize(self, spoolSegmentSize):
+    self.spoolSegmentSize = spoolSegmentSize
+
+
+  """
+  @return float
+  """
+  def getSpoolFsyncInterval(self):
+    return self.spoolFsyncInterval
+
+
+  """
+  @param float spoolFsyncInterval
+  """
+  def setSpoolFsyncInterval(self, spoolFsyncInterval):
+    self.spoolFsyncInterval = spoolFsyncInterval
+
+
+  """
+  @return bool
+  """
+  def getSpoolReplayOnStartup(self):
+    return self.spoolReplayOnStartup
+
+
+  """
+  @param bool spoolReplayOnStartup
+  """
+  def setSpoolReplayOnStartup(self, spoolReplayOnStartup):
+    self.spoolReplayOnStartup = spoolReplayOnStartup
+
+
   """ 
   @return \Closure|null
   """
@@ -287,3 +806,276 @@ class Config(object):
         return ValueError('For consistency with ga.js, sample rates must be specified as a number between 0 and 100.')
     
     self.sitespeedSampleRate = sitespeedSampleRate
+
+
+  """
+  @return bool
+  """
+  def getUseConnectionPool(self):
+    return self.useConnectionPool
+
+
+  """
+  @param bool useConnectionPool
+  """
+  def setUseConnectionPool(self, useConnectionPool):
+    self.useConnectionPool = useConnectionPool
+
+
+  """
+  @return int
+  """
+  def getConnectionPoolSize(self):
+    return self.connectionPoolSize
+
+
+  """
+  @param int connectionPoolSize
+  """
+  def setConnectionPoolSize(self, connectionPoolSize):
+    if connectionPoolSize < 1:
+      raise ValueError('The connection pool size must be at least 1.')
+
+    self.connectionPoolSize = connectionPoolSize
+
+
+  """
+  @return float
+  """
+  def getConnectionIdleTimeout(self):
+    return self.connectionIdleTimeout
+
+
+  """
+  @param float connectionIdleTimeout
+  """
+  def setConnectionIdleTimeout(self, connectionIdleTimeout):
+    self.connectionIdleTimeout = connectionIdleTimeout
+
+
+  """
+  @return int
+  """
+  def getTransactionConcurrency(self):
+    return self.transactionConcurrency
+
+
+  """
+  @param int transactionConcurrency
+  """
+  def setTransactionConcurrency(self, transactionConcurrency):
+    if transactionConcurrency < 1:
+      raise ValueError('The transaction concurrency must be at least 1.')
+
+    self.transactionConcurrency = transactionConcurrency
+
+
+  """
+  @return string See self::TRANSACTION_ORDER_ constants
+  """
+  def getTransactionOrder(self):
+    return self.transactionOrder
+
+
+  """
+  @param string transactionOrder See self::TRANSACTION_ORDER_ constants
+  """
+  def setTransactionOrder(self, transactionOrder):
+    if transactionOrder not in Config.TRANSACTION_ORDERS:
+      raise ValueError('Transaction order has to be one of the Config.TRANSACTION_ORDER_ constant values.')
+
+    self.transactionOrder = transactionOrder
+
+
+  """
+  @return int
+  """
+  def getRetryMaxAttempts(self):
+    return self.retryMaxAttempts
+
+
+  """
+  @param int retryMaxAttempts
+  """
+  def setRetryMaxAttempts(self, retryMaxAttempts):
+    if retryMaxAttempts < 1:
+      raise ValueError('The maximum amount of attempts must be at least 1.')
+
+    self.retryMaxAttempts = retryMaxAttempts
+
+
+  """
+  @return float
+  """
+  def getRetryBackoff(self):
+    return self.retryBackoff
+
+
+  """
+  @param float retryBackoff
+  """
+  def setRetryBackoff(self, retryBackoff):
+    self.retryBackoff = retryBackoff
+
+
+  """
+  @return float
+  """
+  def getRetryMaxBackoff(self):
+    return self.retryMaxBackoff
+
+
+  """
+  @param float retryMaxBackoff
+  """
+  def setRetryMaxBackoff(self, retryMaxBackoff):
+    self.retryMaxBackoff = retryMaxBackoff
+
+
+  """
+  @return list
+  """
+  def getRetryOnStatus(self):
+    return self.retryOnStatus
+
+
+  """
+  @param list retryOnStatus
+  """
+  def setRetryOnStatus(self, retryOnStatus):
+    self.retryOnStatus = list(retryOnStatus)
+
+
+  """
+  @return int
+  """
+  def getCircuitBreakerThreshold(self):
+    return self.circuitBreakerThreshold
+
+
+  """
+  @param int circuitBreakerThreshold
+  """
+  def setCircuitBreakerThreshold(self, circuitBreakerThreshold):
+    self.circuitBreakerThreshold = circuitBreakerThreshold
+
+
+  """
+  @return float
+  """
+  def getCircuitBreakerResetTimeout(self):
+    return self.circuitBreakerResetTimeout
+
+
+  """
+  @param float circuitBreakerResetTimeout
+  """
+  def setCircuitBreakerResetTimeout(self, circuitBreakerResetTimeout):
+    self.circuitBreakerResetTimeout = circuitBreakerResetTimeout
+
+
+  """
+  @return float
+  """
+  def getRateLimit(self):
+    return self.rateLimit
+
+
+  """
+  @param float rateLimit
+  """
+  def setRateLimit(self, rateLimit):
+    self.rateLimit = rateLimit
+
+
+  """
+  @return int
+  """
+  def getRateLimitBurst(self):
+    return self.rateLimitBurst
+
+
+  """
+  @param int rateLimitBurst
+  """
+  def setRateLimitBurst(self, rateLimitBurst):
+    if rateLimitBurst < 1:
+      raise ValueError('The rate limit burst must be at least 1.')
+
+    self.rateLimitBurst = rateLimitBurst
+
+
+  """
+  @return float
+  """
+  def getAccountRateLimit(self):
+    return self.accountRateLimit
+
+
+  """
+  @param float accountRateLimit
+  """
+  def setAccountRateLimit(self, accountRateLimit):
+    self.accountRateLimit = accountRateLimit
+
+
+  """
+  @return int
+  """
+  def getAccountRateLimitBurst(self):
+    return self.accountRateLimitBurst
+
+
+  """
+  @param int accountRateLimitBurst
+  """
+  def setAccountRateLimitBurst(self, accountRateLimitBurst):
+    if accountRateLimitBurst < 1:
+      raise ValueError('The account rate limit burst must be at least 1.')
+
+    self.accountRateLimitBurst = accountRateLimitBurst
+
+
+  """
+  @return float
+  """
+  def getRateLimitMaxWait(self):
+    return self.rateLimitMaxWait
+
+
+  """
+  @param float rateLimitMaxWait
+  """
+  def setRateLimitMaxWait(self, rateLimitMaxWait):
+    self.rateLimitMaxWait = rateLimitMaxWait
+
+
+  """
+  @return int
+  """
+  def getSessionHitLimit(self):
+    return self.sessionHitLimit
+
+
+  """
+  @param int sessionHitLimit
+  """
+  def setSessionHitLimit(self, sessionHitLimit):
+    self.sessionHitLimit = sessionHitLimit
+
+
+  """
+  @return string See self::SESSION_LIMIT_ constants
+  """
+  def getSessionLimitPolicy(self):
+    return self.sessionLimitPolicy
+
+
+  """
+  @param string sessionLimitPolicy See self::SESSION_LIMIT_ constants
+  """
+  def setSessionLimitPolicy(self, sessionLimitPolicy):
+    if sessionLimitPolicy not in Config.SESSION_LIMIT_POLICIES:
+      raise ValueError('Session limit policy has to be one of the Config.SESSION_LIMIT_ constant values.')
+
+    self.sessionLimitPolicy = sessionLimitPolicy
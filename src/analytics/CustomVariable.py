@@ -69,7 +69,9 @@ class CustomVariable(object):
 
 
     def __init__(self, index=None, name=None, value=None, scope=None):
-        self.index = index
+        self._index = None
+        if index is not None:
+            self.index = index
 
         # WATCH OUT: It's a known issue that GA will not decode URL-encoded characters
         # in custom variable names and values properly, so spaces will show up
@@ -89,7 +91,7 @@ class CustomVariable(object):
         and http://xahlee.org/js/google_analytics_tracker_2010-07-01_expanded.js line 563
         """
 
-        if len( utils.encodeUriComponent(self.name + self.value) ) > 64:
+        if len( utils.encode_uri_component(self.name + self.value) ) > 64:
             raise CustomVariable.ValidationError('Custom Variable combined name and value encoded length must not be larger than 64 bytes.')
       
     
@@ -108,7 +110,7 @@ class CustomVariable(object):
         if not 1 <= index <= 5:
             raise ValueError('Custom Variable index has to be between 1 and 5.')
 
-        self.index = index 
+        self._index = index
 
     
     @property
@@ -121,5 +123,5 @@ class CustomVariable(object):
         if scope not in CustomVariable.SCOPES:
             raise ValueError('Custom Variable scope has to be one of the CustomVariable.SCOPE_ constant values.')
 
-        self.scope = scope
+        self._scope = scope
 
@@ -84,7 +84,7 @@ class Event(object):
        
     def validate(self):
         if self.category is None or self.action is None:
-            Event.ValidationError('Events need at least to have a category and action defined.')
+            raise Event.ValidationError('Events need at least to have a category and action defined.')
         
     
 
@@ -0,0 +1,342 @@
+
+
+""" 
+Generic Server-Side Google Analytics PHP Client
+
+This library is free software you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License (LGPL) as published by the Free Software Foundation either
+version 3 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA.
+
+Google Analytics is a registered trademark of Google Inc.
+
+@link      http://code.google.com/p/php-ga
+
+@license   http://www.gnu.org/licenses/lgpl.html
+@author    Thomas Bachem <tb@unitedprototype.com>
+@copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
+"""
+
+import copy
+import logging
+import multiprocessing
+import pickle
+import threading
+import time
+
+from analytics.Tracker import Tracker
+
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerError(Exception):
+    """ 
+    Result of the hits of a sender process that crashed, and of hits whose
+    exception could not be pickled to be reported back by their worker.
+    Defined at module level, so it can be pickled itself.
+    """
+    pass
+
+
+
+class SenderPool(object):
+    """ 
+    Process pool counterpart of Tracker.track_many(), for ingestion volumes a
+    single interpreter can not build and send because of the GIL.
+
+    Hits are sharded by the unique ID of their visitor, so all hits of a
+    visitor (and therefore of its sessions) are handled by the same worker
+    process, in the order they were given, keeping "__utmb" track counts
+    consistent. Every worker builds and sends its shard on its own through
+    Tracker.track_many(), then reports its results, its counters and the final
+    state of the sessions and visitors it touched back to the parent, which
+    applies that state to its own Session and Visitor objects.
+
+    Workers are forked for every track_many() call, so they always see the
+    current state of the tracker, and nothing but the results has to be
+    pickled. This requires the "fork" start method, i.e. a POSIX platform,
+    which is used regardless of the default start method.
+
+    Each worker gets its own range of campaign response counts ("__utmz"),
+    sized by the most requests its shard can build, so no two workers send
+    the same count. Counts of dropped hits are skipped, not reused.
+
+    WATCH OUT: Forking while another thread holds a lock leaves that lock
+    locked forever in the child. track_many() therefore refuses to run while
+    Dispatcher, Batcher or Spool threads are alive in the parent, i.e. the
+    parent itself must not use Config.fireAndForget, Config.batchRequests or
+    Config.spoolDirectory (the workers may, they start their own threads).
+
+    Every worker gets its own copy of the tracker's config:
+    - Config.rateLimit and Config.accountRateLimit are divided by the amount
+      of processes, so the pool as a whole keeps to them.
+    - Config.sendOnShutdown is ignored, as the workers flush their batched and
+      queued requests before reporting back anyway.
+
+    @ivar tracker:
+        Tracker the hits are tracked with
+
+    @ivar processes:
+        Amount of worker processes, defaults to the amount of CPUs
+    """
+
+    # Names of the threads whose locks forked workers could inherit in locked state
+    UNSAFE_THREAD_PREFIXES = ('analytics-dispatcher-', 'analytics-batcher', 'analytics-spool-')
+
+
+    def __init__(self, tracker, processes=None):
+        if tracker.config.getSpoolDirectory():
+            raise ValueError('The spool of Config.spoolDirectory can not be shared by multiple sender processes')
+
+        self.tracker = tracker
+        self.processes = processes or multiprocessing.cpu_count()
+
+        # Python 2 always forks on POSIX, Python 3 defaults to other start
+        # methods on some platforms
+        if hasattr(multiprocessing, 'get_context'):
+            self._context = multiprocessing.get_context('fork')
+        else:
+            self._context = multiprocessing
+
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.runs = 0
+        self.elapsed = 0.0
+
+
+    def shard(self, visitor):
+        """ 
+        @param Visitor visitor
+        @return int Index of the worker the hits of the given visitor are sent by
+        """
+        return visitor.unique_id % self.processes
+
+
+    def track_many(self, hits, transport=None):
+        """ 
+        Same as Tracker.track_many(), but spread over the worker processes.
+
+        @param iterable hits See Tracker.track_many()
+        @param callable transport See Tracker.track_many(), called within the workers
+        @raise RuntimeError if Dispatcher, Batcher or Spool threads are running
+        @return list One result per hit, see Tracker.track_many(). Exceptions
+                     that can not be pickled are returned as WorkerError
+                     carrying their message, and all hits of a worker that
+                     crashed get a WorkerError.
+        """
+        unsafe = [thread.name for thread in threading.enumerate()
+                  if thread.name.startswith(SenderPool.UNSAFE_THREAD_PREFIXES)]
+        if unsafe:
+            raise RuntimeError('Can not fork sender processes while these threads are running: %s'
+                               % ', '.join(sorted(unsafe)))
+
+        hits = list(hits)
+        started = time.time()
+
+        shards = [[] for i in range(self.processes)]
+        for index, hit in enumerate(hits):
+            # Generates missing unique IDs before forking, so the parent keeps them
+            shards[self.shard(hit[3])].append(index)
+
+        campaign = self.tracker.campaign
+        campaign_start = campaign_next = campaign.getResponselen() if campaign else 0
+
+        workers = []
+        for number, indexes in enumerate(shards):
+            if not indexes:
+                continue
+
+            reader, writer = self._context.Pipe(duplex=False)
+            process = self._context.Process(target=self._run_worker, name='analytics-sender-%d' % number,
+                                            args=(hits, indexes, transport, writer, campaign_next))
+            campaign_next += sum(SenderPool._max_requests(hits[index]) for index in indexes)
+            process.daemon = True
+            process.start()
+            # Only the child writes, so reading raises EOFError if it died before reporting
+            writer.close()
+            workers.append((process, reader, indexes, campaign_next))
+
+        results = [None] * len(hits)
+        campaign_used = campaign_start
+        stats = []
+
+        for process, reader, indexes, campaign_limit in workers:
+            try:
+                report = pickle.loads(reader.recv_bytes())
+            except EOFError:
+                report = None
+            reader.close()
+            process.join()
+
+            if report is None:
+                error = WorkerError('Sender process exited with code %s' % process.exitcode)
+                logger.error('%s, failing its %d hits', error, len(indexes))
+                for index in indexes:
+                    results[index] = error
+                # Its counts may have been sent before it died
+                campaign_used = max(campaign_used, campaign_limit)
+                continue
+
+            for index, result in zip(indexes, report['results']):
+                results[index] = result
+            for index, state in report['sessions']:
+                hits[index][2].__setstate__(state)
+            for index, state in report['visitors']:
+                hits[index][3].__setstate__(state)
+            campaign_used = max(campaign_used, report['campaign_responselen'])
+            stats.append(report['stats'])
+
+        if campaign_used > campaign_start:
+            campaign.increaseResponselen(campaign_used - campaign_start)
+
+        with self._lock:
+            for worker_stats in stats:
+                SenderPool._add_stats(self._stats, worker_stats)
+            self.runs += 1
+            self.elapsed += time.time() - started
+
+        return results
+
+
+    @staticmethod
+    def _max_requests(hit):
+        """ 
+        @return int Most requests the given track_many() hit may build
+        """
+        kind, payload = hit[0], hit[1]
+        if kind == Tracker.HIT_TRANSACTION:
+            return 1 + len(payload.items)
+        return 1
+
+
+    def _run_worker(self, hits, indexes, transport, writer, campaign_start):
+        """ 
+        Body of a forked worker process, reports back by writing a single
+        pickled dict to the given pipe.
+
+        @param int campaign_start Campaign response count the worker's range starts after
+        """
+        from analytics.Config import Config
+        from analytics.internals.Batcher import Batcher
+        from analytics.internals.Dispatcher import Dispatcher
+        from analytics.internals.RateLimiter import RateLimiter
+        from analytics.internals.RetryPolicy import RetryPolicy
+
+        started = time.time()
+
+        # A fresh config, so the per-config batcher, dispatcher, rate limiter
+        # etc. inherited from the parent are not shared with it
+        config = copy.copy(self.tracker.config)
+        config.setSendOnShutdown(False)
+        if config.getRateLimit():
+            config.setRateLimit(float(config.getRateLimit()) / self.processes)
+        if config.getAccountRateLimit():
+            config.setAccountRateLimit(float(config.getAccountRateLimit()) / self.processes)
+
+        tracker = self.tracker
+        tracker.config = config
+        if tracker.campaign:
+            tracker.campaign.setResponselen(campaign_start)
+
+        if transport is None:
+            from analytics.internals.requests.HttpRequest import HttpRequest
+            transport = HttpRequest.dispatch_many
+
+        counters = {'requests': 0, 'errors': 0}
+        def counting_transport(config, requests):
+            responses = transport(config, requests)
+            counters['requests'] += len(requests)
+            counters['errors'] += sum(1 for response in responses if isinstance(response, Exception))
+            return responses
+
+        shard = [hits[index] for index in indexes]
+        results = tracker.track_many(shard, counting_transport)
+
+        # Hits are handed over already, a failing flush is counted by the batcher's stats
+        try:
+            if config.getBatchRequests():
+                Batcher.for_config(config).flush()
+            if config.getFireAndForget():
+                Dispatcher.for_config(config).join()
+        except Exception:
+            logger.debug('Flushing sender process failed', exc_info=True)
+
+        sessions = {}
+        visitors = {}
+        for index in indexes:
+            kind, payload, session, visitor = hits[index]
+            sessions.setdefault(id(session), (index, session))
+            visitors.setdefault(id(visitor), (index, visitor))
+
+        stats = {
+            'hits': len(shard),
+            'requests': counters['requests'],
+            'failed': sum(1 for result in results if isinstance(result, Exception)),
+            'transport_errors': counters['errors'],
+            'dropped': sum(1 for result in results if result is None),
+            'busy': time.time() - started,
+            'retry_policy': RetryPolicy.for_config(config).stats(),
+            'rate_limiter': RateLimiter.for_config(config).stats(),
+        }
+        if config.getBatchRequests():
+            stats['batcher'] = Batcher.for_config(config).stats()
+        if config.getFireAndForget():
+            stats['dispatcher'] = Dispatcher.for_config(config).stats()
+
+        report = {
+            'results': [SenderPool._picklable(result) for result in results],
+            'sessions': [(index, session.__getstate__()) for index, session in sessions.values()],
+            'visitors': [(index, visitor.__getstate__()) for index, visitor in visitors.values()],
+            'campaign_responselen': tracker.campaign.getResponselen() if tracker.campaign else 0,
+            'stats': stats,
+        }
+        writer.send_bytes(pickle.dumps(report, pickle.HIGHEST_PROTOCOL))
+        writer.close()
+
+
+    @staticmethod
+    def _picklable(result):
+        values = result if isinstance(result, list) else [result]
+        for value in values:
+            if isinstance(value, Exception):
+                try:
+                    pickle.loads(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+                except Exception:
+                    return WorkerError('%s: %s' % (type(value).__name__, value))
+
+        return result
+
+
+    @staticmethod
+    def _add_stats(totals, stats):
+        for name, value in stats.items():
+            if isinstance(value, dict):
+                SenderPool._add_stats(totals.setdefault(name, {}), value)
+            else:
+                totals[name] = totals.get(name, 0) + value
+
+
+    def stats(self):
+        """ 
+        @return dict Counters of all workers of all track_many() calls summed
+                     up: hits, built requests, failed and dropped hits,
+                     transport errors, seconds the workers were busy, and the
+                     stats() of their retry policies, rate limiters, batchers
+                     and dispatchers; plus the amount of track_many() calls
+                     and the seconds they took
+        """
+        with self._lock:
+            stats = copy.deepcopy(self._stats)
+            stats['runs'] = self.runs
+            stats['elapsed'] = self.elapsed
+            return stats
@@ -24,8 +24,11 @@ Google Analytics is a registered trademark of Google Inc.
 @copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
 """
 
-from googleanalyics.internals import utils
 from datetime import datetime
+import struct
+import threading
+
+from analytics.internals import utils
 
 """ 
 You should serialize this object and store it in the user session to keep it
@@ -34,6 +37,9 @@ the GA Javascript client).
 """
 class Session(object):
 
+    class LimitExceededError(Exception):
+        pass
+
     """ 
     A unique per-session ID, will be mapped to "utmhid" parameter
 
@@ -61,7 +67,22 @@ class Session(object):
     """
 
 
+    __slots__ = ('sessionId', 'trackCount', 'startTime', '_lock')
+
+    """ 
+    Version of the to_bytes() format, stored as its first byte.
+    """
+    SERIALIZATION_VERSION = 1
+
+    """ 
+    Version, session ID, track count and start timestamp.
+    """
+    SERIALIZATION_FORMAT = struct.Struct('!BIIq')
+
+
     def __init__(self):
+        # Guards trackCount, as a session may be shared by concurrent requests
+        self._lock = threading.Lock()
         self.sessionId = None
         self.trackCount = None
         self.startTime = None
@@ -76,7 +97,7 @@ class Session(object):
     """
     def generateSessionId(self):
         # TODO: Integrate AdSense support
-        return utils.generate32bitRandom()
+        return utils.generate_32bit_random()
     
     
     """ 
@@ -108,14 +129,44 @@ class Session(object):
     
     
     """ 
+    Atomic, so no increments get lost if the session is shared between threads.
+
     @param int byAmount
+    @return int The new track count
     """
     def increaseTracklen(self, byAmount=1):
-        self.trackCount += byAmount
+        with self._lock:
+            self.trackCount += byAmount
+            return self.trackCount
     
 
     def increase_tracklen(self, by_amount=1):
-        self.track_count += by_amount
+        return self.increaseTracklen(by_amount)
+
+
+    """ 
+    Atomically increments the track count unless that would exceed the given
+    limit, in which case the session is either left alone or, if rollover is
+    set, turned into a new one counting this request as its first.
+
+    @see Config::sessionHitLimit
+    @param int limit
+    @param bool rollover
+    @return tuple (int|None new track count, None if the limit was reached
+                   without rollover, bool whether the session was rolled over)
+    """
+    def increaseTracklenUpTo(self, limit, rollover=False):
+        with self._lock:
+            if self.trackCount < limit:
+                self.trackCount += 1
+                return self.trackCount, False
+
+            if not rollover:
+                return None, False
+
+            self._rollover()
+            self.trackCount = 1
+            return self.trackCount, True
 
     """ 
     @return DateTime
@@ -129,5 +180,60 @@ class Session(object):
     """
     def setStartTime(self, startTime):
         self.startTime = startTime
+
+
+    """ 
+    Turns this session into a new one, e.g. once it reached the amount of
+    requests Google Analytics processes per session.
+
+    @see Config::sessionLimitPolicy
+    """
+    def rollover(self):
+        with self._lock:
+            self._rollover()
+
+
+    def _rollover(self):
+        self.sessionId = self.generateSessionId()
+        self.trackCount = 0
+        self.startTime = datetime.now()
     
 
+
+    def __getstate__(self):
+        return (self.sessionId, self.trackCount, self.startTime)
+
+
+    def __setstate__(self, state):
+        self.sessionId, self.trackCount, self.startTime = state
+        self._lock = threading.Lock()
+
+
+    """ 
+    Compact fixed-width binary representation to store instead of a pickle,
+    with the start time truncated to whole seconds.
+
+    @return string
+    """
+    def to_bytes(self):
+        return Session.SERIALIZATION_FORMAT.pack(Session.SERIALIZATION_VERSION, self.sessionId,
+                                                 self.trackCount, int(utils.totimestamp(self.startTime)))
+
+
+    """ 
+    @param string data As returned by to_bytes()
+    @return Session
+    """
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) != Session.SERIALIZATION_FORMAT.size or ord(data[:1]) != Session.SERIALIZATION_VERSION:
+            raise ValueError('Unsupported session serialization format')
+
+        version, session_id, track_count, start_time = Session.SERIALIZATION_FORMAT.unpack(data)
+
+        instance = cls.__new__(cls)
+        instance._lock = threading.Lock()
+        instance.sessionId = session_id
+        instance.trackCount = track_count
+        instance.startTime = datetime.fromtimestamp(start_time)
+        return instance
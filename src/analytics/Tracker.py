@@ -27,12 +27,15 @@ Google Analytics is a registered trademark of Google Inc.
 """
 
 import re
+import threading
 
-from analytics.internals.request.PageviewRequest import PageviewRequest
-from analytics.internals.request.EventRequest import EventRequest
-from analytics.internals.request.TransactionRequest import TransactionRequest
-from analytics.internals.request.ItemRequest import ItemRequest
-from analytics.internals.request.SocialInteractionRequest import SocialInteractionRequest
+from analytics.Config import Config
+from analytics.internals import utils
+from analytics.internals.requests.PageviewRequest import PageviewRequest
+from analytics.internals.requests.EventRequest import EventRequest
+from analytics.internals.requests.TransactionRequest import TransactionRequest
+from analytics.internals.requests.ItemRequest import ItemRequest
+from analytics.internals.requests.SocialInteractionRequest import SocialInteractionRequest
 
 
 class AnalyticsError(Exception):
@@ -52,10 +55,25 @@ class Tracker(object):
         with the GA Javascript Client
 
     @ivar custom_variables:
-        dict of CustomVariable
+        dict of CustomVariable by index, rendered into the "utme" parameter
+        once per change, see get_custom_variables_fragment()
         
     @ivar campaign:
         Campaign
+
+    @ivar config:
+        Config of this tracker, a default Config if none was given. Every
+        tracker has its own, so trackers with different configs can be used
+        side by side.
+
+    Thread safety: A tracker may be shared by any amount of threads calling
+    its track_* methods concurrently. Adding or removing custom variables is
+    safe as well, though requests already in flight may or may not pick up
+    the change. Session and Campaign counters are incremented atomically, so
+    a Session may be shared between threads, too. Configs, Visitors and the
+    remaining tracker attributes are not synchronized and should not be
+    modified once they are in use by other threads; Visitor.unique_id in
+    particular is generated lazily and should be set before sharing a Visitor.
     """
 
     VERSION = '5.2.2' # As of 15.11.2011
@@ -70,24 +88,32 @@ class Tracker(object):
     @link http://code.google.com/apis/analytics/docs/gaJS/changelog.html
     """
 
-    config = None
-    """
-    @type analytics.Config
-    """
+    # Kinds of hits accepted by track_many()
+    HIT_PAGEVIEW = 'pageview'
+    HIT_EVENT = 'event'
+    HIT_TRANSACTION = 'transaction'
+    HIT_SOCIAL = 'social'
 
 
     def __init__(self, account_id, domain_name, config=None):
-        Tracker.config = config
+        self.config = config if config is not None else Config()
+
+        self._lock = threading.Lock()
+        self._static_query_string = None
+        self._static_query_string_key = None
+        self._domain_hash = None
+        self._custom_variables = {}
+        self._custom_variables_version = 0
+        self._custom_variables_fragment = None
 
         self.allow_hash = True
-        self.custom_variables = {}
         self.campaign = None
         
         self.account_id = account_id
         self.domain_name = domain_name
 
 
-    RE_VALID_GA_ACCOUNT_ID = re.compile(r'UA-[0-9]-[0-9]')
+    RE_VALID_GA_ACCOUNT_ID = re.compile(r'^UA-[0-9]*-[0-9]*$')
 
     @property
     def account_id(self):
@@ -99,6 +125,7 @@ class Tracker(object):
             raise ValueError('%s is not a valid Google Analytics account ID.' % value)
 
         self._account_id = value
+        self._static_query_string = None
 
 
     @property
@@ -108,6 +135,8 @@ class Tracker(object):
     @domain_name.setter
     def domain_name(self, value):
         self._domain_name = value
+        self._static_query_string = None
+        self._domain_hash = None
 
 
     @property
@@ -117,6 +146,52 @@ class Tracker(object):
     @allow_hash.setter
     def allow_hash(self, value):
         self._allow_hash = value
+        self._static_query_string = None
+        self._domain_hash = None
+
+
+    @property
+    def domain_hash(self):
+        """
+        Hash of the domain name as used in the "__utma", "__utmb", "__utmc" and
+        "__utmz" cookie parameters, or 1 if hashing is not allowed. Computed
+        once and cached until domain_name or allow_hash change.
+
+        @link http://code.google.com/p/gaforflash/source/browse/trunk/src/com/google/analytics/v4/Tracker.as#585
+        @rtype int
+        """
+        if self._domain_hash is None:
+            if self.allow_hash:
+                self._domain_hash = utils.generate_hash(self.domain_name)
+            else:
+                self._domain_hash = 1
+
+        return self._domain_hash
+
+
+    def get_static_query_string(self, config):
+        """
+        Returns the already encoded "utmwv", "utmac", "utmhn" and "aip" parameters,
+        which are the same for all requests of this tracker. Gets rebuilt whenever
+        one of them changes.
+
+        @param analytics.Config config
+        @rtype string
+        """
+        key = bool(config and config.getAnonymizeIpAddresses())
+        if self._static_query_string is None or self._static_query_string_key != key:
+            parameters = [
+                ('utmwv', Tracker.VERSION),
+                ('utmac', self.account_id),
+                ('utmhn', self.domain_name),
+            ]
+            if key:
+                parameters.append(('aip', 1))
+
+            self._static_query_string = utils.build_query_string(parameters)
+            self._static_query_string_key = key
+
+        return self._static_query_string
 
 
     def add_custom_variable(self, custom_variable):
@@ -129,11 +204,17 @@ class Tracker(object):
         custom_variable.validate()
         
         index = custom_variable.index
-        self.custom_variables[index] = custom_variable
+        with self._lock:
+            self._custom_variables[index] = custom_variable
+            self._custom_variables_changed()
 
 
     @property
     def custom_variables(self):
+        """
+        WATCH OUT: Only change custom variables through add_custom_variable() and
+        remove_custom_variable(), otherwise the cached "utme" fragment gets stale.
+        """
         return self._custom_variables
 
 
@@ -141,7 +222,63 @@ class Tracker(object):
         """
         Equivalent of _deleteCustomVar() in GA Javascript client.
         """
-        del self.custom_variables[index]
+        with self._lock:
+            del self._custom_variables[index]
+            self._custom_variables_changed()
+
+
+    def _custom_variables_changed(self):
+        self._custom_variables_version += 1
+        self._custom_variables_fragment = None
+
+
+    @property
+    def custom_variables_version(self):
+        """
+        Incremented on every change of the custom variables.
+
+        @rtype int
+        """
+        return self._custom_variables_version
+
+
+    def get_custom_variables_fragment(self):
+        """
+        Returns the custom variables rendered as X10 "utme" fragment, or an empty
+        string if there are none. Rendered once and cached until the custom
+        variables change.
+
+        @link http://xahlee.org/js/google_analytics_tracker_2010-07-01_expanded.js line 575
+        @rtype string
+        """
+        fragment = self._custom_variables_fragment
+        if fragment is not None:
+            return fragment
+
+        with self._lock:
+            from analytics.CustomVariable import CustomVariable
+            from analytics.internals.X10 import X10
+            from analytics.internals.requests.Request import Request
+
+            if len(self._custom_variables) > 5:
+                # See http://code.google.com/intl/de-DE/apis/analytics/docs/tracking/gaTrackingCustomVariables.html#usage
+                raise Exception('The sum of all custom variables cannot exceed 5 in any given request.')
+
+            x10 = X10()
+            for custom_var in self._custom_variables.values():
+                # Name and value get encoded here,
+                # see http://xahlee.org/js/google_analytics_tracker_2010-07-01_expanded.js line 563
+                name  = utils.encode_uri_component(custom_var.name)
+                value = utils.encode_uri_component(custom_var.value)
+
+                x10.set_key(Request.X10_CUSTOMVAR_NAME_PROJECT_ID, custom_var.index, name)
+                x10.set_key(Request.X10_CUSTOMVAR_VALUE_PROJECT_ID, custom_var.index, value)
+                if custom_var.scope is not None and custom_var.scope != CustomVariable.SCOPE_PAGE:
+                    x10.set_key(Request.X10_CUSTOMVAR_SCOPE_PROJECT_ID, custom_var.index, custom_var.scope)
+
+            fragment = self._custom_variables_fragment = x10.render_url_string()
+
+        return fragment
 
 
     @property
@@ -166,12 +303,7 @@ class Tracker(object):
 
         @link http://code.google.com/apis/analytics/docs/gaJS/gaJSApiBasicConfiguration.html#_gat.GA_Tracker_._trackPageview
         """
-        request = PageviewRequest(Tracker.config)
-        request.page = page
-        request.session = session
-        request.visitor = visitor
-        request.tracker = self
-        request.fire()
+        self._pageview_request(page, session, visitor).fire()
 
 
     def track_event(self, event, session, visitor):
@@ -180,15 +312,7 @@ class Tracker(object):
 
         @link http://code.google.com/apis/analytics/docs/gaJS/gaJSApiEventTracking.html#_gat.GA_EventTracker_._trackEvent
         """
-        # Ensure that all required parameters are set
-        event.validate()
-        
-        request = EventRequest(Tracker.config)
-        request.event = event
-        request.session = session
-        request.visitor = visitor
-        request.tracker = self
-        request.fire()
+        self._event_request(event, session, visitor).fire()
 
 
     def track_transaction(self, transaction, session, visitor):
@@ -200,45 +324,198 @@ class Tracker(object):
         @link http://code.google.com/apis/analytics/docs/gaJS/gaJSApiEcommerce.html#_gat.GA_Tracker_._addTrans
         @link http://code.google.com/apis/analytics/docs/gaJS/gaJSApiEcommerce.html#_gat.GA_Tracker_._addItem
         @link http://code.google.com/apis/analytics/docs/gaJS/gaJSApiEcommerce.html#_gat.GA_Tracker_._trackTrans
+
+        When sending synchronously, item requests are sent concurrently, see
+        Config.transactionConcurrency and Config.transactionOrder. The other
+        delivery modes only enqueue them.
+
+        @raise Exception The first error any of the requests failed with. With
+                         Config.TRANSACTION_ORDER_TRANSACTION_FIRST, the items
+                         are not sent at all if the transaction request failed.
+        """
+        from analytics.Config import Config
+        from analytics.internals.requests.HttpRequest import HttpRequest
+
+        # All requests are built up front, so the item requests don't have to
+        # wait for each other's round trips
+        requests = self._transaction_requests(transaction, session, visitor)
+        http_requests = [request.buildHttpRequest() for request in requests]
+        # Requests dropped by Config.sessionLimitPolicy
+        http_requests = [request for request in http_requests if request is not None]
+        config = requests[0].getConfig()
+        concurrency = config.getTransactionConcurrency()
+
+        if config.getTransactionOrder() == Config.TRANSACTION_ORDER_TRANSACTION_FIRST and http_requests:
+            # Items of a transaction GA did not get would be orphaned
+            for result in HttpRequest.dispatch_many(config, http_requests[:1]):
+                if isinstance(result, Exception):
+                    raise result
+            http_requests = http_requests[1:]
+        results = HttpRequest.dispatch_concurrently(config, http_requests, concurrency)
+
+        # All requests got sent, now report the first failure, if any
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+
+
+    """ 
+      Equivalent of _track_social() in GA Javascript client.
+      
+    @link http://code.google.com/apis/analytics/docs/tracking/gaTrackingSocial.html#settingUp
+    """
+    def track_social(self, social_interaction, page, session, visitor):
+        self._social_request(social_interaction, page, session, visitor).fire()
+
+
+    def track_many(self, hits, transport=None):
+        """
+        Builds all given hits in one go and hands them over to the transport in
+        bulk. The values every request of this tracker shares (static query
+        string, domain hash, custom variables) are computed once for all of them.
+
+        A hit that fails to validate, build or send does not affect the others,
+        its exception is returned as its result instead.
+
+        @param iterable hits (kind, payload, session, visitor) tuples, kind being one of the
+                             HIT_ constants and payload the respective Page, Event or Transaction,
+                             or a (SocialInteraction, Page) tuple for HIT_SOCIAL
+        @param callable transport Taking (config, list of urllib2.Request) and returning one
+                                  response or exception per request, defaults to
+                                  HttpRequest.dispatch_many, which honours the config's
+                                  delivery mode (synchronous, batched, fire and forget, ...)
+        @return list One result per hit: the response, a list of responses for
+                     transactions (transaction first, then its items), the exception,
+                     or None if the hit got dropped by Config.sessionLimitPolicy
+        """
+        if transport is None:
+            from analytics.internals.requests.HttpRequest import HttpRequest
+            transport = HttpRequest.dispatch_many
+
+        # Warm the per-tracker caches once, instead of in the first hit's request
+        self.domain_hash
+        self.get_custom_variables_fragment()
+
+        results = []
+        built = []
+        http_requests = []
+        config = None
+
+        for index, (kind, payload, session, visitor) in enumerate(hits):
+            results.append(None)
+            try:
+                requests = self._hit_requests(kind, payload, session, visitor)
+                hit_http_requests = [request.buildHttpRequest() for request in requests]
+            except Exception as e:
+                results[index] = e
+                continue
+
+            # Requests dropped by Config.sessionLimitPolicy
+            hit_http_requests = [request for request in hit_http_requests if request is not None]
+            if not hit_http_requests:
+                continue
+
+            config = config or requests[0].getConfig()
+            built.append((index, kind, len(hit_http_requests)))
+            http_requests.extend(hit_http_requests)
+
+        if not http_requests:
+            return results
+
+        responses = transport(config, http_requests)
+
+        position = 0
+        for index, kind, count in built:
+            hit_responses = responses[position:position + count]
+            position += count
+
+            errors = [response for response in hit_responses if isinstance(response, Exception)]
+            if errors:
+                results[index] = errors[0]
+            elif kind == Tracker.HIT_TRANSACTION:
+                results[index] = hit_responses
+            else:
+                results[index] = hit_responses[0]
+
+        return results
+
+
+    def _hit_requests(self, kind, payload, session, visitor):
+        """
+        @return list The requests of a track_many() hit
+        """
+        if kind == Tracker.HIT_PAGEVIEW:
+            return [self._pageview_request(payload, session, visitor)]
+        elif kind == Tracker.HIT_EVENT:
+            return [self._event_request(payload, session, visitor)]
+        elif kind == Tracker.HIT_TRANSACTION:
+            return self._transaction_requests(payload, session, visitor)
+        elif kind == Tracker.HIT_SOCIAL:
+            social_interaction, page = payload
+            return [self._social_request(social_interaction, page, session, visitor)]
+
+        raise ValueError('Unknown hit kind %r' % (kind,))
+
+
+    def _pageview_request(self, page, session, visitor):
+        request = PageviewRequest(self.config)
+        request.page = page
+        request.session = session
+        request.visitor = visitor
+        request.tracker = self
+        return request
+
+
+    def _event_request(self, event, session, visitor):
+        # Ensure that all required parameters are set
+        event.validate()
+        
+        request = EventRequest(self.config)
+        request.event = event
+        request.session = session
+        request.visitor = visitor
+        request.tracker = self
+        return request
+
+
+    def _transaction_requests(self, transaction, session, visitor):
+        """
+        @return list The TransactionRequest followed by one ItemRequest per item
         """
         # Ensure that all required parameters are set
         transaction.validate()
         
-        request = TransactionRequest(Tracker.config)
+        request = TransactionRequest(self.config)
         request.setTransaction(transaction)
         request.setSession(session)
         request.setVisitor(visitor)
         request.setTracker(self)
-        request.fire()
+        requests = [request]
         
         # Every item gets a separate request,
         # see http://code.google.com/p/gaforflash/source/browse/trunk/src/com/google/analytics/v4/Tracker.as#312
-        for item in transaction.getItems():
+        for item in transaction.items.values():
             # Ensure that all required parameters are set
             item.validate()
             
-            request = ItemRequest(Tracker.config)
+            request = ItemRequest(self.config)
             request.setItem(item)
             request.setSession(session)
             request.setVisitor(visitor)
             request.setTracker(self)
-            request.fire()
-        
+            requests.append(request)
 
+        return requests
 
-    """ 
-      Equivalent of _track_social() in GA Javascript client.
-      
-    @link http://code.google.com/apis/analytics/docs/tracking/gaTrackingSocial.html#settingUp
-    """
-    def track_social(self, social_interaction, page, session, visitor):
-        request = SocialInteractionRequest(Tracker.config)
+
+    def _social_request(self, social_interaction, page, session, visitor):
+        request = SocialInteractionRequest(self.config)
         request.social_interaction = social_interaction
         request.page = page
         request.session = session
         request.visitor = visitor
         request.tracker = self
-        request.fire()
+        return request
 
 
     """ 
@@ -250,14 +527,8 @@ class Tracker(object):
     @param string method
     """
 
-    @classmethod
-    def raiseError(cls, message, logger):
-        from analytics.Config import Config
-
-        if cls.config:
-            errorSeverity = cls.config.getErrorSeverity()
-        else:
-            errorSeverity = Config.ERROR_SEVERITY_EXCEPTIONS
+    def raiseError(self, message, logger):
+        errorSeverity = self.config.getErrorSeverity()
         
         if errorSeverity == Config.ERROR_SEVERITY_SILENCE:
             pass
@@ -78,7 +78,7 @@ class Transaction(object):
     
     
     def validate(self):
-        if not self.items:
+        if not self._items:
             raise Transaction.ValidationError('Transactions need to consist of at least one item.')
         
     
@@ -88,11 +88,12 @@ class Transaction(object):
         @link http://code.google.com/apis/analytics/docs/gaJS/gaJSApiEcommerce.html#_gat.GA_Tracker_._addItem
         """
         # Associated items inherit the transaction's order ID
-        item.oder_id = self.order_id
+        item.setOrderId(self.order_id)
         
-        self.items[item.sku] = item
+        self._items[item.sku] = item
     
     
+    @property
     def items(self):
         return self._items
     
@@ -104,9 +105,8 @@ class Transaction(object):
     
     @order_id.setter
     def order_id(self, order_id):
-        self.order_id = order_id
+        self.orderId = order_id
         
         # Update order IDs of all associated items too
-        for item in self.items:
-            item.set_order_id(order_id)
-        
+        for item in self._items.values():
+            item.setOrderId(order_id)
@@ -27,10 +27,18 @@ Google Analytics is a registered trademark of Google Inc.
 """
 from datetime import datetime
 import re
+import struct
 
 from analytics.internals import utils
 
 
+# Cache miss marker, as None is a valid cached parse result
+_MISSING = object()
+
+# Language range of RFC 4647, e.g. "de", "de-DE" or "es-419"
+_LANGUAGE_RANGE_RE = re.compile(r'^[A-Za-z]{1,8}(-[A-Za-z0-9]{1,8})*$')
+
+
 class Visitor(object):
     """ 
     You should serialize this object and store it in the user database to keep it
@@ -75,11 +83,43 @@ class Visitor(object):
         Visitor's screen resolution, e.g. "1024x768", will be mapped to "utmsr" parameter
     """
 
+    __slots__ = (
+        '_unique_id',
+        'first_visit_time',
+        'previous_visit_time',
+        'current_visit_time',
+        'visit_count',
+        'ip_address',
+        'user_agent',
+        'locale',
+        'flash_version',
+        'java_enabled',
+        'screen_color_depth',
+        'screen_resolution',
+    )
+
+    """ 
+    Version of the to_bytes() format, stored as its first byte.
+    """
+    SERIALIZATION_VERSION = 1
+
+    """ 
+    Version, flags, unique ID, first/previous/current visit timestamps, visit count
+    and screen color depth, followed by the strings of SERIALIZED_STRINGS.
+    """
+    SERIALIZATION_HEADER = struct.Struct('!BBIqqqIH')
+
+    SERIALIZED_STRINGS = ('ip_address', 'user_agent', 'locale', 'flash_version', 'screen_resolution')
+
+    FLAG_UNIQUE_ID = 1
+    FLAG_JAVA_ENABLED_SET = 2
+    FLAG_JAVA_ENABLED = 4
+
     def __init__(self):
         """ 
         Creates a visitor without any previous visit information.
         """
-        self.unique_id = None
+        self._unique_id = None
 
         # ga.js sets all three timestamps to now for visitors, so we do the same
         now = datetime.now()
@@ -107,63 +147,162 @@ class Visitor(object):
             raise ValueError('The given "__utma" cookie value is invalid')
             #return self
         
-        self.unique_id = parts[1]
-        self.first_visit_time = datetime.fromtimestamp(parts[2])
-        self.previous_visit_time = datetime.fromtimestamp(parts[3])
-        self.current_visit_time = datetime.fromtimestamp(parts[4])
-        self.visit_count = parts[5]
+        self.unique_id = int(parts[1])
+        self.first_visit_time = datetime.fromtimestamp(int(parts[2]))
+        self.previous_visit_time = datetime.fromtimestamp(int(parts[3]))
+        self.current_visit_time = datetime.fromtimestamp(int(parts[4]))
+        self.visit_count = int(parts[5])
         
         # Allow chaining
         return self
 
 
-    RE_VALID_IP_ADDR = re.compile(r'^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$')
-    RE_PRIVATE_IP_ADDR = re.compile(r'^(?:127\.0\.0\.1|10\.|192\.168\.|172\.(?:1[6-9]|2[0-9]|3[0-1])\.)')
-    RE_LOCALES = re.compile(r'(^|\s,\s)([a-zA-Z]1,8(-[a-zA-Z]1,8))\s(\sq\s=\s(1(\.00,3)?|0(\.[0-9]0,3)))?', re.I)
-    # http://www.w3.org/Protocols/rfc2616/rfc2616-sec14.html#sec14.4
+    @staticmethod
+    def from_utma_many(values, skip_invalid=False):
+        """ 
+        Bulk counterpart of from_utma() for backfills, e.g. from cookie logs.
+        The values are parsed into columns of plain integers, Visitor objects
+        are only created for the rows that get accessed.
+
+        @param iterable values "__utma" cookie values, consumed lazily
+        @param bool skip_invalid Whether to count and skip malformed values instead of raising ValueError
+        @rtype VisitorBatch
+        """
+        from analytics.VisitorBatch import VisitorBatch
+
+        return VisitorBatch.from_utma_many(values, skip_invalid)
+
+
+    """ 
+    Private address ranges as (network, netmask) pairs of packed IPv4 addresses,
+    which are never sent as the visitor's IP address.
+    """
+    PRIVATE_IP_RANGES = (
+        (0x7f000000, 0xff000000), # 127.0.0.0/8
+        (0x0a000000, 0xff000000), # 10.0.0.0/8
+        (0xac100000, 0xfff00000), # 172.16.0.0/12
+        (0xc0a80000, 0xffff0000), # 192.168.0.0/16
+    )
+
+    """ 
+    Parse results by raw header values, as the same few proxy addresses,
+    Accept-Language headers etc. show up for many visitors.
+    """
+    IP_ADDRESS_CACHE = utils.LRUCache(4096)
+    LOCALE_CACHE = utils.LRUCache(1024)
+
+    # Keys to take the IP address from, in order, "X_FORWARDED_FOR" is what php-ga used
+    IP_ADDRESS_KEYS = ('HTTP_X_FORWARDED_FOR', 'X_FORWARDED_FOR', 'REMOTE_ADDR')
 
     def from_server_var(self, environ):
         """ 
         Will extract information for the "ip_address", "user_agent" and "locale" properties
-        from the given _SERVER variable.
+        from the given _SERVER variable, or WSGI environ.
         """
-        if not environ.get('REMOTE_ADDR'):
-            ip = None
-            for key in ['X_FORWARDED_FOR', 'REMOTE_ADDR']:
-                if environ.get(key) and not ip:
-                    ips = environ[key].split(',')
-                    ip  = ips[-1].strip()
-                    
-                    # Double-check if the address has a valid format
-                    if not Visitor.RE_VALID_IP_ADDR.match(ip):
-                        ip = None
-                    
-                    # Exclude private IP address ranges
-                    if Visitor.RE_PRIVATE_IP_ADDR.match(ip):
-                        ip = None
-            if ip:
-                self.ip_address = ip
+        if environ.get('REMOTE_ADDR'):
+            for key in Visitor.IP_ADDRESS_KEYS:
+                value = environ.get(key)
+                if value:
+                    ip = Visitor.IP_ADDRESS_CACHE.get(value, _MISSING)
+                    if ip is _MISSING:
+                        # The last address is the one added by the closest proxy
+                        ip = Visitor.parse_public_ip_address(value.rpartition(',')[2])
+                        Visitor.IP_ADDRESS_CACHE.put(value, ip)
+                    if ip:
+                        self.ip_address = ip
+                        break
         
-        self.user_agent = environ.get('HTTP_USER_AGENT')
+        if environ.get('HTTP_USER_AGENT'):
+            self.user_agent = environ['HTTP_USER_AGENT']
         
-        if environ.get('HTTP_ACCEPT_LANGUAGE'):
-            parsed_locales = {}
-            res = Visitor.RE_LOCALES.match(environ['HTTP_ACCEPT_LANGUAGE'])
-            if res:
-                matches = list(res.groups())
-                matches[2] = map(lambda part: part.replace('-','_'), matches[2])
-                matches[5] = map(lambda part: 1 if part == '' else part, matches[5])
-                parsed_locales = dict(zip(matches[2], matches[5]))
-                
-                # put biggest key from parsed_locales into self.locale
-                # TODO verify with php-ga developers
-                maxkey = max(parsed_locales.iterkeys(), key=float)
-                self.locale = maxkey
+        value = environ.get('HTTP_ACCEPT_LANGUAGE')
+        if value:
+            locale = Visitor.LOCALE_CACHE.get(value, _MISSING)
+            if locale is _MISSING:
+                locale = Visitor.parse_accept_language(value)
+                Visitor.LOCALE_CACHE.put(value, locale)
+            if locale:
+                self.locale = locale
         
         # Allow chaining
         return self
 
 
+    @staticmethod
+    def parse_public_ip_address(value):
+        """ 
+        @param string value
+        @return string The normalized dotted-quad IPv4 address, or None if the value
+                       is no valid IPv4 address or lies within a private range
+        """
+        parts = value.strip().split('.')
+        if len(parts) != 4 or not ''.join(parts).isdigit():
+            return None
+
+        try:
+            octets = [int(part) for part in parts]
+        except ValueError:
+            # Empty part
+            return None
+
+        if max(octets) > 255:
+            return None
+
+        packed = (octets[0] << 24) | (octets[1] << 16) | (octets[2] << 8) | octets[3]
+        for network, netmask in Visitor.PRIVATE_IP_RANGES:
+            if packed & netmask == network:
+                return None
+
+        return '%d.%d.%d.%d' % tuple(octets)
+
+
+    @staticmethod
+    def parse_accept_language(value):
+        """ 
+        Returns the language range with the highest quality value (the first one
+        on ties), with "-" replaced by "_", e.g. "de_DE".
+
+        @link http://www.w3.org/Protocols/rfc2616/rfc2616-sec14.html#sec14.4
+        @param string value "Accept-Language" header value
+        @return string None if no valid language range is found
+        """
+        best = None
+        best_quality = -1.0
+
+        for item in value.split(','):
+            tag, _, params = item.partition(';')
+            tag = tag.strip()
+
+            # Malformed ranges, and the wildcard "*", which says nothing about
+            # the visitor's locale
+            if not _LANGUAGE_RANGE_RE.match(tag):
+                continue
+
+            quality = 1.0
+            if params:
+                name, _, q = params.partition('=')
+                if name.strip().lower() != 'q':
+                    continue
+                try:
+                    quality = float(q)
+                except ValueError:
+                    continue
+                # A quality of 0 marks the range as not acceptable
+                if not 0.0 < quality <= 1.0:
+                    continue
+
+            if quality > best_quality:
+                best = tag
+                best_quality = quality
+                if quality == 1.0:
+                    break
+
+        if best is None:
+            return None
+
+        return best.replace('-', '_')
+
+
     def generate_hash(self):
         """ 
         Generates a hashed value from user-specific properties.
@@ -171,9 +310,46 @@ class Visitor(object):
         @link http://code.google.com/p/gaforflash/source/browse/trunk/src/com/google/analytics/v4/Tracker.as#542
         @rtype int
         """
-        # TODO: Emulate orginal Google Analytics client library generation more closely
-        string = self.user_agent + self.screen_resolution + self.screen_color_depth
-        return utils.generate_hash(string)
+        return self.get_derived_attributes()[0]
+
+
+    """ 
+    Values derived from the user agent, screen and locale properties, by these
+    properties. There are only a few thousand distinct combinations of them
+    among all visitors, so they are computed once per combination per process.
+    """
+    DERIVED_ATTRIBUTES_CACHE = utils.LRUCache(8192)
+
+    def get_derived_attributes(self):
+        """ 
+        Returns the generate_hash() value and the normalized locale as used for
+        the "utmul" parameter, both cached by (user_agent, screen_resolution,
+        screen_color_depth, locale).
+
+        @return tuple (int hash, string utmul) utmul is None if no locale is set
+        """
+        key = (self.user_agent, self.screen_resolution, self.screen_color_depth, self.locale)
+        derived = Visitor.DERIVED_ATTRIBUTES_CACHE.get(key)
+        if derived is None:
+            # TODO: Emulate orginal Google Analytics client library generation more closely
+            string = '%s%s%s' % (self.user_agent or '', self.screen_resolution or '', self.screen_color_depth or '')
+            hash_ = utils.generate_hash(string)
+
+            # Ensure correct locale format, see https://developer.mozilla.org/en/navigator.language
+            utmul = self.locale.replace('_', '-').lower() if self.locale else None
+
+            derived = (hash_, utmul)
+            Visitor.DERIVED_ATTRIBUTES_CACHE.put(key, derived)
+
+        return derived
+
+
+    @staticmethod
+    def derived_attributes_stats():
+        """ 
+        @return dict Size, hits and misses of the cache behind get_derived_attributes()
+        """
+        return Visitor.DERIVED_ATTRIBUTES_CACHE.stats()
 
 
     def generate_unique_id(self):
@@ -196,17 +372,17 @@ class Visitor(object):
         Will be generated on first call (if not set already) to include as much
         user-specific information as possible.
         """
-        if self.unique_id is None:
-            self.unique_id = self.generate_unique_id()
+        if self._unique_id is None:
+            self._unique_id = self.generate_unique_id()
         
-        return self.unique_id
+        return self._unique_id
 
     @unique_id.setter
     def unique_id(self, value):
-        if value < 0 or value > 0x7fffffff:
+        if value is not None and (value < 0 or value > 0x7fffffff):
             raise ValueError('Visitor unique ID has to be a 32-bit integer between 0 and %d' % 0x7fffffff)
         
-        self.unique_id = value
+        self._unique_id = value
 
 
     def add_session(self, session):
@@ -216,8 +392,97 @@ class Visitor(object):
           
         @param Session session
         """
-        start_time = session.start_time
+        start_time = session.getStartTime()
         if start_time != self.current_visit_time:
-            self.previousVisitTime = self.current_visit_time
+            self.previous_visit_time = self.current_visit_time
             self.current_visit_time  = start_time
             self.visit_count += 1
+
+
+    def __getstate__(self):
+        return dict((name, getattr(self, name)) for name in Visitor.__slots__)
+
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+    def to_bytes(self):
+        """ 
+        Compact binary representation to store instead of a pickle, with visit
+        times truncated to whole seconds. Restore with Visitor.from_bytes().
+
+        @rtype string
+        """
+        flags = 0
+        if self._unique_id is not None:
+            flags |= Visitor.FLAG_UNIQUE_ID
+        if self.java_enabled is not None:
+            flags |= Visitor.FLAG_JAVA_ENABLED_SET
+            if self.java_enabled:
+                flags |= Visitor.FLAG_JAVA_ENABLED
+
+        # Converting local times is the expensive part, and all three are the
+        # same for new visitors
+        first_visit_time = int(utils.totimestamp(self.first_visit_time))
+        if self.previous_visit_time == self.first_visit_time:
+            previous_visit_time = first_visit_time
+        else:
+            previous_visit_time = int(utils.totimestamp(self.previous_visit_time))
+        if self.current_visit_time == self.previous_visit_time:
+            current_visit_time = previous_visit_time
+        else:
+            current_visit_time = int(utils.totimestamp(self.current_visit_time))
+
+        header = Visitor.SERIALIZATION_HEADER.pack(
+            Visitor.SERIALIZATION_VERSION,
+            flags,
+            self._unique_id or 0,
+            first_visit_time,
+            previous_visit_time,
+            current_visit_time,
+            self.visit_count,
+            int(self.screen_color_depth or 0),
+        )
+
+        return header + utils.pack_strings([self.ip_address, self.user_agent, self.locale,
+                                            self.flash_version, self.screen_resolution])
+
+
+    @classmethod
+    def from_bytes(cls, data):
+        """ 
+        @param string data As returned by to_bytes()
+        @rtype Visitor
+        """
+        if not data or ord(data[:1]) != Visitor.SERIALIZATION_VERSION:
+            raise ValueError('Unsupported visitor serialization format')
+
+        try:
+            (version, flags, unique_id, first_visit_time, previous_visit_time, current_visit_time,
+             visit_count, screen_color_depth) = Visitor.SERIALIZATION_HEADER.unpack_from(data)
+        except struct.error:
+            raise ValueError('Truncated visitor data')
+
+        strings, offset = utils.unpack_strings(data, Visitor.SERIALIZATION_HEADER.size,
+                                               len(Visitor.SERIALIZED_STRINGS))
+
+        instance = cls.__new__(cls)
+        instance._unique_id = unique_id if flags & Visitor.FLAG_UNIQUE_ID else None
+        instance.first_visit_time = datetime.fromtimestamp(first_visit_time)
+        if previous_visit_time == first_visit_time:
+            instance.previous_visit_time = instance.first_visit_time
+        else:
+            instance.previous_visit_time = datetime.fromtimestamp(previous_visit_time)
+        if current_visit_time == previous_visit_time:
+            instance.current_visit_time = instance.previous_visit_time
+        else:
+            instance.current_visit_time = datetime.fromtimestamp(current_visit_time)
+        instance.visit_count = visit_count
+        instance.java_enabled = bool(flags & Visitor.FLAG_JAVA_ENABLED) if flags & Visitor.FLAG_JAVA_ENABLED_SET else None
+        instance.screen_color_depth = screen_color_depth or None
+        (instance.ip_address, instance.user_agent, instance.locale,
+         instance.flash_version, instance.screen_resolution) = strings
+
+        return instance
@@ -0,0 +1,177 @@
+
+
+""" 
+Generic Server-Side Google Analytics PHP Client
+
+This library is free software you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License (LGPL) as published by the Free Software Foundation either
+version 3 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA.
+
+Google Analytics is a registered trademark of Google Inc.
+
+@link      http://code.google.com/p/php-ga
+
+@license   http://www.gnu.org/licenses/lgpl.html
+@author    Thomas Bachem <tb@unitedprototype.com>
+@copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
+"""
+
+from array import array
+from datetime import datetime
+
+
+class VisitorBatch(object):
+    """ 
+    Columnar result of Visitor.from_utma_many(): one array per "__utma" field,
+    so parsing millions of cookie values allocates neither Visitor nor datetime
+    objects. Rows are only turned into Visitor objects when accessed by index
+    or iterated over.
+
+    @ivar domain_hashes:
+        array of the domain hashes the cookies were set for
+
+    @ivar unique_ids:
+        array of the visitors' unique IDs
+
+    @ivar first_visit_times:
+        array of the first visit timestamps (seconds)
+
+    @ivar previous_visit_times:
+        array of the previous visit timestamps (seconds)
+
+    @ivar current_visit_times:
+        array of the current visit timestamps (seconds)
+
+    @ivar visit_counts:
+        array of the visit counts
+
+    @ivar invalid:
+        Amount of values that were skipped because they were malformed
+    """
+
+    # Value ranges of the 'L' and 'l' array columns, out of range values have
+    # to be rejected before appending as the arrays raise OverflowError
+    UNSIGNED_MAX = 2 ** (8 * array('L').itemsize) - 1
+    SIGNED_MIN = -2 ** (8 * array('l').itemsize - 1)
+    SIGNED_MAX = 2 ** (8 * array('l').itemsize - 1) - 1
+
+
+    def __init__(self):
+        self.domain_hashes = array('L')
+        self.unique_ids = array('L')
+        self.first_visit_times = array('l')
+        self.previous_visit_times = array('l')
+        self.current_visit_times = array('l')
+        self.visit_counts = array('L')
+        self.invalid = 0
+
+
+    @classmethod
+    def from_utma_many(cls, values, skip_invalid=False):
+        """ 
+        Parses the given "__utma" cookie values, consuming the iterable lazily.
+
+        @param iterable values
+        @param bool skip_invalid Whether to count and skip malformed values, including
+                                 values that are no strings, instead of raising ValueError
+        @rtype VisitorBatch
+        """
+        batch = cls()
+
+        # Bound methods, looked up once instead of once per value
+        add_domain_hash = batch.domain_hashes.append
+        add_unique_id = batch.unique_ids.append
+        add_first_visit_time = batch.first_visit_times.append
+        add_previous_visit_time = batch.previous_visit_times.append
+        add_current_visit_time = batch.current_visit_times.append
+        add_visit_count = batch.visit_counts.append
+        unsigned_max = cls.UNSIGNED_MAX
+        signed_min = cls.SIGNED_MIN
+        signed_max = cls.SIGNED_MAX
+
+        for i, value in enumerate(values):
+            try:
+                parts = value.split('.')
+                if len(parts) != 6:
+                    raise ValueError('The given "__utma" cookie value is invalid')
+
+                domain_hash, unique_id, first_visit_time, previous_visit_time, current_visit_time, visit_count = map(int, parts)
+                if not 0 <= unique_id <= 0x7fffffff:
+                    raise ValueError('Visitor unique ID has to be a 32-bit integer between 0 and %d' % 0x7fffffff)
+                if not (0 <= domain_hash <= unsigned_max and 0 <= visit_count <= unsigned_max):
+                    raise ValueError('Domain hash and visit count have to be integers between 0 and %d' % unsigned_max)
+                if not (signed_min <= first_visit_time <= signed_max and signed_min <= previous_visit_time <= signed_max
+                        and signed_min <= current_visit_time <= signed_max):
+                    raise ValueError('Visit times have to be integers between %d and %d' % (signed_min, signed_max))
+            except (AttributeError, TypeError):
+                # No string at all, e.g. None for a missing cookie
+                error = 'The given "__utma" cookie value has to be a string'
+            except ValueError as e:
+                error = e
+            else:
+                # Append only once the whole value is valid, so the columns stay aligned
+                add_domain_hash(domain_hash)
+                add_unique_id(unique_id)
+                add_first_visit_time(first_visit_time)
+                add_previous_visit_time(previous_visit_time)
+                add_current_visit_time(current_visit_time)
+                add_visit_count(visit_count)
+                continue
+
+            if skip_invalid:
+                batch.invalid += 1
+                continue
+            raise ValueError('%s (value #%d: %r)' % (error, i, value))
+
+        return batch
+
+
+    def __len__(self):
+        return len(self.unique_ids)
+
+
+    def __getitem__(self, index):
+        """ 
+        Materializes the Visitor of the given row. A slice returns a new
+        VisitorBatch of the selected rows, without materializing them.
+
+        @param int|slice index
+        @return Visitor|VisitorBatch
+        """
+        from analytics.Visitor import Visitor
+
+        if isinstance(index, slice):
+            batch = VisitorBatch()
+            batch.domain_hashes = self.domain_hashes[index]
+            batch.unique_ids = self.unique_ids[index]
+            batch.first_visit_times = self.first_visit_times[index]
+            batch.previous_visit_times = self.previous_visit_times[index]
+            batch.current_visit_times = self.current_visit_times[index]
+            batch.visit_counts = self.visit_counts[index]
+            return batch
+
+        visitor = Visitor()
+        visitor.unique_id = self.unique_ids[index]
+        visitor.first_visit_time = datetime.fromtimestamp(self.first_visit_times[index])
+        visitor.previous_visit_time = datetime.fromtimestamp(self.previous_visit_times[index])
+        visitor.current_visit_time = datetime.fromtimestamp(self.current_visit_times[index])
+        visitor.visit_count = self.visit_counts[index]
+        return visitor
+
+
+    def __iter__(self):
+        """ 
+        Lazily materializes one Visitor per row.
+        """
+        for index in range(len(self)):
+            yield self[index]
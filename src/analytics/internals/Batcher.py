@@ -0,0 +1,394 @@
+"""
+Generic Server-Side Google Analytics PHP Client
+
+This library is free software you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License (LGPL) as published by the Free Software Foundation either
+version 3 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA.
+
+Google Analytics is a registered trademark of Google Inc.
+
+@link      http://code.google.com/p/php-ga
+
+@license   http://www.gnu.org/licenses/lgpl.html
+@author    Thomas Bachem <tb@unitedprototype.com>
+@copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
+"""
+
+from collections import deque, OrderedDict
+import logging
+import os
+import threading
+import time
+import weakref
+
+from analytics.internals.compat import request_data, request_selector, to_bytes, to_native, urllib2
+
+
+logger = logging.getLogger(__name__)
+
+
+class Batcher(object):
+    """
+    Packs the payloads of many already built requests, newline-separated, into
+    a single POST request to Config.batchEndPointPath, similar to the batch
+    endpoint of the Measurement Protocol.
+
+    A batch is sent by a background thread as soon as it reached
+    Config.batchMaxHits hits or would exceed Config.batchMaxBytes bytes, or
+    once its oldest hit waited for Config.batchFlushInterval seconds. Hits of
+    different accounts are sent in separate batches.
+
+    The batcher only references its config while hits are pending, so an
+    idle batcher does not keep the config alive, and its thread stops once
+    the config got garbage collected. A forked child process starts with
+    empty batches and its own thread.
+
+    WATCH OUT: Per-hit "User-Agent" and "X-Forwarded-For" headers can not be
+    transported within a batch, only the query string payloads are.
+
+    @ivar config:
+        Config the batch limits and the endpoint are read from, None once it
+        got garbage collected
+
+    @ivar send:
+        Callable taking (config, request) that actually transmits a request,
+        defaults to HttpRequest.send_request
+    """
+
+    # Full batches waiting for the background thread before adding hits blocks
+    MAX_FULL_BATCHES = 8
+
+    _batchers = weakref.WeakKeyDictionary()
+    _batchers_lock = threading.Lock()
+
+
+    def __init__(self, config, send=None):
+        if send is None:
+            from analytics.internals.requests.HttpRequest import HttpRequest
+            send = HttpRequest.send_request
+
+        self._config = weakref.ref(config, self._collected)
+        # Strong reference to the config while hits are pending or in flight
+        self._busy_config = None
+        self.send = send
+
+        self._init_batches()
+        self._thread = None
+        self._pid = None
+        self._stopped = False
+
+        self.hits = 0
+        self.batches = 0
+        self.failed = 0
+
+
+    @classmethod
+    def for_config(cls, config, send=None):
+        """
+        Returns the batcher belonging to the given config, creating it on first use.
+
+        @rtype Batcher
+        """
+        with cls._batchers_lock:
+            batcher = cls._batchers.get(config)
+            if batcher is None:
+                batcher = cls._batchers[config] = cls(config, send)
+
+            return batcher
+
+
+    @staticmethod
+    def get_payload(request):
+        """
+        Extracts the already encoded query string from a built urllib2.Request.
+
+        @rtype string
+        """
+        data = request_data(request)
+        if data is not None:
+            return to_native(data)
+
+        return request_selector(request).partition('?')[2]
+
+
+    @property
+    def config(self):
+        return self._config()
+
+
+    def _init_batches(self):
+        self._payloads = []
+        self._size = 0
+        self._oldest = None
+        self._full = deque()
+        # Reentrant, as dropping the last reference to the config within a
+        # locked section runs _collected() right away
+        self._lock = threading.RLock()
+        self._added = threading.Condition(self._lock)
+        self._taken = threading.Condition(self._lock)
+
+
+    def _collected(self, ref):
+        with self._lock:
+            self._stopped = True
+            self._added.notify_all()
+
+
+    def _start(self):
+        """
+        Threads do not survive a fork, so (re)start the timer lazily per process.
+        Hits batched by the parent are left to the parent, and the locks are
+        replaced, as they may have been held by one of its threads.
+        """
+        if self._pid == os.getpid():
+            return
+
+        with Batcher._batchers_lock:
+            if self._pid == os.getpid():
+                return
+
+            if self._pid is not None:
+                self._init_batches()
+                self._busy_config = None
+
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='analytics-batcher')
+            self._thread.daemon = True
+            self._thread.start()
+
+
+    def put(self, request):
+        """
+        Adds a built request to the current batch, handing the batch over to
+        the background thread if a size limit is reached.
+        """
+        self.put_payload(Batcher.get_payload(request), getattr(request, 'spool_id', None),
+                         getattr(request, 'account_id', None))
+
+
+    def put_payload(self, payload, spool_id=None, account_id=None):
+        """
+        @param string payload Already encoded query string of a hit
+        @param int spool_id Sequence number to acknowledge in the spool once the batch got sent
+        @param string account_id Google Analytics account the hit is rate limited for
+        """
+        max_hits = self.config.getBatchMaxHits()
+        max_bytes = self.config.getBatchMaxBytes()
+
+        self._start()
+
+        with self._lock:
+            # Adding the payload (plus its newline) would exceed the byte limit
+            if self._payloads and self._size + len(payload) + 1 > max_bytes:
+                self._hand_over()
+
+            self._payloads.append((payload, spool_id, account_id))
+            self._busy_config = self.config
+            self._size += len(payload) + 1
+            self.hits += 1
+            if self._oldest is None:
+                self._oldest = time.time()
+                self._added.notify()
+
+            if len(self._payloads) >= max_hits or self._size >= max_bytes:
+                self._hand_over()
+
+
+    def _hand_over(self):
+        # Only waits if the background thread fell behind by MAX_FULL_BATCHES
+        while len(self._full) >= Batcher.MAX_FULL_BATCHES:
+            self._taken.wait()
+
+        if self._payloads:
+            self._full.append(self._take())
+            self._added.notify()
+
+
+    def _take(self):
+        payloads, self._payloads = self._payloads, []
+        self._size = 0
+        self._oldest = None
+        return payloads
+
+
+    def _split(self, payloads):
+        """
+        Splits the given payloads into batches per account honouring the
+        configured limits.
+
+        @return list
+        """
+        max_hits = self.config.getBatchMaxHits()
+        max_bytes = self.config.getBatchMaxBytes()
+
+        accounts = OrderedDict()
+        for entry in payloads:
+            accounts.setdefault(entry[2], []).append(entry)
+
+        batches = []
+        for entries in accounts.values():
+            batches.append([])
+            size = 0
+            for entry in entries:
+                batch = batches[-1]
+                if batch and (len(batch) >= max_hits or size + len(entry[0]) + 1 > max_bytes):
+                    batches.append([])
+                    size = 0
+                batches[-1].append(entry)
+                size += len(entry[0]) + 1
+
+        return batches
+
+
+    def _send_batches(self, payloads, deadline=None):
+        """
+        Sends the given payloads in as few batches as the limits allow.
+
+        @raise Exception The error of the last failing batch, if any
+        """
+        # A failing batch must not keep the following ones from being sent
+        error = None
+        for batch in self._split(payloads):
+            try:
+                self._send_batch(batch, deadline)
+            except Exception as e:
+                error = e
+
+        if error is not None:
+            raise error
+
+
+    def send_payloads(self, payloads, deadline=None):
+        """
+        Sends the given hits right away in the calling thread, bypassing the
+        current batch, e.g. when the process is about to exit.
+
+        @param list payloads (payload, spool_id, account_id) tuples, see put_payload()
+        @param float deadline time.time() timestamp no request may wait past
+        @return int Amount of hits that got delivered
+        """
+        delivered = 0
+        for batch in self._split(payloads):
+            try:
+                self._send_batch(batch, deadline)
+            except Exception:
+                logger.debug('Sending batch failed', exc_info=True)
+            else:
+                delivered += len(batch)
+
+        return delivered
+
+
+    def _send_batch(self, payloads, deadline=None):
+        body = '\n'.join(payload for payload, spool_id, account_id in payloads)
+        url = 'http://' + self.config.getEndPointHost() + self.config.getBatchEndPointPath()
+        request = urllib2.Request(url, data=to_bytes(body))
+        # Don't ask me why "text/plain", but ga.js says so :)
+        request.add_header('Content-Type', 'text/plain')
+        request.add_header('Content-Length', str(len(body)))
+        # All hits of a batch belong to the same account, and each of them
+        # takes a token from the rate limiter
+        request.account_id = payloads[0][2]
+        request.hit_count = len(payloads)
+        if deadline is not None:
+            request.deadline = deadline
+
+        spool_ids = [spool_id for payload, spool_id, account_id in payloads if spool_id is not None]
+        spool = None
+        if spool_ids:
+            from analytics.internals.Spool import Spool
+            spool = Spool.for_config(self.config)
+
+        try:
+            self.send(self.config, request)
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            if spool is not None:
+                # Left for Spool.replay(), unless the batch failed for good
+                from analytics.internals.RetryPolicy import RetryPolicy
+                replayable = RetryPolicy.for_config(self.config).is_replayable(e)
+                for spool_id in spool_ids:
+                    spool.fail(spool_id, replayable)
+            raise
+        else:
+            with self._lock:
+                self.batches += 1
+
+        if spool is not None:
+            for spool_id in spool_ids:
+                spool.ack(spool_id)
+
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._full:
+                    payloads = self._full.popleft()
+                    self._taken.notify_all()
+                elif self._oldest is None:
+                    if self._stopped:
+                        return
+                    self._added.wait()
+                    continue
+                else:
+                    remaining = self._oldest + self.config.getBatchFlushInterval() - time.time()
+                    if remaining > 0:
+                        self._added.wait(remaining)
+                        continue
+
+                    payloads = self._take()
+
+                # Keeps the config alive while sending
+                config = self._busy_config
+                if not self._payloads and not self._full:
+                    self._busy_config = None
+
+            try:
+                self._send_batches(payloads)
+            except Exception:
+                logger.debug('Sending batch failed', exc_info=True)
+
+            # Do not keep the config alive while waiting for the next hits
+            config = payloads = None
+
+
+    def flush(self, deadline=None):
+        """
+        Sends the full batches the background thread did not get to yet and
+        the current batch right away, regardless of its size and age.
+
+        @param float deadline time.time() timestamp no request may wait past
+        """
+        with self._lock:
+            payloads = [entry for full in self._full for entry in full] + self._take()
+            self._full.clear()
+            self._busy_config = None
+            self._taken.notify_all()
+
+        if payloads:
+            self._send_batches(payloads, deadline)
+
+
+    def stats(self):
+        """
+        @return dict Counters of batched hits, sent and failed batches, and the
+                     amount of hits waiting in the current and full batches
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'batches': self.batches,
+                'failed': self.failed,
+                'pending': len(self._payloads) + sum(len(full) for full in self._full),
+            }
@@ -0,0 +1,154 @@
+"""
+Generic Server-Side Google Analytics PHP Client
+
+This library is free software you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License (LGPL) as published by the Free Software Foundation either
+version 3 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA.
+
+Google Analytics is a registered trademark of Google Inc.
+
+@link      http://code.google.com/p/php-ga
+
+@license   http://www.gnu.org/licenses/lgpl.html
+@author    Thomas Bachem <tb@unitedprototype.com>
+@copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
+"""
+
+
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request while the circuit breaker of its
+    endpoint host is open.
+    """
+    pass
+
+
+class CircuitBreaker(object):
+    """
+    Per-host circuit breaker. After Config.circuitBreakerThreshold consecutive
+    failures the circuit opens and requests to the host are rejected right
+    away, without touching the network, for Config.circuitBreakerResetTimeout
+    seconds. After that a single probe request is let through, which closes
+    the circuit again if it succeeds, or keeps it open for another period if
+    it fails.
+
+    @ivar host:
+        Endpoint host, e.g. "www.google-analytics.com"
+
+    @ivar threshold:
+        Consecutive failures after which the circuit opens
+
+    @ivar reset_timeout:
+        Seconds the circuit stays open before a probe request is let through
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    _breakers = {}
+    _breakers_lock = threading.Lock()
+
+
+    def __init__(self, host, threshold=5, reset_timeout=30):
+        self.host = host
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = CircuitBreaker.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._lock = threading.Lock()
+
+        self.trips = 0
+        self.rejected = 0
+
+
+    @classmethod
+    def for_host(cls, host, threshold=5, reset_timeout=30):
+        """
+        Returns the circuit breaker for the given host, creating it on first use.
+
+        @rtype CircuitBreaker
+        """
+        with cls._breakers_lock:
+            breaker = cls._breakers.get(host)
+            if breaker is None:
+                breaker = cls._breakers[host] = cls(host, threshold, reset_timeout)
+            else:
+                breaker.threshold = threshold
+                breaker.reset_timeout = reset_timeout
+
+            return breaker
+
+
+    @classmethod
+    def stats_all(cls):
+        """
+        @return dict stats() of every circuit breaker by host
+        """
+        with cls._breakers_lock:
+            breakers = list(cls._breakers.values())
+
+        return dict((breaker.host, breaker.stats()) for breaker in breakers)
+
+
+    def allow(self):
+        """
+        @return bool Whether a request to the host may be sent now
+        """
+        with self._lock:
+            if self.state == CircuitBreaker.CLOSED:
+                return True
+
+            if self.state == CircuitBreaker.OPEN and time.time() - self._opened_at >= self.reset_timeout:
+                # Let exactly one probe request through
+                self.state = CircuitBreaker.HALF_OPEN
+                return True
+
+            self.rejected += 1
+            return False
+
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self.state = CircuitBreaker.CLOSED
+
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == CircuitBreaker.HALF_OPEN or (self.state == CircuitBreaker.CLOSED and
+                                                          self._failures >= self.threshold):
+                self.state = CircuitBreaker.OPEN
+                self._opened_at = time.time()
+                self.trips += 1
+
+
+    def stats(self):
+        """
+        @return dict Current state, consecutive failures, and counters of trips
+                     and rejected requests
+        """
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self._failures,
+                'trips': self.trips,
+                'rejected': self.rejected,
+            }
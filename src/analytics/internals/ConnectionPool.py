@@ -0,0 +1,228 @@
+"""
+Generic Server-Side Google Analytics PHP Client
+
+This library is free software you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License (LGPL) as published by the Free Software Foundation either
+version 3 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA.
+
+Google Analytics is a registered trademark of Google Inc.
+
+@link      http://code.google.com/p/php-ga
+
+@license   http://www.gnu.org/licenses/lgpl.html
+@author    Thomas Bachem <tb@unitedprototype.com>
+@copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
+"""
+
+import errno
+import os
+import socket
+import threading
+import time
+
+from analytics.internals.compat import PY2, httplib
+
+
+class ConnectError(socket.error):
+    """
+    Raised if no connection to the endpoint host could be established, i.e.
+    the request never left and can safely be sent again.
+    """
+    pass
+
+
+class ConnectionPool(object):
+    """
+    A pool of persistent HTTP/1.1 connections to a single endpoint host.
+
+    Connections are checked out for exactly one request/response cycle and
+    returned afterwards, so the TCP handshake is only paid when the pool is
+    empty. Connections that were idle for longer than idle_timeout are
+    discarded on checkout, and a request on a reused connection that fails
+    because the server already closed it is retried once on a fresh one.
+    Requests are never retried once any part of a response was read or
+    when they timed out, as the server may have processed them already.
+
+    @ivar host:
+        Endpoint host, e.g. "www.google-analytics.com"
+
+    @ivar size:
+        Maximum amount of idle connections kept around
+
+    @ivar idle_timeout:
+        Seconds after which an idle connection is not reused anymore
+    """
+
+    _pools = {}
+    _pools_lock = threading.Lock()
+    _pools_pid = None
+
+
+    def __init__(self, host, size=4, idle_timeout=30):
+        self.host = host
+        self.size = size
+        self.idle_timeout = idle_timeout
+
+        self._idle = []
+        self._lock = threading.Lock()
+
+
+    @classmethod
+    def for_host(cls, host, size=4, idle_timeout=30):
+        """
+        Returns the per-process pool for the given host, creating it on first use.
+        Pools are not shared with forked child processes, as sockets inherited
+        from the parent would get interleaved responses.
+
+        @rtype ConnectionPool
+        """
+        with cls._pools_lock:
+            if cls._pools_pid != os.getpid():
+                cls._pools = {}
+                cls._pools_pid = os.getpid()
+
+            pool = cls._pools.get(host)
+            if pool is None:
+                pool = cls._pools[host] = cls(host, size, idle_timeout)
+            else:
+                pool.size = size
+                pool.idle_timeout = idle_timeout
+
+            return pool
+
+
+    @classmethod
+    def close_all(cls):
+        with cls._pools_lock:
+            for pool in cls._pools.values():
+                pool.close()
+
+
+    def _checkout(self, timeout):
+        """
+        @return tuple (connection, reused)
+        """
+        now = time.time()
+        with self._lock:
+            while self._idle:
+                connection, last_used = self._idle.pop()
+                if now - last_used <= self.idle_timeout:
+                    connection.timeout = timeout
+                    if connection.sock:
+                        connection.sock.settimeout(timeout)
+                    return connection, True
+
+                connection.close()
+
+        return self._connect(timeout), False
+
+
+    def _connect(self, timeout):
+        """
+        Opens a new connection right away instead of on its first request, so
+        failing to connect can be told apart from failing to get a response.
+
+        @raise ConnectError
+        @rtype httplib.HTTPConnection
+        """
+        connection = httplib.HTTPConnection(self.host, timeout=timeout)
+        try:
+            connection.connect()
+        except socket.error as e:
+            connection.close()
+            raise ConnectError(e.errno, 'Could not connect to %s: %s' % (self.host, e))
+
+        return connection
+
+
+    def _checkin(self, connection):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((connection, time.time()))
+                return
+
+        connection.close()
+
+
+    @staticmethod
+    def is_stale(error):
+        """
+        @param Exception error Raised while sending a request or waiting for the status line
+        @return bool Whether the server closed the connection before the
+                     request reached it, so that it is safe to send it again
+        """
+        if isinstance(error, httplib.BadStatusLine):
+            # The connection got closed before a status line was received
+            return True
+
+        return (isinstance(error, socket.error) and not isinstance(error, socket.timeout)
+                and error.errno == errno.ECONNRESET)
+
+
+    def _roundtrip(self, connection, method, selector, body, headers):
+        connection.request(method, selector, body, headers)
+        if PY2:
+            # Unbuffered, Python 2 reads the status line and headers with one
+            # recv() per byte. Nothing is pipelined, so the buffer can not
+            # swallow the next response.
+            return connection.getresponse(buffering=True)
+        return connection.getresponse()
+
+
+    def request(self, method, selector, body=None, headers=None, timeout=None):
+        """
+        Sends a single request over a pooled connection.
+
+        @param string method
+        @param string selector Path including the query string
+        @param string body
+        @param dict headers
+        @param float timeout
+        @raise ConnectError if no connection could be established
+        @return tuple (httplib.HTTPResponse, string body)
+        """
+        headers = headers or {}
+        connection, reused = self._checkout(timeout)
+
+        try:
+            try:
+                response = self._roundtrip(connection, method, selector, body, headers)
+            except Exception as e:
+                if not reused or not ConnectionPool.is_stale(e):
+                    raise
+
+                # The kept-alive connection was closed by the server, reconnect once
+                connection.close()
+                connection = self._connect(timeout)
+                response = self._roundtrip(connection, method, selector, body, headers)
+
+            # The body always has to be consumed before the connection can be reused
+            data = response.read()
+        except Exception:
+            connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._checkin(connection)
+
+        return response, data
+
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+
+        for connection, last_used in idle:
+            connection.close()
@@ -0,0 +1,276 @@
+"""
+Generic Server-Side Google Analytics PHP Client
+
+This library is free software you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License (LGPL) as published by the Free Software Foundation either
+version 3 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA.
+
+Google Analytics is a registered trademark of Google Inc.
+
+@link      http://code.google.com/p/php-ga
+
+@license   http://www.gnu.org/licenses/lgpl.html
+@author    Thomas Bachem <tb@unitedprototype.com>
+@copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
+"""
+
+from collections import deque
+import logging
+import os
+import sys
+import threading
+import time
+import weakref
+
+from analytics.Config import Config
+from analytics.internals.compat import PY2
+
+
+logger = logging.getLogger(__name__)
+
+
+class Dispatcher(object):
+    """
+    Bounded in-memory queue of already built requests, drained by a pool of
+    daemon sender threads. Backs the Config.fireAndForget mode.
+
+    The dispatcher only references its config while requests are queued, so
+    an idle dispatcher does not keep the config alive, and its threads stop
+    once the config got garbage collected. A forked child process starts
+    with an empty queue and its own threads.
+
+    @ivar config:
+        Config the queue size, thread count and overflow policy are read from,
+        None once it got garbage collected
+
+    @ivar send:
+        Callable taking (config, request) that actually transmits a request,
+        defaults to HttpRequest.send_request
+    """
+
+    _dispatchers = weakref.WeakKeyDictionary()
+    _dispatchers_lock = threading.Lock()
+
+
+    def __init__(self, config, send=None):
+        if send is None:
+            from analytics.internals.requests.HttpRequest import HttpRequest
+            send = HttpRequest.send_request
+
+        self._config = weakref.ref(config, self._collected)
+        # Strong reference to the config while requests are queued or in flight
+        self._busy_config = None
+        self.send = send
+
+        self._init_queue()
+        self._threads = []
+        self._pid = None
+        self._stopped = False
+
+        self.queued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+
+
+    @classmethod
+    def for_config(cls, config, send=None):
+        """
+        Returns the dispatcher belonging to the given config, creating it on first use.
+
+        @rtype Dispatcher
+        """
+        with cls._dispatchers_lock:
+            dispatcher = cls._dispatchers.get(config)
+            if dispatcher is None:
+                dispatcher = cls._dispatchers[config] = cls(config, send)
+
+            return dispatcher
+
+
+    @property
+    def config(self):
+        return self._config()
+
+
+    def _init_queue(self):
+        self._queue = deque()
+        # Reentrant, as dropping the last reference to the config within a
+        # locked section runs _collected() right away
+        self._lock = threading.RLock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._all_done = threading.Condition(self._lock)
+        self._unfinished = 0
+
+
+    def _collected(self, ref):
+        with self._lock:
+            self._stopped = True
+            self._not_empty.notify_all()
+
+
+    def _start(self):
+        """
+        Threads do not survive a fork, so (re)start them lazily per process.
+        Requests queued by the parent are left to the parent, and the locks
+        are replaced, as they may have been held by one of its threads.
+        """
+        if self._pid == os.getpid():
+            return
+
+        with Dispatcher._dispatchers_lock:
+            if self._pid == os.getpid():
+                return
+
+            if self._pid is not None:
+                self._init_queue()
+                self._busy_config = None
+
+            self._pid = os.getpid()
+            self._start_threads()
+
+
+    def _start_threads(self):
+        self._threads = []
+        for i in range(self.config.getDispatchThreads()):
+            thread = threading.Thread(target=self._run, name='analytics-dispatcher-%d' % i)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+
+    def put(self, request):
+        """
+        Queues the request and returns immediately, unless the queue is full and
+        the overflow policy is Config.DISPATCH_OVERFLOW_BLOCK.
+
+        @return bool Whether the request got queued
+        """
+        self._start()
+
+        with self._lock:
+            policy = self.config.getDispatchOverflowPolicy()
+            max_size = self.config.getDispatchQueueSize()
+
+            if len(self._queue) >= max_size:
+                if policy == Config.DISPATCH_OVERFLOW_DROP_OLDEST:
+                    self._discard(self._queue.popleft())
+                    self._task_done()
+                    self.dropped += 1
+                elif policy == Config.DISPATCH_OVERFLOW_BLOCK:
+                    deadline = time.time() + self.config.getDispatchBlockTimeout()
+                    while len(self._queue) >= max_size:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            break
+                        self._not_full.wait(remaining)
+
+            if len(self._queue) >= max_size:
+                # Config.DISPATCH_OVERFLOW_DROP_NEWEST, or blocking timed out
+                self._discard(request)
+                self.dropped += 1
+                return False
+
+            self._queue.append(request)
+            self._busy_config = self.config
+            self._unfinished += 1
+            self.queued += 1
+            self._not_empty.notify()
+
+            return True
+
+
+    def _discard(self, request):
+        # Dropped requests must not be replayed from the spool later on
+        spool_id = getattr(request, 'spool_id', None)
+        if spool_id is not None and self.config.getSpoolDirectory():
+            from analytics.internals.Spool import Spool
+            Spool.for_config(self.config).discard(spool_id)
+
+
+    def _task_done(self):
+        self._unfinished -= 1
+        if not self._unfinished:
+            self._busy_config = None
+            self._all_done.notify_all()
+
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._queue:
+                    if self._stopped:
+                        return
+                    self._not_empty.wait()
+
+                request = self._queue.popleft()
+                config = self._busy_config
+                self._not_full.notify()
+
+            try:
+                self.send(config, request)
+            except Exception:
+                logger.debug('Sending queued request failed', exc_info=True)
+                success = False
+            else:
+                success = True
+
+            with self._lock:
+                if success:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+                self._task_done()
+
+            # Do not keep the config alive while waiting for the next request,
+            # Python 2 keeps the traceback of a failed send until the next one
+            config = request = None
+            if PY2:
+                sys.exc_clear()
+
+
+    def join(self, timeout=None):
+        """
+        Blocks until all queued requests have been sent or dropped.
+
+        @param float timeout Seconds to wait at most, None to wait forever
+        @return bool Whether the queue was fully drained
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            while self._unfinished:
+                if deadline is None:
+                    self._all_done.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                    self._all_done.wait(remaining)
+
+            return True
+
+
+    def stats(self):
+        """
+        @return dict Counters of queued, sent, failed and dropped requests, and
+                     the amount of requests currently waiting in the queue
+        """
+        with self._lock:
+            return {
+                'queued': self.queued,
+                'sent': self.sent,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'pending': len(self._queue),
+            }
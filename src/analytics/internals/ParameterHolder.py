@@ -27,60 +27,158 @@ Google Analytics is a registered trademark of Google Inc.
 """
 
 
-from analytics import Tracker
-
 """ 
 This simple class is mainly meant to be a well-documented overview of all
 possible GA tracking parameters.
 
+Every parameter is a slot, so there is no per-instance dict and no hashing
+involved when building the query string. Parameters are serialized in the
+order of ParameterHolder.PARAMETERS, which follows the order ga.js uses.
+
 @link http:#code.google.com/apis/analytics/docs/tracking/gaTrackingTroubleshooting.html#gifParameters
 """
-class AttrDict(dict):
-    """
-    A dictionary with attribute-style access. It maps attribute access to
-    the real dictionary.
-    
-    @link http://code.activestate.com/recipes/473786-dictionary-with-attribute-style-access/
-    """
+class ParameterHolder(object):
 
+    """ 
+    Parameter names in wire order. Cookie parameters are named "__utm*" on the
+    wire, but "_utm*" as attribute, as double underscore attributes would get
+    name-mangled within classes.
     """
-    Override defaults in a subclass to set default values for any instance of AttrDict
-    """
-    defaults = {}
+    PARAMETERS = (
+        # Google Analytics client version, e.g. "4.7.2"
+        'utmwv',
+        # Google Analytics account ID, e.g. "UA-1234567-8"
+        'utmac',
+        # Host Name, e.g. "www.example.com"
+        'utmhn',
+        # Indicates the type of request, which is one of null (for page), "event",
+        # "tran", "item", "social", "var" (deprecated) or "error" (used by ga.js
+        # for internal client error logging)
+        'utmt',
+        # Contains the amount of requests done in this session
+        'utms',
+        # Unique ID (random number) generated for each GIF request
+        'utmn',
+        # Whether event tracking is internal, which makes it not influence bounce rates
+        'utmni',
+        # Extensible Parameter, used for events and custom variables
+        'utme',
+        # Indicates the user's IP address, but is ignored by GA as of today
+        'utmip',
+        # Whether to anonymize IP addresses within Google Analytics/Urchin
+        'aip',
+        # Charset, e.g. "UTF-8"
+        'utmcs',
+        # Screen Resolution, e.g. "1024x768"
+        'utmsr',
+        # Screen Color Depth, e.g. "32-bit"
+        'utmsc',
+        # Visitor's locale string (all lower-case, country part optional), e.g. "de-de"
+        'utmul',
+        # Whether browser has Java support enabled
+        'utmje',
+        # Flash Version, e.g. "9.0 r124"
+        'utmfl',
+        # Page title
+        'utmdt',
+        # Random number used to link Analytics GIF requests with AdSense
+        'utmhid',
+        # Referral URL, e.g. "http://www.example.com/bar"
+        'utmr',
+        # Page request URI, e.g. "/path/page.html"
+        'utmp',
+        # Order ID, e.g. "a2343898"
+        'utmtid',
+        # Affiliation
+        'utmtst',
+        # Total Cost, e.g. "20.00"
+        'utmtto',
+        # Tax Cost, e.g. "4.23"
+        'utmttx',
+        # Shipping Cost, e.g. "3.95"
+        'utmtsp',
+        # City, e.g. "Cologne"
+        'utmtci',
+        # Region, e.g. "North Rhine-Westphalia"
+        'utmtrg',
+        # Country, e.g. "Germany"
+        'utmtco',
+        # Product Code, the SKU of the item, e.g. "989898ajssi"
+        'utmipc',
+        # Product Name, e.g. "T-Shirt"
+        'utmipn',
+        # Variation, e.g. "red"
+        'utmiva',
+        # Unit Price, e.g. "12.50"
+        'utmipr',
+        # Quantity, e.g. "4"
+        'utmiqt',
+        # Social network, e.g. "facebook"
+        'utmsn',
+        # Social action, e.g. "like"
+        'utmsa',
+        # Social action target, e.g. a URL
+        'utmsid',
+        # Whether this is a new campaign
+        'utmcn',
+        # Whether this is a repeated campaign
+        'utmcr',
+        # Visitor tracking cookie, e.g. "1123.1234567890.1234567890.1234567890.1234567890.1"
+        '__utma',
+        # Session timeout cookie parameter, e.g. "1123.1.10.1234567890"
+        '__utmb',
+        # Session tracking cookie parameter, e.g. "1123"
+        '__utmc',
+        # Campaign tracking cookie parameter, e.g. "1123.1234567890.1.1.utmcsr=(direct)|utmccn=(direct)|utmcmd=(none)"
+        '__utmz',
+        # Visitor-level custom variables cookie parameter (deprecated)
+        '__utmv',
+        # Cookie string containing the cookie parameters above
+        'utmcc',
+    )
+
+    __slots__ = tuple(name[1:] if name.startswith('__') else name for name in PARAMETERS)
+
+    DEFAULTS = {
+        'utmcs': '-',
+        'utmr': '-',
+        'utmfl': '-',
+        'utmje': '-',
+    }
 
-    def __init__(self, init={}):
-        init.update(self.__class__.defaults)
-        dict.__init__(self, init)
+    # Precomputed for __init__() and items(), which run for every hit
+    _INITIAL = tuple(zip(__slots__, map(DEFAULTS.get, __slots__)))
+    _NAMED = tuple(zip(__slots__, PARAMETERS))
 
-    def __getstate__(self):
-        return self.__dict__.items()
 
-    def __setstate__(self, items):
-        for key, val in items:
-            self.__dict__[key] = val
+    def __init__(self):
+        for attribute, default in ParameterHolder._INITIAL:
+            setattr(self, attribute, default)
 
-    def __repr__(self):
-        return "%s(%s)" % (self.__class__.__name__, dict.__repr__(self))
 
-    def __setitem__(self, key, value):
-        return super(AttrDict, self).__setitem__(key, value)
+    def get(self, attribute, default=None):
+        """
+        @param string attribute
+        @return mixed The value of the parameter, or default if it is not set
+        """
+        value = getattr(self, attribute)
+        return default if value is None else value
 
-    def __getitem__(self, name):
-        return super(AttrDict, self).__getitem__(name)
 
-    def __delitem__(self, name):
-        return super(AttrDict, self).__delitem__(name)
+    def items(self):
+        """
+        All set parameters in wire order, as consumed by utils.build_query_string().
 
-    __getattr__ = __getitem__
-    __setattr__ = __setitem__
+        @return list (parameter name, value) tuples
+        """
+        items = []
+        for attribute, name in ParameterHolder._NAMED:
+            value = getattr(self, attribute)
+            if value is not None:
+                items.append((name, value))
 
+        return items
 
 
-class ParameterHolder(AttrDict):
-    defaults = {
-        'utmwv': Tracker.VERSION,
-        'utmcs': '-',
-        'utmr': '-',
-        'utmfl': '-',
-        'utmje': '-',
-    }
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.items())
@@ -0,0 +1,204 @@
+"""
+Generic Server-Side Google Analytics PHP Client
+
+This library is free software you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License (LGPL) as published by the Free Software Foundation either
+version 3 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA.
+
+Google Analytics is a registered trademark of Google Inc.
+
+@link      http://code.google.com/p/php-ga
+
+@license   http://www.gnu.org/licenses/lgpl.html
+@author    Thomas Bachem <tb@unitedprototype.com>
+@copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
+"""
+
+
+import threading
+import time
+import weakref
+
+
+class RateLimitError(Exception):
+    """
+    Raised instead of sending a request if no token became available within
+    Config.rateLimitMaxWait seconds.
+    """
+    pass
+
+
+class TokenBucket(object):
+    """
+    Classic token bucket: tokens are refilled continuously at a fixed rate, up
+    to the burst size, and every hit takes one. A request of more hits than
+    the burst size could never be covered in full, it only waits for a full
+    bucket and leaves the rest as debt for the requests after it.
+
+    @ivar rate:
+        Tokens added per second
+
+    @ivar burst:
+        Maximum amount of tokens, i.e. requests that may be sent back to back
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+
+        self._tokens = self.burst
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+
+    def reserve(self, tokens=1):
+        """
+        Takes the given amount of tokens, going into debt if there are not enough.
+
+        @return float Seconds to wait until the taken tokens are actually available
+        """
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            missing = -self._tokens - max(0.0, tokens - self.burst)
+            return missing / self.rate if missing > 0 else 0.0
+
+
+    def matches(self, rate, burst):
+        """
+        @return bool Whether the bucket was built for the given rate and burst
+        """
+        return self.rate == float(rate) and self.burst == float(burst)
+
+
+    def cancel(self, tokens=1):
+        """
+        Returns tokens taken by reserve() which are not going to be used.
+        """
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + tokens)
+
+
+class RateLimiter(object):
+    """
+    Smooths bursts of requests into a steady send rate, with a global token
+    bucket (Config.rateLimit) and one per Google Analytics account
+    (Config.accountRateLimit). Senders wait for their turn, but give up with a
+    RateLimitError if that would take longer than Config.rateLimitMaxWait
+    seconds.
+
+    @ivar config:
+        Config the limits are read from
+    """
+
+    _limiters = weakref.WeakKeyDictionary()
+    _limiters_lock = threading.Lock()
+
+
+    def __init__(self, config):
+        # Only proxied, a strong reference would keep the key of the
+        # per-config registry alive forever
+        self.config = weakref.proxy(config)
+
+        self._global = None
+        self._accounts = {}
+        self._lock = threading.Lock()
+
+        self.acquired = 0
+        self.delayed = 0
+        self.rejected = 0
+        self.waited = 0.0
+
+
+    @classmethod
+    def for_config(cls, config):
+        """
+        Returns the rate limiter belonging to the given config, creating it on first use.
+
+        @rtype RateLimiter
+        """
+        with cls._limiters_lock:
+            limiter = cls._limiters.get(config)
+            if limiter is None:
+                limiter = cls._limiters[config] = cls(config)
+
+            return limiter
+
+
+    def _buckets(self, account_id):
+        # Buckets are rebuilt whenever their rate or burst got changed on the config
+        buckets = []
+        with self._lock:
+            rate = self.config.getRateLimit()
+            if rate:
+                burst = self.config.getRateLimitBurst()
+                if self._global is None or not self._global.matches(rate, burst):
+                    self._global = TokenBucket(rate, burst)
+                buckets.append(self._global)
+
+            rate = self.config.getAccountRateLimit()
+            if rate and account_id:
+                burst = self.config.getAccountRateLimitBurst()
+                bucket = self._accounts.get(account_id)
+                if bucket is None or not bucket.matches(rate, burst):
+                    bucket = self._accounts[account_id] = TokenBucket(rate, burst)
+                buckets.append(bucket)
+
+        return buckets
+
+
+    def acquire(self, account_id=None, tokens=1):
+        """
+        Blocks until a request for the given account may be sent.
+
+        @param string account_id None to only apply the global limit
+        @param int tokens Amount of hits the request carries, e.g. of a batch
+        @raise RateLimitError if the wait would exceed Config.rateLimitMaxWait
+        """
+        buckets = self._buckets(account_id)
+        if not buckets:
+            return
+
+        wait = max([bucket.reserve(tokens) for bucket in buckets])
+
+        if wait > self.config.getRateLimitMaxWait():
+            for bucket in buckets:
+                bucket.cancel(tokens)
+            with self._lock:
+                self.rejected += 1
+            raise RateLimitError('Rate limit exceeded, next slot in %.3f seconds' % wait)
+
+        with self._lock:
+            self.acquired += 1
+            if wait:
+                self.delayed += 1
+                self.waited += wait
+
+        if wait:
+            time.sleep(wait)
+
+
+    def stats(self):
+        """
+        @return dict Counters of requests let through, of those that had to wait
+                     for a token, total seconds waited, and rejected requests
+        """
+        with self._lock:
+            return {
+                'acquired': self.acquired,
+                'delayed': self.delayed,
+                'waited': self.waited,
+                'rejected': self.rejected,
+            }
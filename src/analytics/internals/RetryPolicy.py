@@ -0,0 +1,206 @@
+"""
+Generic Server-Side Google Analytics PHP Client
+
+This library is free software you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License (LGPL) as published by the Free Software Foundation either
+version 3 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA.
+
+Google Analytics is a registered trademark of Google Inc.
+
+@link      http://code.google.com/p/php-ga
+
+@license   http://www.gnu.org/licenses/lgpl.html
+@author    Thomas Bachem <tb@unitedprototype.com>
+@copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
+"""
+
+
+import logging
+import random
+import socket
+import threading
+import time
+import weakref
+
+from analytics.internals.CircuitBreaker import CircuitBreaker, CircuitOpenError
+from analytics.internals.ConnectionPool import ConnectError
+from analytics.internals.RateLimiter import RateLimitError
+from analytics.internals.compat import httplib, urllib2
+
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy(object):
+    """
+    Retries failed requests with exponential backoff and full jitter, and
+    guards every endpoint host with a CircuitBreaker.
+
+    Requests that failed to connect and responses with a status code from
+    Config.retryOnStatus are retried up to Config.retryMaxAttempts attempts in
+    total, waiting a random time between 0 and
+    min(Config.retryMaxBackoff, Config.retryBackoff * 2 ** (attempt - 1))
+    seconds in between. Timeouts and other errors after the request was sent
+    are never retried, as the server may have counted the hit already.
+
+    Those errors, failed connections and retryOnStatus responses count as
+    failures for the circuit breaker, any other response proves the host is up.
+
+    @ivar config:
+        Config the retry and circuit breaker settings are read from
+    """
+
+    # Errors which indicate that the endpoint is unreachable or overloaded,
+    # in addition to HTTPError responses with a status from Config.retryOnStatus
+    TRANSIENT_ERRORS = (urllib2.URLError, httplib.HTTPException, socket.error)
+
+    # Transient errors raised before the request was sent, urlopen() wraps
+    # failures of connecting and sending the request into a URLError
+    CONNECT_ERRORS = (ConnectError, urllib2.URLError)
+
+    _policies = weakref.WeakKeyDictionary()
+    _policies_lock = threading.Lock()
+
+
+    def __init__(self, config):
+        # Only proxied, a strong reference would keep the key of the
+        # per-config registry alive forever
+        self.config = weakref.proxy(config)
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.retries = 0
+        self.failed = 0
+        self.rejected = 0
+
+
+    @classmethod
+    def for_config(cls, config):
+        """
+        Returns the retry policy belonging to the given config, creating it on first use.
+
+        @rtype RetryPolicy
+        """
+        with cls._policies_lock:
+            policy = cls._policies.get(config)
+            if policy is None:
+                policy = cls._policies[config] = cls(config)
+
+            return policy
+
+
+    def is_transient(self, error):
+        """
+        @param Exception error
+        @return bool Whether the error is worth retrying and counts against the circuit breaker
+        """
+        if isinstance(error, urllib2.HTTPError):
+            return error.code in self.config.getRetryOnStatus()
+
+        return isinstance(error, RetryPolicy.TRANSIENT_ERRORS)
+
+
+    def is_retriable(self, error):
+        """
+        @param Exception error
+        @return bool Whether the request surely did not get processed and may be sent again
+        """
+        if isinstance(error, urllib2.HTTPError):
+            return error.code in self.config.getRetryOnStatus()
+
+        return isinstance(error, RetryPolicy.CONNECT_ERRORS)
+
+
+    def is_replayable(self, error):
+        """
+        @param Exception error A request finally failed with
+        @return bool Whether sending the request again later, e.g. from the
+                     spool, may succeed, unlike for 4xx responses
+        """
+        return isinstance(error, (CircuitOpenError, RateLimitError)) or self.is_transient(error)
+
+
+    def get_backoff(self, attempt):
+        """
+        @param int attempt The attempt that just failed, starting at 1
+        @return float Seconds to wait before the next attempt
+        """
+        ceiling = min(self.config.getRetryMaxBackoff(), self.config.getRetryBackoff() * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+
+    def call(self, host, send, deadline=None):
+        """
+        @param string host Endpoint host the circuit breaker is kept for
+        @param callable send Sends the request once, without arguments
+        @param float deadline time.time() timestamp after which no retry is started
+        @raise CircuitOpenError if the circuit of the host is open
+        @return mixed What send returned
+        """
+        threshold = self.config.getCircuitBreakerThreshold()
+        breaker = None
+        if threshold:
+            breaker = CircuitBreaker.for_host(host, threshold, self.config.getCircuitBreakerResetTimeout())
+
+        max_attempts = self.config.getRetryMaxAttempts()
+
+        with self._lock:
+            self.requests += 1
+
+        attempt = 1
+        while True:
+            if breaker is not None and not breaker.allow():
+                with self._lock:
+                    self.rejected += 1
+                raise CircuitOpenError('Circuit breaker for %s is open' % host)
+
+            try:
+                result = send()
+            except Exception as e:
+                transient = self.is_transient(e)
+                if breaker is not None:
+                    if transient:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+
+                backoff = self.get_backoff(attempt)
+                if (not self.is_retriable(e) or attempt >= max_attempts
+                        or (deadline is not None and time.time() + backoff >= deadline)):
+                    with self._lock:
+                        self.failed += 1
+                    raise
+
+                logger.debug('Request attempt %d to %s failed, retrying', attempt, host, exc_info=True)
+                time.sleep(backoff)
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+            else:
+                if breaker is not None:
+                    breaker.record_success()
+                return result
+
+
+    def stats(self):
+        """
+        @return dict Counters of requests, retries, requests that finally
+                     failed and requests rejected by an open circuit breaker
+        """
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'retries': self.retries,
+                'failed': self.failed,
+                'rejected': self.rejected,
+            }
@@ -0,0 +1,203 @@
+"""
+Generic Server-Side Google Analytics PHP Client
+
+This library is free software you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License (LGPL) as published by the Free Software Foundation either
+version 3 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA.
+
+Google Analytics is a registered trademark of Google Inc.
+
+@link      http://code.google.com/p/php-ga
+
+@license   http://www.gnu.org/licenses/lgpl.html
+@author    Thomas Bachem <tb@unitedprototype.com>
+@copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
+"""
+
+from collections import OrderedDict
+import atexit
+import logging
+import threading
+import time
+
+from analytics.internals.compat import request_data, to_native, urllib2
+
+
+logger = logging.getLogger(__name__)
+
+
+class ShutdownBuffer(object):
+    """
+    Process-wide buffer of already built requests which are sent once, on
+    interpreter shutdown, when Config.sendOnShutdown is enabled.
+
+    Only the encoded URL, body and headers of every request are kept, never
+    the Request/Tracker/Visitor/Session objects it was built from. The buffer
+    refuses new requests once it holds Config.shutdownBufferMaxBytes bytes, and
+    flushing stops once Config.shutdownFlushTimeout seconds have passed. The
+    time left until then also caps the timeout of every request sent.
+    Requests are sent through the Batcher if Config.batchRequests is enabled,
+    over the connection pool otherwise.
+    """
+
+    # Rough per-request bookkeeping overhead (tuple, references) in bytes
+    ENTRY_OVERHEAD = 96
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+
+    def __init__(self):
+        self._entries = []
+        self._lock = threading.Lock()
+        self._flush_timeout = None
+
+        self.size = 0
+        self.max_size = 0
+        self.buffered = 0
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+        self.expired = 0
+
+
+    @classmethod
+    def instance(cls):
+        """
+        Returns the buffer of this process, registering its flush on shutdown on first use.
+
+        @rtype ShutdownBuffer
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+                atexit.register(cls._instance.flush)
+
+            return cls._instance
+
+
+    def put(self, config, request):
+        """
+        @param Config config
+        @param urllib2.Request request
+        @return bool Whether the request got buffered
+        """
+        data = request_data(request)
+        headers = tuple(request.header_items())
+        entry = (config, request.get_full_url(), data, headers, getattr(request, 'spool_id', None),
+                 getattr(request, 'account_id', None))
+
+        size = ShutdownBuffer.ENTRY_OVERHEAD + len(entry[1]) + len(data or '')
+        size += sum(len(name) + len(value) for name, value in headers)
+
+        with self._lock:
+            self._flush_timeout = config.getShutdownFlushTimeout()
+            if self.size + size > config.getShutdownBufferMaxBytes():
+                self.dropped += 1
+                dropped = True
+            else:
+                self._entries.append(entry)
+                self.size += size
+                self.max_size = max(self.max_size, self.size)
+                self.buffered += 1
+                dropped = False
+
+        if dropped:
+            ShutdownBuffer._discard(config, entry[4])
+
+        return not dropped
+
+
+    @staticmethod
+    def _discard(config, spool_id):
+        # Dropped requests must not be replayed from the spool later on
+        if spool_id is not None and config.getSpoolDirectory():
+            from analytics.internals.Spool import Spool
+            Spool.for_config(config).discard(spool_id)
+
+
+    def flush(self):
+        """
+        Sends all buffered requests, giving up on the remaining ones once the
+        flush deadline has passed.
+        """
+        from analytics.internals.Batcher import Batcher
+        from analytics.internals.requests.HttpRequest import HttpRequest
+
+        with self._lock:
+            entries, self._entries = self._entries, []
+            self.size = 0
+            timeout = self._flush_timeout
+
+        deadline = None if timeout is None else time.time() + timeout
+        # Batched hits are sent right here too, the batcher thread might not
+        # get to them anymore before the process exits
+        batched = OrderedDict()
+
+        for i, (config, url, data, headers, spool_id, account_id) in enumerate(entries):
+            if deadline is not None and time.time() >= deadline:
+                with self._lock:
+                    self.expired += len(entries) - i
+                for config, url, data, headers, spool_id, account_id in entries[i:]:
+                    ShutdownBuffer._discard(config, spool_id)
+                break
+
+            if config.getBatchRequests():
+                payload = to_native(data) if data is not None else url.partition('?')[2]
+                batched.setdefault(Batcher.for_config(config), []).append((payload, spool_id, account_id))
+                continue
+
+            try:
+                request = urllib2.Request(url, data=data, headers=dict(headers))
+                request.spool_id = spool_id
+                request.account_id = account_id
+                # The time left until the deadline caps the request timeout
+                request.deadline = deadline
+                HttpRequest.send_request(config, request)
+            except Exception:
+                logger.debug('Sending buffered request failed', exc_info=True)
+                with self._lock:
+                    self.failed += 1
+            else:
+                with self._lock:
+                    self.sent += 1
+
+        for batcher, payloads in batched.items():
+            delivered = batcher.send_payloads(payloads, deadline)
+            with self._lock:
+                self.sent += delivered
+                self.failed += len(payloads) - delivered
+
+            try:
+                batcher.flush(deadline)
+            except Exception:
+                logger.debug('Sending buffered batch failed', exc_info=True)
+
+
+    def stats(self):
+        """
+        @return dict Current and peak memory footprint in bytes, amount of
+                     pending requests and counters of buffered, dropped,
+                     sent, failed and expired requests
+        """
+        with self._lock:
+            return {
+                'bytes': self.size,
+                'max_bytes': self.max_size,
+                'pending': len(self._entries),
+                'buffered': self.buffered,
+                'dropped': self.dropped,
+                'sent': self.sent,
+                'failed': self.failed,
+                'expired': self.expired,
+            }
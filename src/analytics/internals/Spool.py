@@ -0,0 +1,421 @@
+"""
+Generic Server-Side Google Analytics PHP Client
+
+This library is free software you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License (LGPL) as published by the Free Software Foundation either
+version 3 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA.
+
+Google Analytics is a registered trademark of Google Inc.
+
+@link      http://code.google.com/p/php-ga
+
+@license   http://www.gnu.org/licenses/lgpl.html
+@author    Thomas Bachem <tb@unitedprototype.com>
+@copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+
+from analytics.internals.compat import request_data, to_bytes, to_native, urllib2
+
+
+logger = logging.getLogger(__name__)
+
+
+class Spool(object):
+    """
+    Append-only, segment-rotated write-ahead log of built requests.
+
+    Every request is appended as a "H" record before it is sent and an "A"
+    record is appended once the endpoint answered with a 2xx status, or a "D"
+    record if it got dropped deliberately, e.g. by a full queue. Records
+    are written sequentially into the current segment file, which is flushed
+    to the OS on every write, but only fsync()ed by a background thread every
+    Config.spoolFsyncInterval seconds. Segments get rotated once they reach
+    Config.spoolSegmentSize bytes and deleted (oldest first) once all of their
+    requests are acknowledged or dropped. Requests which failed to be sent are
+    kept until replay() delivered them, unless sending them again would fail
+    the same way (e.g. a 4xx response), which drops them.
+
+    WATCH OUT: A spool directory must only be used by one process at a time.
+
+    @ivar directory:
+        Directory the segment files are stored in
+    """
+
+    HIT = 'H'
+    ACK = 'A'
+    DROP = 'D'
+
+    SEGMENT_PREFIX = 'spool-'
+    SEGMENT_SUFFIX = '.log'
+
+    _spools = {}
+    _spools_lock = threading.Lock()
+
+
+    def __init__(self, directory, segment_size=4194304, fsync_interval=0.05):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self._file = None
+        self._dirty = False
+        self._stopped = threading.Event()
+
+        # Parallel lists, ordered by segment index: the first sequence number
+        # of each segment and the set of its unacknowledged sequence numbers
+        self._segment_indexes = []
+        self._segment_firsts = []
+        self._segment_unacked = []
+        self._seq = 0
+        # Unacknowledged sequence numbers which are not in flight, i.e. failed
+        # to be sent in this run or were recovered from a previous one
+        self._failed = set()
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self._failed = self._recover()
+        self._open_segment((self._segment_indexes[-1] + 1) if self._segment_indexes else 0)
+
+        syncer = threading.Thread(target=self._run, name='analytics-spool-fsync')
+        syncer.daemon = True
+        syncer.start()
+
+
+    @classmethod
+    def for_config(cls, config):
+        """
+        Returns the spool for the spool directory of the given config, creating
+        it on first use. Unacknowledged requests from a previous run are resent
+        in the background if Config.spoolReplayOnStartup is enabled.
+
+        @rtype Spool
+        """
+        directory = os.path.abspath(config.getSpoolDirectory())
+        with cls._spools_lock:
+            spool = cls._spools.get(directory)
+            if spool is None:
+                spool = cls._spools[directory] = cls(directory, config.getSpoolSegmentSize(),
+                                                     config.getSpoolFsyncInterval())
+                if config.getSpoolReplayOnStartup() and spool._failed:
+                    replayer = threading.Thread(target=spool.replay, args=(config,),
+                                                name='analytics-spool-replay')
+                    replayer.daemon = True
+                    replayer.start()
+
+            return spool
+
+
+    def _segment_path(self, index):
+        return os.path.join(self.directory, '%s%010d%s' % (Spool.SEGMENT_PREFIX, index, Spool.SEGMENT_SUFFIX))
+
+
+    def _recover(self):
+        """
+        Reads all existing segments and rebuilds the bookkeeping of unacknowledged requests.
+
+        @return set Sequence numbers of unacknowledged requests
+        """
+        indexes = []
+        for name in os.listdir(self.directory):
+            if name.startswith(Spool.SEGMENT_PREFIX) and name.endswith(Spool.SEGMENT_SUFFIX):
+                indexes.append(int(name[len(Spool.SEGMENT_PREFIX):-len(Spool.SEGMENT_SUFFIX)]))
+        indexes.sort()
+
+        hits = set()
+        acked = set()
+        for index in indexes:
+            unacked = set()
+            first = None
+            with open(self._segment_path(index), 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # Torn write of the last record before a crash, e.g.
+                        # "A\t12" of "A\t123" would acknowledge the wrong request
+                        continue
+
+                    kind, _, rest = to_native(line).rstrip('\n').partition('\t')
+                    seq, _, data = rest.partition('\t')
+                    try:
+                        seq = int(seq)
+                        if kind == Spool.HIT:
+                            json.loads(data)
+                            hits.add(seq)
+                            unacked.add(seq)
+                            if first is None:
+                                first = seq
+                        elif kind in (Spool.ACK, Spool.DROP):
+                            acked.add(seq)
+                        else:
+                            continue
+                    except ValueError:
+                        # Corrupted record
+                        continue
+
+                    self._seq = max(self._seq, seq + 1)
+
+            self._segment_indexes.append(index)
+            self._segment_firsts.append(self._seq if first is None else first)
+            self._segment_unacked.append(unacked)
+
+        for unacked in self._segment_unacked:
+            unacked -= acked
+        self._compact()
+
+        return hits - acked
+
+
+    def _open_segment(self, index):
+        self._file = open(self._segment_path(index), 'ab')
+        self._segment_indexes.append(index)
+        self._segment_firsts.append(self._seq)
+        self._segment_unacked.append(set())
+
+
+    def _rotate(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._dirty = False
+
+        self._open_segment(self._segment_indexes[-1] + 1)
+        self._compact()
+
+
+    def _compact(self):
+        # Segments are only ever deleted oldest first, as newer segments may
+        # contain the acknowledgements for requests of older ones
+        while len(self._segment_indexes) > 1 and not self._segment_unacked[0]:
+            try:
+                os.remove(self._segment_path(self._segment_indexes[0]))
+            except OSError:
+                logger.debug('Removing spool segment failed', exc_info=True)
+            del self._segment_indexes[0]
+            del self._segment_firsts[0]
+            del self._segment_unacked[0]
+
+
+    def _write(self, line):
+        self._file.write(to_bytes(line))
+        self._file.flush()
+        self._dirty = True
+        if self._file.tell() >= self.segment_size:
+            self._rotate()
+
+
+    @staticmethod
+    def serialize(request):
+        """
+        @param urllib2.Request request
+        @return list JSON-serializable representation
+        """
+        data = request_data(request)
+        return [request.get_full_url(), None if data is None else to_native(data), request.header_items()]
+
+
+    @staticmethod
+    def deserialize(record):
+        """
+        @param list record As returned by serialize()
+        @rtype urllib2.Request
+        """
+        url, data, headers = record
+        return urllib2.Request(url, data=None if data is None else to_bytes(data), headers=dict(headers))
+
+
+    def append(self, request):
+        """
+        Writes the request to the log and tags it with its sequence number as
+        "spool_id" attribute, which is what ack() expects.
+
+        @return int
+        """
+        data = json.dumps(Spool.serialize(request), separators=(',', ':'))
+        with self._lock:
+            seq = self._seq
+            self._seq += 1
+            self._segment_unacked[-1].add(seq)
+            self._write('%s\t%d\t%s\n' % (Spool.HIT, seq, data))
+
+        request.spool_id = seq
+        return seq
+
+
+    def ack(self, seq):
+        """
+        Marks the request with the given sequence number as delivered.
+        """
+        self._settle(seq, Spool.ACK)
+
+
+    def discard(self, seq):
+        """
+        Marks the request with the given sequence number as deliberately
+        dropped, so it is neither replayed nor keeps its segment alive.
+        """
+        self._settle(seq, Spool.DROP)
+
+
+    def fail(self, seq, replayable=True):
+        """
+        Marks the request with the given sequence number as failed to be sent,
+        so the next replay() resends it.
+
+        @param bool replayable False to drop the request instead, if sending it
+                               again would fail the same way
+        @see RetryPolicy::is_replayable()
+        """
+        if not replayable:
+            with self._lock:
+                self.dropped += 1
+            logger.warning('Dropping spooled request %d, which failed for good', seq)
+            self.discard(seq)
+            return
+
+        with self._lock:
+            position = bisect.bisect_right(self._segment_firsts, seq) - 1
+            if position >= 0 and seq in self._segment_unacked[position]:
+                self._failed.add(seq)
+
+
+    def _settle(self, seq, kind):
+        with self._lock:
+            position = bisect.bisect_right(self._segment_firsts, seq) - 1
+            if position < 0 or seq not in self._segment_unacked[position]:
+                return
+
+            self._segment_unacked[position].discard(seq)
+            self._failed.discard(seq)
+            self._write('%s\t%d\n' % (kind, seq))
+            if position == 0:
+                self._compact()
+
+
+    def _read(self, seqs):
+        """
+        Reads the records of the given unacknowledged requests back from their
+        segments. Must be called with the lock held.
+
+        @return list (seq, record) tuples, in order
+        """
+        self._file.flush()
+
+        records = []
+        for index, unacked in zip(self._segment_indexes, self._segment_unacked):
+            wanted = seqs & unacked
+            if not wanted:
+                continue
+
+            with open(self._segment_path(index), 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        continue
+
+                    kind, _, rest = to_native(line).rstrip('\n').partition('\t')
+                    seq, _, data = rest.partition('\t')
+                    if kind == Spool.HIT and int(seq) in wanted:
+                        records.append((int(seq), json.loads(data)))
+
+        return sorted(records)
+
+
+    def _run(self):
+        while not self._stopped.wait(self.fsync_interval):
+            self.sync()
+
+
+    def sync(self):
+        """
+        fsync()s all records written so far.
+        """
+        with self._lock:
+            if not self._dirty or self._file.closed:
+                return
+            self._dirty = False
+            # fsync() a duplicate so writers do not have to wait for the disk
+            fd = os.dup(self._file.fileno())
+
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+    def replay(self, config):
+        """
+        Resends all unacknowledged requests that are not in flight anymore,
+        i.e. those of a previous run (e.g. because the process died) and those
+        which failed to be sent in this one (e.g. because the endpoint was down).
+        Requests failing again are kept for the next replay, unless they
+        failed for good.
+
+        @return int Amount of requests that got delivered
+        """
+        from analytics.internals.requests.HttpRequest import HttpRequest
+
+        with self._lock:
+            seqs, self._failed = self._failed, set()
+            pending = self._read(seqs)
+
+        delivered = 0
+        for seq, record in pending:
+            request = Spool.deserialize(record)
+            request.spool_id = seq
+            try:
+                # Acknowledges the request, or marks it as failed again
+                HttpRequest.send_request(config, request)
+            except Exception:
+                logger.debug('Replaying spooled request failed', exc_info=True)
+            else:
+                delivered += 1
+
+        return delivered
+
+
+    def stats(self):
+        """
+        @return dict Amount of segments, unacknowledged requests and of those
+                     the requests waiting for replay(), and the amount of
+                     failed requests that got dropped instead
+        """
+        with self._lock:
+            return {
+                'segments': len(self._segment_indexes),
+                'unacknowledged': sum(len(unacked) for unacked in self._segment_unacked),
+                'failed': len(self._failed),
+                'dropped': self.dropped,
+            }
+
+
+    def close(self):
+        """
+        fsync()s and closes the current segment. The next for_config() call
+        for the same directory opens the spool anew.
+        """
+        with Spool._spools_lock:
+            if Spool._spools.get(self.directory) is self:
+                del Spool._spools[self.directory]
+
+        self._stopped.set()
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
@@ -27,6 +27,11 @@ Google Analytics is a registered trademark of Google Inc.
 """
 
 
+from collections import OrderedDict
+
+from analytics.internals.compat import text_type, to_native
+
+
 """ 
 This is nearly a 1:1 PHP port of the gaforflash X10 class code.:
 
@@ -64,7 +69,7 @@ class X10(object):
     Delimiter between two consecutive num/value pairs.
     @var string
     """
-    DELIM_SET = ''
+    DELIM_SET = '*'
 
     """ 
     Delimiter between a num and its corresponding value.
@@ -96,7 +101,7 @@ class X10(object):
 
 
     def __init__(self):
-        projectData = {}
+        self.projectData = OrderedDict()
 
 
     """ 
@@ -104,7 +109,7 @@ class X10(object):
     @return bool
     """
     def hasProject(self, projectId):
-        return isset(self.projectData[projectId])
+        return projectId in self.projectData
 
 
     """ 
@@ -112,7 +117,7 @@ class X10(object):
     @param int num
     @param mixed value
     """
-    def hasProject(self, projectId, num, value):
+    def setKey(self, projectId, num, value):
         self.setInternal(projectId, self.KEY, num, value)
 
 
@@ -184,7 +189,7 @@ class X10(object):
     @return mixed
     """
     def getInternal(self, projectId, type, num):
-        return self.projectData[projectId][type].get(num, None)
+        return self.projectData.get(projectId, {}).get(type, {}).get(num, None)
 
 
     """ 
@@ -203,19 +208,19 @@ class X10(object):
 
     """ 
     Escape X10 string values to remove ambiguity for special characters.
+    One str.replace() per character of ESCAPE_CHAR_MAP, which runs in C and
+    beats a translate() table or regex for values of this size.
 
     @see X10::escapeCharMap
     @param string value
     @return string
     """
     def escapeExtensibleValue(self, value):
-        result = ''
-        length = len(value)
-        for i in range(length):
-            char = value[i]
-            result += X10.ESCAPE_CHAR_MAP.get(char, char)
+        if not isinstance(value, (str, text_type)):
+            value = to_native(value) if isinstance(value, bytes) else str(value)
 
-        return result
+        # "'" goes first, as it starts the escaped forms of the others
+        return value.replace("'", "'0").replace(')', "'1").replace('*', "'2").replace('!', "'3")
 
 
     """ 
@@ -228,20 +233,18 @@ class X10(object):
         result = []
 
         lastI = 0
-        ksort(data, SORT_NUMERIC)
-        sorted_data = sorted(data.items(), key=lambda x: x[1])
-        for i, entry in sorted_data:
-            if entry:
-                str = ''
+        for i, entry in sorted(data.items()):
+            if entry is not None:
+                str_ = ''
                 
                 # Check if we need to append the number. If the last number was
                 # outputted, or if this is the assumed minimum, then we don't.
                 if i != self.MINIMUM and i - 1 != lastI:
-                    str += i
-                    str += self.DELIM_NUM_VALUE
+                    str_ += '%d' % i
+                    str_ += self.DELIM_NUM_VALUE
                 
-                str += self.escapeExtensibleValue(entry)
-                result.append(str)
+                str_ += self.escapeExtensibleValue(entry)
+                result.append(str_)
             
             lastI = i
 
@@ -249,7 +252,10 @@ class X10(object):
 
 
     """ 
-    Given a project array, render its string encoding.
+    Given a project array, render its string encoding. Not memoized, building
+    a key from the contents of a project costs about as much as rendering it
+    (see benchmarks/bench_x10.py). Fragments that repeat, like the custom
+    variables of a tracker, are cached by their owners instead.
 
     @param array project
     @return string
@@ -262,13 +268,12 @@ class X10(object):
         # type was present.
         needTypeQualifier = False
 
-        length = len(X10.SET)
-        for i in range(length):
-            if project[self.SET].get(i):
-                data = project[self.SET[i]]
+        for type in X10.SET:
+            if type in project:
+                data = project[type]
                 
                 if needTypeQualifier:
-                    result += self.SET[i]
+                    result += type
                 
                 result += self.renderDataType(data)
                 needTypeQualifier = False
@@ -286,11 +291,15 @@ class X10(object):
     def renderUrlString(self):
         result = ''
 
-        for projectId, project in self.projectData.iteritems():
-            result += projectId + self.renderProject(project)
+        for projectId, project in self.projectData.items():
+            result += '%d' % projectId + self.renderProject(project)
 
         return result
 
 
-
-
+    # Aliases for the naming used by Request
+    set_key = setKey
+    clear_key = clearKey
+    set_value = setValue
+    clear_value = clearValue
+    render_url_string = renderUrlString
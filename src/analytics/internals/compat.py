@@ -0,0 +1,101 @@
+
+
+""" 
+Generic Server-Side Google Analytics PHP Client
+
+This library is free software you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License (LGPL) as published by the Free Software Foundation either
+version 3 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA.
+
+Google Analytics is a registered trademark of Google Inc.
+
+@link      http://code.google.com/p/php-ga
+
+@license   http://www.gnu.org/licenses/lgpl.html
+@author    Thomas Bachem <tb@unitedprototype.com>
+@copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
+"""
+
+""" 
+Names that differ between Python 2 and 3, so the rest of the package can be
+written once for both. The Python 3 modules are exposed under their Python 2
+names.
+"""
+
+import sys
+
+
+PY2 = sys.version_info[0] == 2
+
+if PY2:
+    import BaseHTTPServer
+    import httplib
+    import SocketServer
+    import urllib2
+    import urlparse
+
+    text_type = unicode
+else:
+    import http.client as httplib
+    import http.server as BaseHTTPServer
+    import socketserver as SocketServer
+    import urllib.parse as urlparse
+    import urllib.request as urllib2
+
+    text_type = str
+
+
+def to_native(value):
+    """ 
+    @param bytes|unicode value
+    @return str The value as native string, UTF-8 encoded on Python 2 and decoded on Python 3
+    """
+    if isinstance(value, str):
+        return value
+    if PY2:
+        return value.encode('utf-8')
+    return value.decode('utf-8')
+
+
+def to_bytes(value):
+    """ 
+    @param bytes|unicode value
+    @return bytes The value UTF-8 encoded, if it is text
+    """
+    if isinstance(value, bytes):
+        return value
+    return value.encode('utf-8')
+
+
+def request_host(request):
+    """ 
+    @param urllib2.Request request
+    @return string Host (and port) of the request
+    """
+    return request.get_host() if PY2 else request.host
+
+
+def request_selector(request):
+    """ 
+    @param urllib2.Request request
+    @return string Path and query string of the request
+    """
+    return request.get_selector() if PY2 else request.selector
+
+
+def request_data(request):
+    """ 
+    @param urllib2.Request request
+    @return bytes|None Body of the request
+    """
+    return request.get_data() if PY2 else request.data
@@ -25,11 +25,20 @@ Google Analytics is a registered trademark of Google Inc.
 @author    Thomas Bachem <tb@unitedprototype.com>
 @copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
 """
-import urllib
-import urllib2
+import socket
+import threading
+import time
 
-from analytics import Config
+from analytics.Config import Config
 from analytics.internals import utils
+from analytics.internals.compat import request_data, request_host, request_selector, to_bytes, urllib2
+from analytics.internals.Batcher import Batcher
+from analytics.internals.ConnectionPool import ConnectionPool
+from analytics.internals.Dispatcher import Dispatcher
+from analytics.internals.RateLimiter import RateLimiter
+from analytics.internals.RetryPolicy import RetryPolicy
+from analytics.internals.ShutdownBuffer import ShutdownBuffer
+from analytics.internals.Spool import Spool
 
 
 
@@ -66,12 +75,16 @@ class HttpRequest(object):
 
     def buildHttpRequest(self):
         parameters = self.build_parameters()
-        query_string = urllib.urlencode(parameters)
-        url = self.config.get_endpoint_host() + self.config.get_endpoint_path()
+        # The endpoint host may be None to not send requests at all, see dispatch()
+        url = 'http://' + (self.config.getEndPointHost() or '') + self.config.getEndPointPath()
 
         # Mimic Javascript's encodeURIComponent() encoding for the query
         # string just to be sure we are 100% consistent with GA's Javascript client
-        query_string = utils.convert_to_uri_component_encoding(query_string)
+        query_string = utils.build_query_string(parameters)
+
+        static_query_string = self.build_static_query_string()
+        if static_query_string:
+            query_string = static_query_string + '&' + query_string if query_string else static_query_string
 
         # Recent versions of ga.js use HTTP POST requests if the query string is too long
         usePost = len(query_string) > 2036
@@ -79,7 +92,7 @@ class HttpRequest(object):
         if not usePost:
             req = urllib2.Request(url + '?' + query_string)
         else:
-            req = urllib2.Request(url, data=query_string)
+            req = urllib2.Request(url, data=to_bytes(query_string))
 
         if self.userAgent:
             req.add_header('User-Agent', self.userAgent.replace('\n','').replace('\r',''))
@@ -99,6 +112,16 @@ class HttpRequest(object):
         return req
 
 
+    def build_static_query_string(self):
+        """
+        Already encoded query string of parameters that don't change between
+        requests, which gets prepended to the encoded build_parameters().
+
+        @return string
+        """
+        return ''
+
+
     def build_parameters(self):
         raise NotImplementedError()
 
@@ -114,33 +137,198 @@ class HttpRequest(object):
 
         @return null|string|bool
         """
-        request = self.build_http_request()
-        response = None
+        request = self.buildHttpRequest()
+        if request is None:
+            # Dropped by Config.sessionLimitPolicy
+            return None
+
+        return HttpRequest.dispatch(self.config, request)
 
-        # Do not actually send the request if endpoint host is set to None
-        if self.config.get_endpoint_host():
-            timeout = self.config.request_timeout
 
-            if self.config.getFireAndForget():
-                raise NotImplementedError('Asynchronous send not implemented yet')
+    @staticmethod
+    def dispatch(config, request):
+        """
+        Hands an already built urllib2.Request to the delivery mode the config
+        asks for and calls the logging callback.
 
-            # TODO Handle errors?
-            response = urllib2.urlopen(request, timeout=timeout).read()
+        @return null|string The response, if the request was sent synchronously
+        """
+        response = None
 
-        logging_callback = self.config.logging_callback
+        # Do not actually send the request if endpoint host is set to None
+        if config.getEndPointHost():
+            if config.getSpoolDirectory():
+                # Written ahead so the request survives endpoint outages and crashes,
+                # send_request() acknowledges it after a successful response
+                Spool.for_config(config).append(request)
+
+            if config.getSendOnShutdown():
+                # Only the encoded request is kept until the process exits
+                ShutdownBuffer.instance().put(config, request)
+            elif config.getBatchRequests():
+                # Will be sent along with other hits as soon as the batch is full or old enough
+                Batcher.for_config(config).put(request)
+            elif config.getFireAndForget():
+                # Hand the request over to the background sender threads,
+                # the response is never waited for
+                Dispatcher.for_config(config).put(request)
+            else:
+                response = HttpRequest.send_request(config, request)
+
+        logging_callback = config.getLoggingCallback()
         if logging_callback:
             logging_callback(request, response)
 
-
         return response
 
 
-    def fire(self):
-        if self.config.send_on_shutdown:
-            import atexit
-            atexit.register(lambda: self._send())
+    @staticmethod
+    def sends_synchronously(config):
+        """
+        @return bool Whether dispatch() sends requests right away and waits for
+                     their responses, instead of handing them over to the
+                     shutdown buffer, the batcher or the background senders
+        """
+        return bool(config.getEndPointHost()) and not (config.getSendOnShutdown() or config.getBatchRequests()
+                                                       or config.getFireAndForget())
+
+
+    @staticmethod
+    def dispatch_many(config, requests):
+        """
+        Default bulk transport of Tracker.track_many(), dispatches each request
+        on its own. A failing request does not keep the others from being sent.
+
+        @param list requests Built urllib2.Request objects
+        @return list One response or raised exception per request
+        """
+        results = []
+        for request in requests:
+            try:
+                results.append(HttpRequest.dispatch(config, request))
+            except Exception as e:
+                results.append(e)
+
+        return results
+
+
+    @staticmethod
+    def dispatch_concurrently(config, requests, concurrency):
+        """
+        Like dispatch_many(), but with up to the given amount of requests in
+        flight at once, each on its own pooled connection, so the total latency
+        is roughly that of the slowest request instead of the sum of all.
+
+        @param list requests Built urllib2.Request objects
+        @param int concurrency
+        @return list One response or raised exception per request, in order
+        """
+        # Only synchronous sending waits for round trips, the other delivery
+        # modes merely enqueue and are not worth a thread per request
+        if concurrency <= 1 or len(requests) <= 1 or not HttpRequest.sends_synchronously(config):
+            return HttpRequest.dispatch_many(config, requests)
+
+        results = [None] * len(requests)
+        pending = iter(enumerate(requests))
+        lock = threading.Lock()
+
+        def run():
+            while True:
+                with lock:
+                    try:
+                        index, request = next(pending)
+                    except StopIteration:
+                        return
+                try:
+                    results[index] = HttpRequest.dispatch(config, request)
+                except Exception as e:
+                    results[index] = e
+
+        threads = [threading.Thread(target=run, name='analytics-transaction-%d' % i)
+                   for i in range(min(concurrency, len(requests)) - 1)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        # The calling thread does its share of the work, too
+        run()
+        for thread in threads:
+            thread.join()
+
+        return results
+
+
+    @staticmethod
+    def send_request(config, request):
+        """
+        Sends an already built urllib2.Request, over a pooled keep-alive
+        connection unless Config.useConnectionPool is disabled. Transient
+        failures are retried according to the config's RetryPolicy. Spooled
+        requests get acknowledged in the spool once they were delivered, or
+        marked for Spool.replay() if they finally failed, unless the failure
+        is not replayable. A "deadline"
+        attribute (a time.time() timestamp) of the request caps the timeout of
+        every attempt and keeps retries from waiting past it.
+
+        @raise urllib2.HTTPError for non-2xx responses, just like urlopen()
+        @raise CircuitOpenError if the endpoint host is considered down
+        @raise RateLimitError if the rate limiter had no slot within Config.rateLimitMaxWait
+        @return string
+        """
+        deadline = getattr(request, 'deadline', None)
+
+        def get_timeout():
+            timeout = config.getRequestTimeout()
+            if deadline is None:
+                return timeout
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise socket.timeout('Request deadline passed')
+            return remaining if timeout is None else min(timeout, remaining)
+
+        if not config.getUseConnectionPool():
+            send = lambda: urllib2.urlopen(request, timeout=get_timeout()).read()
         else:
-            self._send()
+            send = lambda: HttpRequest._send_pooled(config, request, get_timeout())
+
+        spool_id = getattr(request, 'spool_id', None)
+        spool = Spool.for_config(config) if spool_id is not None and config.getSpoolDirectory() else None
+
+        try:
+            # Throttled here, where requests actually hit the wire, so background
+            # senders absorb the waiting in the non-blocking delivery modes
+            RateLimiter.for_config(config).acquire(getattr(request, 'account_id', None),
+                                                   getattr(request, 'hit_count', 1))
+
+            data = RetryPolicy.for_config(config).call(request_host(request), send, deadline)
+        except Exception as e:
+            if spool is not None:
+                spool.fail(spool_id, RetryPolicy.for_config(config).is_replayable(e))
+            raise
+
+        if spool is not None:
+            spool.ack(spool_id)
+
+        return data
+
+
+    @staticmethod
+    def _send_pooled(config, request, timeout):
+        pool = ConnectionPool.for_host(request_host(request), config.getConnectionPoolSize(),
+                                       config.getConnectionIdleTimeout())
+        response, data = pool.request(request.get_method(), request_selector(request),
+                                      request_data(request), dict(request.header_items()), timeout)
+
+        if not 200 <= response.status < 300:
+            raise urllib2.HTTPError(request.get_full_url(), response.status, response.reason,
+                                    response.msg, None)
+
+        return data
+
+
+    def fire(self):
+        self._send()
 
 
 
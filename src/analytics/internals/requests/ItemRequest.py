@@ -26,18 +26,17 @@ Google Analytics is a registered trademark of Google Inc.
 @copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
 """
 
-from analytics.internals import Request
+from analytics.internals.requests.Request import Request
 
 
 class ItemRequest(Request):
 
-    def __init__(self):
+    def __init__(self, config=None):
+        super(ItemRequest, self).__init__(config)
+
         self.item = None
 
 
-    """ 
-    @return string
-    """
     def getType(self):
         return Request.TYPE_ITEM
 
@@ -45,17 +44,17 @@ class ItemRequest(Request):
     """ 
     @link http://code.google.com/p/gaforflash/source/browse/trunk/src/com/google/analytics/ecommerce/Item.as#61
 
-    @return \UnitedPrototype\GoogleAnalytics\Internals\ParameterHolder
+    @return Internals\ParameterHolder
     """
-    def buildParameters(self):
-        p = super(ItemRequest, self).buildParameters()        
+    def build_parameters(self):
+        p = super(ItemRequest, self).build_parameters()
 
         p.utmtid = self.item.getOrderId()
         p.utmipc = self.item.getSku()
         p.utmipn = self.item.getName()
         p.utmiva = self.item.getVariation()
         p.utmipr = self.item.getPrice()
-        p.utmiqt = self.item.getQuantity()  
+        p.utmiqt = self.item.getQuantity()
 
         return p
 
@@ -64,10 +63,10 @@ class ItemRequest(Request):
     The GA Javascript client doesn't send any visitor information for
     e-commerce requests, so we don't either.
 
-    @param \UnitedPrototype\GoogleAnalytics\Internals\ParameterHolder p
-    @return \UnitedPrototype\GoogleAnalytics\Internals\ParameterHolder
+    @param Internals\ParameterHolder p
+    @return Internals\ParameterHolder
     """
-    def buildVisitorParameters(self, p):
+    def build_visitor_parameters(self, p):
         return p
 
 
@@ -75,26 +74,22 @@ class ItemRequest(Request):
     The GA Javascript client doesn't send any custom variables for
     e-commerce requests, so we don't either.
 
-    @param \UnitedPrototype\GoogleAnalytics\Internals\ParameterHolder p
-    @return \UnitedPrototype\GoogleAnalytics\Internals\ParameterHolder
+    @param Internals\ParameterHolder p
+    @return Internals\ParameterHolder
     """
-    def buildCustomVariablesParameter(self, p):
+    def build_custom_variables_parameter(self, p):
         return p
 
 
     """ 
-    @return \UnitedPrototype\GoogleAnalytics\Item
+    @return Item
     """
     def getItem(self):
         return self.item
 
 
     """ 
-    @param \UnitedPrototype\GoogleAnalytics\Item item
+    @param Item item
     """
     def setItem(self, item):
         self.item = item
-
-
-
-
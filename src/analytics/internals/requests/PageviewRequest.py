@@ -28,22 +28,30 @@ Google Analytics is a registered trademark of Google Inc.
 
 import math
 
-from analytics.internals import Request, X10
+from analytics.internals.X10 import X10
+from analytics.internals.requests.Request import Request
+
 
 class PageviewRequest(Request):
 
     X10_SITESPEED_PROJECT_ID = 14
 
 
-    def __init__(self):
+    def __init__(self, config=None):
+        super(PageviewRequest, self).__init__(config)
+
         self.page = None
 
+
     def getType(self):
         return Request.TYPE_PAGE
 
 
-    def buildParameters(self):
-        p = super(PageviewRequest, self).buildParameters()
+    """ 
+    @return Internals\ParameterHolder
+    """
+    def build_parameters(self):
+        p = super(PageviewRequest, self).build_parameters()
 
         p.utmp  = self.page.getPath()
         p.utmdt = self.page.getTitle()
@@ -57,34 +65,30 @@ class PageviewRequest(Request):
             # Sample sitespeed measurements
             if p.utmn % 100 < self.config.getSitespeedSampleRate():
                 x10 = X10()
-                
-                x10.clearKey(PageviewRequest.X10_SITESPEED_PROJECT_ID)
-                x10.clearValue(PageviewRequest.X10_SITESPEED_PROJECT_ID)
-                
+
+                x10.clear_key(PageviewRequest.X10_SITESPEED_PROJECT_ID)
+                x10.clear_value(PageviewRequest.X10_SITESPEED_PROJECT_ID)
+
                 # Taken from ga.js code
-                key = max(min(math.floor(self.page.getLoadTime() / 100), 5000), 0) * 100
-                x10.setKey(PageviewRequest.X10_SITESPEED_PROJECT_ID, X10.OBJECT_KEY_NUM, key)
-                
-                x10.setValue(self.X10_SITESPEED_PROJECT_ID, X10.VALUE_VALUE_NUM, self.page.getLoadTime())
-                
-                p.utme += x10.renderUrlString()
-            
+                key = int(max(min(math.floor(self.page.getLoadTime() / 100), 5000), 0) * 100)
+                x10.set_key(PageviewRequest.X10_SITESPEED_PROJECT_ID, X10.OBJECT_KEY_NUM, key)
+
+                x10.set_value(PageviewRequest.X10_SITESPEED_PROJECT_ID, X10.VALUE_VALUE_NUM, self.page.getLoadTime())
+
+                p.utme = p.get('utme', '') + x10.render_url_string()
+
         return p
 
 
     """ 
-    @return \UnitedPrototype\GoogleAnalytics\Page
+    @return Page
     """
     def getPage(self):
         return self.page
 
 
     """ 
-    @param \UnitedPrototype\GoogleAnalytics\Page page
+    @param Page page
     """
     def setPage(self, page):
         self.page = page
-
-
-
-
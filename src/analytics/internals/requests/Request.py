@@ -1,33 +1,41 @@
 
 
-  """ 
-  Generic Server-Side Google Analytics PHP Client
-  
-  This library is free software you can redistribute it and/or
-  modify it under the terms of the GNU Lesser General Public
-  License (LGPL) as published by the Free Software Foundation either
-  version 3 of the License, or (at your option) any later version.
-  
-  This library is distributed in the hope that it will be useful,
-  but WITHOUT ANY WARRANTY without even the implied warranty of
-  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
-  Lesser General Public License for more details.
-  
-  You should have received a copy of the GNU Lesser General Public
-  License along with this library if not, write to the Free Software
-  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA.
-  
-  Google Analytics is a registered trademark of Google Inc.
-  
-  @link      http://code.google.com/p/php-ga
-  
-  @license   http://www.gnu.org/licenses/lgpl.html
-  @author    Thomas Bachem <tb@unitedprototype.com>
-  @copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
-  """
-
-from analytics import Tracker, Visitor, Session, CustomVariable
-from analytics import utils, ParameterHolder, X10
+""" 
+Generic Server-Side Google Analytics PHP Client
+
+This library is free software you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License (LGPL) as published by the Free Software Foundation either
+version 3 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA.
+
+Google Analytics is a registered trademark of Google Inc.
+
+@link      http://code.google.com/p/php-ga
+
+@license   http://www.gnu.org/licenses/lgpl.html
+@author    Thomas Bachem <tb@unitedprototype.com>
+@copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
+"""
+
+import logging
+
+from analytics.Config import Config
+from analytics.Session import Session
+from analytics.internals import utils
+from analytics.internals.ParameterHolder import ParameterHolder
+from analytics.internals.requests.HttpRequest import HttpRequest
+
+logger = logging.getLogger(__name__)
+
 
 class Request(HttpRequest):
     TYPE_PAGE           = None
@@ -54,11 +62,18 @@ class Request(HttpRequest):
     CAMPAIGN_DELIMITER = '|'
 
 
-    def __init__(self):
+    def __init__(self, config=None):
+        super(Request, self).__init__(config)
+
         self.tracker = None
         self.visitor = None
         self.session = None
 
+        # The counters as incremented by this very request, concurrent
+        # requests of the same session or campaign can not change them anymore
+        self.tracklen = None
+        self.response_count = None
+
     """ 
     Indicates the type of request, will be mapped to "utmt" parameter
 
@@ -66,142 +81,171 @@ class Request(HttpRequest):
     @return string See Request::TYPE_ constants
     """
     def getType(self):
-        self.x_forwarded_for = self.visitor.ip_address
-        self.user_agent = self.visitor.user_agent
+        raise NotImplementedError()
+
 
-        # Increment session track counter for each request
-        self.session.increase_tracklen()
+    def buildHttpRequest(self):
+        """
+        @return urllib2.Request None if the request got dropped by the session limit
+        """
+        self.setx_forwarded_for(self.visitor.ip_address)
+        self.setUserAgent(self.visitor.user_agent)
 
-        # See http://code.google.com/p/gaforflash/source/browse/trunk/src/com/google/analytics/v4/Configuration.as?r=237#48
-        # and http://code.google.com/intl/de-DE/apis/analytics/docs/tracking/eventTrackerGuide.html#implementationConsiderations
-        if self.session.tracklen > 500):
-            raise Exception('Google Analytics does not guarantee to process more than 500 requests per session.')
+        # Increments the session track counter for each request
+        if not self.apply_session_limit():
+            return None
 
         if self.tracker.campaign:
-            self.tracker.campaign.increaseResponselen()
+            self.response_count = self.tracker.campaign.increaseResponselen()
+
+        request = super(Request, self).buildHttpRequest()
+        # Lets the rate limiter apply Config.accountRateLimit
+        request.account_id = self.tracker.account_id
+        return request
 
 
-        return super(Request, self).build_http_request()
+    def apply_session_limit(self):
+        """
+        Counts this request in the session's track counter, applying
+        Config.sessionLimitPolicy instead if the session already reached
+        Config.sessionHitLimit requests, before any work is spent on building
+        this request. Checking and incrementing is one atomic step, so
+        concurrent requests of a shared session can not overshoot the limit.
+
+        See http://code.google.com/p/gaforflash/source/browse/trunk/src/com/google/analytics/v4/Configuration.as?r=237#48
+        and http://code.google.com/intl/de-DE/apis/analytics/docs/tracking/eventTrackerGuide.html#implementationConsiderations
+
+        @raise Session.LimitExceededError with Config.SESSION_LIMIT_RAISE
+        @return bool False if the request is to be dropped
+        """
+        limit = self.config.getSessionHitLimit()
+        if limit is None:
+            self.tracklen = self.session.increaseTracklen()
+            return True
+
+        policy = self.config.getSessionLimitPolicy()
+        rollover = policy == Config.SESSION_LIMIT_ROLLOVER
+        self.tracklen, rolled_over = self.session.increaseTracklenUpTo(limit, rollover)
+        if rolled_over:
+            self.visitor.add_session(self.session)
+        if self.tracklen is not None:
+            return True
+
+        if policy == Config.SESSION_LIMIT_DROP:
+            logger.debug('Dropping request of session %s, which reached %d requests', self.session.getSessionId(), limit)
+            return False
+
+        raise Session.LimitExceededError('Google Analytics does not guarantee to process more than %d requests per session.' % limit)
+
+
+    def build_static_query_string(self):
+        """
+        The parameters which are the same for every request of the tracker
+        ("utmwv", "utmac", "utmhn" and "aip") are encoded once per tracker.
+
+        @see Tracker::get_static_query_string()
+        """
+        return self.tracker.get_static_query_string(self.config)
 
 
     """ 
-    @return \UnitedPrototype\GoogleAnalytics\Internals\ParameterHolder
+    @return Internals\ParameterHolder
     """
     def build_parameters(self):
         p = ParameterHolder()
 
-        p.utmac = self.tracker.account_id
-        p.utmhn = self.tracker.domain_name
+        # "utmwv", "utmac", "utmhn" and "aip" are part of the static query string
 
-        p.utmt = self.type
+        p.utmt = self.getType()
         p.utmn = utils.generate_32bit_random()
 
-        if self.tracker.config.anonymize_ip_addresses:
-            p.aip = 1
-        else:
-            p.aip = None
-
         # The IP parameter does sadly seem to be ignored by GA, so we
         # shouldn't set it as of today but keep it here for later reference
         # p.utmip = self.visitor.getIpAddress()
 
-        p.utmhid = self.session.session_id
-        p.utms   = self.session.getTracklen()
+        p.utmhid = self.session.getSessionId()
+        p.utms   = self.tracklen
 
-        p = self.buildVisitorParameters(p)
-        p = self.buildCustomVariablesParameter(p)
+        p = self.build_visitor_parameters(p)
+        p = self.build_custom_variables_parameter(p)
         p = self.buildCampaignParameters(p)
-        p = self.buildCookieParameters(p)
+        p = self.build_cookie_parameters(p)
 
         return p
 
 
     """ 
-    @param \UnitedPrototype\GoogleAnalytics\Internals\ParameterHolder p
-    @return \UnitedPrototype\GoogleAnalytics\Internals\ParameterHolder
+    @param Internals\ParameterHolder p
+    @return Internals\ParameterHolder
     """
     def build_visitor_parameters(self, p):
-        # Ensure correct locale format, see https:#developer.mozilla.org/en/navigator.language
-        p.utmul = self.visitor.getLocale().replace('_', '-').lower()
+        visitor = self.visitor
+
+        # The normalized locale is cached along with the other user agent derived values
+        utmul = visitor.get_derived_attributes()[1]
+        if utmul:
+            p.utmul = utmul
 
-        if self.visitor.getFlashVersion():
-            p.utmfl = self.visitor.getFlashVersion()
+        if visitor.flash_version:
+            p.utmfl = visitor.flash_version
 
-        if self.visitor.getJavaEnabled():
-            p.utmje = self.visitor.getJavaEnabled()
+        if visitor.java_enabled is not None:
+            p.utmje = 1 if visitor.java_enabled else 0
 
-        if self.visitor.getScreenColorDepth():
-            p.utmsc = self.visitor.getScreenColorDepth() + '-bit'
+        if visitor.screen_color_depth:
+            p.utmsc = '%s-bit' % visitor.screen_color_depth
 
-        p.utmsr = self.visitor.getScreenResolution()
+        p.utmsr = visitor.screen_resolution
 
         return p
 
 
     """ 
-    @link http://xahlee.org/js/google_analytics_tracker_2010-07-01_expanded.js line 575
-    @param \UnitedPrototype\GoogleAnalytics\Internals\ParameterHolder p
-    @return \UnitedPrototype\GoogleAnalytics\Internals\ParameterHolder
+    The custom variables only change through the tracker, which keeps them
+    pre-rendered, so nothing gets encoded here per request.
+
+    @see Tracker::get_custom_variables_fragment()
+    @param Internals\ParameterHolder p
+    @return Internals\ParameterHolder
     """
     def build_custom_variables_parameter(self, p):
-        customVars = self.tracker.custom_variables
-        if customVars:
-            if len(customVars) > 5:
-                # See http://code.google.com/intl/de-DE/apis/analytics/docs/tracking/gaTrackingCustomVariables.html#usage
-                raise Exception('The sum of all custom variables cannot exceed 5 in any given request.')           
-            
-            x10 = X10()
-            
-            x10.clear_key(Request.X10_CUSTOMVAR_NAME_PROJECT_ID)
-            x10.clear_key(Request.X10_CUSTOMVAR_VALUE_PROJECT_ID)
-            x10.clear_key(Request.X10_CUSTOMVAR_SCOPE_PROJECT_ID)
-            
-            for custom_var in custom_vars:
-                # Name and value get encoded here,
-                # see http://xahlee.org/js/google_analytics_tracker_2010-07-01_expanded.js line 563
-                name  = utils.encode_uri_component(custom_var.name)
-                value = utils.encode_uri_component(custom_var.value)
-                
-                x10.set_key(Request.X10_CUSTOMVAR_NAME_PROJECT_ID, custom_var.index, name)
-                x10.set_key(Request.X10_CUSTOMVAR_VALUE_PROJECT_ID, custom_var.index, value)
-                if custom_var.scope is not None and custom_var.scope != CustomVariable.SCOPE_PAGE:
-                    x10.set_key(Request.X10_CUSTOMVAR_SCOPE_PROJECT_ID, custom_var.index, custom_var.scope)
-                
-            p.utme += x10.render_url_string()
+        fragment = self.tracker.get_custom_variables_fragment()
+        if fragment:
+            p.utme = p.get('utme', '') + fragment
 
         return p
 
 
     """ 
     @link http://code.google.com/p/gaforflash/source/browse/trunk/src/com/google/analytics/core/GIFRequest.as#123
-    @param \UnitedPrototype\GoogleAnalytics\Internals\ParameterHolder p
-    @return \UnitedPrototype\GoogleAnalytics\Internals\ParameterHolder
+    @param Internals\ParameterHolder p
+    @return Internals\ParameterHolder
     """
     def build_cookie_parameters(self, p):
-        domain_hash = self.generate_domain_hash()
+        domain_hash = self.generateDomainHash()
 
-        p.__utma  = domain_hash + '.'
-        p.__utma += self.visitor.unique_id  '.'
-        p.__utma += utils.totimestamp(self.visitor.first_visit_time) + '.'
-        p.__utma += utils.totimestamp(self.visitor.previous_visit_time) + '.'
-        p.__utma += utils.totimestamp(self.visitor.current_visit_time) + '.'
-        p.__utma += utils.totimestamp(self.visitor.visit_count)
+        p._utma  = '%s.' % domain_hash
+        p._utma += '%s.' % self.visitor.unique_id
+        p._utma += '%d.' % utils.totimestamp(self.visitor.first_visit_time)
+        p._utma += '%d.' % utils.totimestamp(self.visitor.previous_visit_time)
+        p._utma += '%d.' % utils.totimestamp(self.visitor.current_visit_time)
+        p._utma += '%s' % self.visitor.visit_count
 
-        p.__utmb  = domain_hash + '.'
-        p.__utmb += self.session.tracklen + '.'
+        p._utmb  = '%s.' % domain_hash
+        p._utmb += '%s.' % self.tracklen
         # FIXME: What does "token" mean? I only encountered a value of 10 in my tests.
-        p.__utmb += '10.'
-        p.__utmb += utils.totimestamp(self.session.start_time
+        p._utmb += '10.'
+        p._utmb += '%d' % utils.totimestamp(self.session.getStartTime())
 
-        p.__utmc = domain_hash
+        p._utmc = domain_hash
 
-        cookies = {}
-        cookies.append('__utma=%s;' % p.__utma)
-        if p.__utmz:
-            cookies.append('__utmz=%s;' % p.__utmz)
+        cookies = []
+        cookies.append('__utma=%s;' % p._utma)
+        if p.get('_utmz'):
+            cookies.append('__utmz=%s;' % p._utmz)
 
-        if p.__utmv:
-            cookies.apend('__utmv=%s;' % p.__utmv)
+        if p.get('_utmv'):
+            cookies.append('__utmv=%s;' % p._utmv)
 
 
         p.utmcc = '+'.join(cookies)
@@ -211,35 +255,16 @@ class Request(HttpRequest):
 
 
     """ 
-    @param \UnitedPrototype\GoogleAnalytics\Internals\ParameterHolder p
-    @return \UnitedPrototype\GoogleAnalytics\Internals\ParameterHolder
+    @param Internals\ParameterHolder p
+    @return Internals\ParameterHolder
     """
     def buildCampaignParameters(self, p):
-        campaign = self.tracker.getCampaign()
+        campaign = self.tracker.campaign
         if campaign:
-            p.__utmz  = self.generateDomainHash() + '.'
-            p.__utmz .= utils.totimestamp(campaign.getCreationTime()) + '.'
-            p.__utmz .= self.visitor.visit_count + '.'
-            p.__utmz .= campaign.getResponselen() + '.'
-            
-            # See http://code.google.com/p/gaforflash/source/browse/trunk/src/com/google/analytics/campaign/CampaignTracker.as#236
-            data = {
-                'utmcid': campaign.id,
-                'utmcsr': campaign.source,
-                'utmgclid': campaign.g_click_id,
-                'utmdclid': campaign.d_click_id,
-                'utmccn': campaign.name,
-                'utmcmd': campaign.medium,
-                'utmctr': campaign.term,
-                'utmcct': campaign.content,
-            }
-
-            for key, value in data:
-                if value:
-                    # Only spaces and pluses get escaped in gaforflash and ga.js, so we do the same
-                    p.__utmz += key + '=' + utils.replace_all(value, {'+': '%20', ' ': '%20'}) + Request.CAMPAIGN_DELIMITER
- 
-            p.__utmz = p.__utmz.rstrip(Request.CAMPAIGN_DELIMITER)
+            # Only the counters vary per request, the rest is cached by the campaign
+            timestamp, data = campaign.get_utmz_data()
+            p._utmz = '%s.%d.%s.%s.%s' % (self.generateDomainHash(), timestamp, self.visitor.visit_count,
+                                           self.response_count, data)
 
         return p
 
@@ -249,51 +274,46 @@ class Request(HttpRequest):
     @return string
     """
     def generateDomainHash(self):
-        hash = 1
-
-        if self.tracker.allow_hash:
-            hash = utils.generate_hash(self.tracker.getDomainName())
-
-        return hash
+        return self.tracker.domain_hash
 
 
     """ 
-    @return \UnitedPrototype\GoogleAnalytics\Tracker
+    @return Tracker
     """
     def getTracker(self):
         return self.tracker
 
 
     """ 
-    @param \UnitedPrototype\GoogleAnalytics\Tracker tracker
+    @param Tracker tracker
     """
     def setTracker(self, tracker):
         self.tracker = tracker
 
 
     """ 
-    @return \UnitedPrototype\GoogleAnalytics\Visitor
+    @return Visitor
     """
     def getVisitor(self):
         return self.visitor
 
 
     """ 
-    @param \UnitedPrototype\GoogleAnalytics\Visitor visitor
+    @param Visitor visitor
     """
     def setVisitor(self, visitor):
         self.visitor = visitor
 
 
     """ 
-    @return \UnitedPrototype\GoogleAnalytics\Session
+    @return Session
     """
     def getSession(self):
         return self.session
 
 
     """ 
-    @param \UnitedPrototype\GoogleAnalytics\Session session
+    @param Session session
     """
     def setSession(self, session):
         self.session = session
@@ -26,34 +26,31 @@ Google Analytics is a registered trademark of Google Inc.
 @copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
 """
 
-from analytics.internal.request import Request, PageviewRequest
+from analytics.internals.requests.PageviewRequest import PageviewRequest
+from analytics.internals.requests.Request import Request
 
-class SocialinteractionRequest(PageviewRequest):
 
-    """ 
-    @var \UnitedPrototype\GoogleAnalytics\SocialInteraction
-    """
-    
-    def __init__(self):
-        self.socialInteraction = None
+class SocialInteractionRequest(PageviewRequest):
+
+    def __init__(self, config=None):
+        super(SocialInteractionRequest, self).__init__(config)
+
+        self.social_interaction = None
 
 
-    """ 
-    @return string
-    """
     def getType(self):
         return Request.TYPE_SOCIAL
 
 
     """ 
-    @return \UnitedPrototype\GoogleAnalytics\Internals\ParameterHolder
+    @return Internals\ParameterHolder
     """
-    def buildParameters(self):
-        p = super(SocialinteractionRequest, self).buildParameters()
+    def build_parameters(self):
+        p = super(SocialInteractionRequest, self).build_parameters()
 
-        p.utmsn  = self.socialInteraction.getNetwork()
-        p.utmsa  = self.socialInteraction.getAction()
-        p.utmsid = self.socialInteraction.getTarget()
+        p.utmsn  = self.social_interaction.getNetwork()
+        p.utmsa  = self.social_interaction.getAction()
+        p.utmsid = self.social_interaction.getTarget()
         if not p.utmsid:
             # Default to page path like ga.js,
             # see http://code.google.com/apis/analytics/docs/tracking/gaTrackingSocial.html#settingUp
@@ -63,18 +60,14 @@ class SocialinteractionRequest(PageviewRequest):
 
 
     """ 
-    @return \UnitedPrototype\GoogleAnalytics\SocialInteraction
+    @return SocialInteraction
     """
     def getSocialInteraction(self):
-        return self.socialInteraction
+        return self.social_interaction
 
 
     """ 
-    @param \UnitedPrototype\GoogleAnalytics\SocialInteraction socialInteraction
+    @param SocialInteraction social_interaction
     """
-    def setSocialInteraction(self, socialInteraction):
-        self.socialInteraction = socialInteraction
-
-
-
-
+    def setSocialInteraction(self, social_interaction):
+        self.social_interaction = social_interaction
@@ -28,20 +28,89 @@ Google Analytics is a registered trademark of Google Inc.
 
 # @link http://code.google.com/p/gaforflash/source/browse/trunk/src/com/google/analytics/core/Utils.as
 
+from collections import OrderedDict
 import random
-import urllib
+import struct
+import sys
+import threading
 import time
 
+from analytics.internals.compat import PY2, text_type, to_bytes
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+
+def _build_encoding_table(safe, space):
+    table = ['%%%02X' % byte for byte in range(256)]
+    for byte in bytearray(safe, 'ascii'):
+        table[byte] = chr(byte)
+    table[ord(' ')] = space
+    return table
+
+
+# Characters left alone by both urllib.quote() and Javascript's encodeURIComponent()
+URI_COMPONENT_SAFE = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-!*\'()'
+
+# Same characters as bytes, for deleting them with bytes.translate()
+URI_COMPONENT_SAFE_BYTES = URI_COMPONENT_SAFE.encode('ascii')
+
+# urllib.quote() does not escape "/" by default
+URI_COMPONENT_TABLE = _build_encoding_table(URI_COMPONENT_SAFE + '/', '%20')
+
+# urllib.urlencode() escapes "/" and encodes spaces as "+"
+QUERY_COMPONENT_TABLE = _build_encoding_table(URI_COMPONENT_SAFE, '+')
+
+
+def _encode(value, table):
+    if not isinstance(value, (bytes, text_type)):
+        value = str(value)
+    value = to_bytes(value)
+
+    # Nothing to escape, which is the case for most values
+    if not value.translate(None, URI_COMPONENT_SAFE_BYTES):
+        return value if PY2 else value.decode('ascii')
+
+    return ''.join(map(table.__getitem__, bytearray(value)))
 
 
 def encode_uri_component(value):
     """
     Mimics Javascript's encodeURIComponent() def for consistency with the GA Javascript client.
+    Encodes in a single pass over the UTF-8 bytes, producing exactly what
+    convert_to_uri_component_encoding(urllib.quote(value)) used to.
+
+    @param mixed value
+    @return string
+    """
+    return _encode(value, URI_COMPONENT_TABLE)
+
+
+def encode_query_component(value):
+    """
+    Like encode_uri_component(), but for a key or value of a query string, i.e.
+    equivalent to applying convert_to_uri_component_encoding() to the result of
+    urllib.urlencode().
 
     @param mixed value
     @return string
     """
-    return convert_to_uri_component_encoding(urllib.quote(value))
+    return _encode(value, QUERY_COMPONENT_TABLE)
+
+
+def build_query_string(parameters):
+    """
+    @param dict|list parameters Mapping or sequence of (key, value) tuples
+    @return string
+    """
+    if hasattr(parameters, 'items'):
+        parameters = parameters.items()
+
+    return '&'.join([encode_query_component(key) + '=' + encode_query_component(value)
+                     for key, value in parameters])
 
 
 """ 
@@ -70,21 +139,83 @@ def generate_32bit_random():
     return random.getrandbits(32)
 
 
+class LRUCache(object):
+    """
+    Thread-safe mapping of bounded size which evicts the least recently used
+    entry once it is full, and counts cache hits and misses.
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+
+            # Re-insert to mark the entry as most recently used
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+
+    def put(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+    def stats(self):
+        """
+        @return dict
+        """
+        with self._lock:
+            return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+
+GENERATE_HASH_CACHE = LRUCache(4096)
+
 """ 
-Generates a hash for input string.
+Generates a hash for input string. Results are memoized in a bounded LRU cache,
+as the same few strings (domain names, user agents) get hashed over and over.
 
 @link http://code.google.com/p/gaforflash/source/browse/trunk/src/com/google/analytics/core/Utils.as#44
 @param string string
 @return int
 """
 def generate_hash(string):
+    hashval = GENERATE_HASH_CACHE.get(string)
+    if hashval is None:
+        hashval = _generate_hash(string)
+        GENERATE_HASH_CACHE.put(string, hashval)
+
+    return hashval
+
+
+def _generate_hash(string):
     hashval = 1
     
     if string:
         hashval = 0
-        length = len(string)
-        for pos in range(length-1, -1, -1):
-            current   = ord(string[pos])
+        # Indexing bytes yields ints on Python 3, but 1 character strings on Python 2
+        codes = bytearray(string) if isinstance(string, bytes) else [ord(char) for char in string]
+        for current in reversed(codes):
             hashval      = ((hashval << 6) & 0xfffffff) + current + (current << 14)
             leftMost7 = hashval & 0xfe00000
             if leftMost7 != 0:
@@ -93,12 +224,141 @@ def generate_hash(string):
     return hashval
 
 
+def generate_hash_many(strings):
+    """
+    Bulk version of generate_hash(), returning bit-identical results for e.g.
+    backfilling millions of visitor IDs. Vectorized with NumPy if it is
+    installed, otherwise falls back to hashing one string at a time.
+
+    @param iterable strings
+    @return list of int
+    """
+    strings = list(strings)
+    if numpy is None:
+        return [_generate_hash(string) for string in strings]
+
+    result = [1] * len(strings)
+
+    # Byte strings and text strings are converted to code arrays separately
+    groups = {}
+    for i, string in enumerate(strings):
+        if string:
+            groups.setdefault(isinstance(string, bytes), []).append(i)
+
+    for is_bytes, indexes in groups.items():
+        hashes = _generate_hash_numpy([strings[i] for i in indexes], is_bytes)
+        for i, hashval in zip(indexes, hashes):
+            result[i] = hashval
+
+    return result
+
+
+def _generate_hash_numpy(strings, is_bytes):
+    """
+    Hashes non-empty strings of one type. Instead of padding the strings to a
+    common length, they are ordered by length, so that at step k (the k-th
+    character from the end) exactly the leading rows that are still longer
+    than k take part.
+    """
+    if is_bytes:
+        codes = numpy.frombuffer(b''.join(strings), dtype=numpy.uint8)
+    elif sys.maxunicode > 0xffff:
+        codes = numpy.frombuffer(u''.join(strings).encode('utf-32-le'), dtype='<u4')
+    else:
+        # Narrow builds index unicode strings by UTF-16 code unit, so does ord()
+        codes = numpy.frombuffer(u''.join(strings).encode('utf-16-le'), dtype='<u2')
+    codes = codes.astype(numpy.int64)
+
+    lengths = numpy.fromiter((len(string) for string in strings), dtype=numpy.int64, count=len(strings))
+    ends = numpy.cumsum(lengths) - 1
+
+    order = numpy.argsort(-lengths, kind='mergesort')
+    sorted_lengths = lengths[order]
+    sorted_ends = ends[order]
+    # Amount of strings longer than k, for every k
+    active = len(strings) - numpy.searchsorted(sorted_lengths[::-1], numpy.arange(sorted_lengths[0]), side='right')
+
+    hashvals = numpy.zeros(len(strings), dtype=numpy.int64)
+    for k in range(int(sorted_lengths[0])):
+        n = active[k]
+        current = codes[sorted_ends[:n] - k]
+        hashval = ((hashvals[:n] << 6) & 0xfffffff) + current + (current << 14)
+        hashval ^= (hashval & 0xfe00000) >> 21
+        hashvals[:n] = hashval
+
+    result = numpy.empty_like(hashvals)
+    result[order] = hashvals
+    return result.tolist()
+
+
 
 def replace_all(text, dic):
-    for old, new in dic.iteritems():
+    for old, new in dic.items():
         text = text.replace(old, new)
     return text
 
 
 def totimestamp(d):
     return time.mktime(d.timetuple())
+
+
+STRING_LENGTH = struct.Struct('!H')
+
+# Length marker for None values in pack_strings()
+NONE_LENGTH = 0xffff
+
+
+def pack_strings(values):
+    """
+    Serializes strings (or None) as 16 bit length-prefixed UTF-8, for the
+    to_bytes() methods of the objects meant to be persisted.
+
+    @param list values
+    @return string
+    """
+    parts = []
+    for value in values:
+        if value is None:
+            parts.append(STRING_LENGTH.pack(NONE_LENGTH))
+        else:
+            if not isinstance(value, (bytes, text_type)):
+                value = str(value)
+            value = to_bytes(value)
+
+            if len(value) >= NONE_LENGTH:
+                raise ValueError('Strings longer than %d bytes can not be serialized' % (NONE_LENGTH - 1))
+
+            parts.append(STRING_LENGTH.pack(len(value)))
+            parts.append(value)
+
+    return b''.join(parts)
+
+
+def unpack_strings(data, offset, count):
+    """
+    Counterpart of pack_strings(), strings are returned as native str, i.e.
+    UTF-8 encoded on Python 2 and decoded on Python 3.
+
+    @param string data
+    @param int offset Position of the first string within data
+    @param int count Amount of strings to read
+    @raise ValueError if data is truncated or malformed
+    @return tuple (list values, int offset after the last string)
+    """
+    values = []
+    for i in range(count):
+        try:
+            length, = STRING_LENGTH.unpack_from(data, offset)
+        except struct.error:
+            raise ValueError('Truncated string data')
+        offset += STRING_LENGTH.size
+        if length == NONE_LENGTH:
+            values.append(None)
+        else:
+            if offset + length > len(data):
+                raise ValueError('Truncated string data')
+            value = data[offset:offset + length]
+            values.append(value if PY2 else value.decode('utf-8'))
+            offset += length
+
+    return values, offset
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+# The package lives in src/ and is not installed, the stub collector in tools/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+from analytics.Config import Config
+from analytics.Item import Item
+from analytics.Tracker import Tracker
+from analytics.Transaction import Transaction
+
+from StubCollector import StubCollector
+
+# AsyncTracker and its tests use async/await syntax
+collect_ignore = ['test_async_tracker.py'] if sys.version_info < (3, 5) else []
+
+
+@pytest.fixture
+def collector():
+    with StubCollector() as collector:
+        yield collector
+
+
+@pytest.fixture
+def make_tracker(collector):
+    def make(**properties):
+        properties['EndPointHost'] = collector.endpoint_host
+        return Tracker('UA-1234567-8', 'www.example.com', Config(properties))
+    return make
+
+
+@pytest.fixture
+def make_transaction():
+    def make(order_id, skus):
+        transaction = Transaction()
+        transaction.order_id = order_id
+        transaction.total = 20
+        for sku in skus:
+            item = Item()
+            item.setSku(sku)
+            item.setPrice(10)
+            transaction.add_item(item)
+        return transaction
+    return make
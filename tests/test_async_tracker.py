@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from analytics.AsyncTracker import AsyncTracker, AsyncTransportError
+from analytics.Config import Config
+from analytics.Page import Page
+from analytics.Session import Session
+from analytics.Visitor import Visitor
+
+from StubCollector import StubCollector
+
+
+@pytest.fixture
+def make_tracker(collector):
+    def make(**properties):
+        properties['EndPointHost'] = collector.endpoint_host
+        return AsyncTracker('UA-1234567-8', 'www.example.com', Config(properties))
+    return make
+
+
+def run(tracker, coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await tracker.close()
+
+    return asyncio.run(main())
+
+
+def test_track_pageview(make_tracker, collector):
+    tracker = make_tracker()
+
+    assert run(tracker, tracker.track_pageview(Page('/page'), Session(), Visitor())) == StubCollector.GIF
+    assert [hit['utmp'] for hit in collector.hits()] == ['/page']
+
+
+def test_track_pageview_over_the_session_limit_is_dropped(make_tracker, collector):
+    tracker = make_tracker(SessionHitLimit=1, SessionLimitPolicy=Config.SESSION_LIMIT_DROP)
+    session = Session()
+    visitor = Visitor()
+
+    async def track():
+        return [await tracker.track_pageview(Page('/%d' % i), session, visitor) for i in range(2)]
+
+    assert run(tracker, track()) == [StubCollector.GIF, None]
+    assert [hit['utmp'] for hit in collector.hits()] == ['/0']
+
+
+def test_track_transaction_sends_the_transaction_first(make_tracker, make_transaction, collector):
+    tracker = make_tracker()
+
+    responses = run(tracker, tracker.track_transaction(make_transaction('order-1', ['a', 'b', 'c']),
+                                                       Session(), Visitor()))
+
+    assert responses == [StubCollector.GIF] * 4
+    hits = collector.hits()
+    assert hits[0]['utmt'] == 'tran'
+    assert sorted(hit['utmipc'] for hit in hits[1:]) == ['a', 'b', 'c']
+
+
+def test_track_transaction_skips_dropped_requests(make_tracker, make_transaction, collector):
+    tracker = make_tracker(SessionHitLimit=2, SessionLimitPolicy=Config.SESSION_LIMIT_DROP,
+                           TransactionOrder=Config.TRANSACTION_ORDER_NONE)
+
+    responses = run(tracker, tracker.track_transaction(make_transaction('order-2', ['a', 'b']),
+                                                       Session(), Visitor()))
+
+    assert responses == [StubCollector.GIF] * 2
+    assert len(collector.hits()) == 2
+
+
+def test_track_transaction_skips_items_when_the_transaction_fails(make_tracker, make_transaction, collector):
+    tracker = make_tracker()
+    collector.error_rate = 1
+
+    with pytest.raises(AsyncTransportError):
+        run(tracker, tracker.track_transaction(make_transaction('order-3', ['a', 'b', 'c']), Session(), Visitor()))
+
+    assert collector.stats()['requests'] == 1
+
+
+def test_track_transaction_reports_failures_after_sending_everything(make_tracker, make_transaction, collector):
+    tracker = make_tracker(TransactionOrder=Config.TRANSACTION_ORDER_NONE)
+    collector.error_rate = 1
+
+    with pytest.raises(AsyncTransportError):
+        run(tracker, tracker.track_transaction(make_transaction('order-4', ['a', 'b', 'c']), Session(), Visitor()))
+
+    # A failing request does not cancel the others
+    assert collector.stats()['requests'] == 4
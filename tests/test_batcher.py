@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from analytics.Config import Config
+from analytics.internals.Batcher import Batcher
+from analytics.internals.RateLimiter import TokenBucket
+
+
+class RecordingSend(object):
+
+    def __init__(self):
+        self.requests = []
+        self.threads = []
+        self.release = threading.Event()
+        self.sent = threading.Event()
+
+    def __call__(self, config, request):
+        self.release.wait(5)
+        self.requests.append(request)
+        self.threads.append(threading.current_thread().name)
+        self.sent.set()
+
+
+def make_batcher(send, **properties):
+    properties.setdefault('BatchMaxHits', 2)
+    properties.setdefault('BatchFlushInterval', 60)
+    properties['EndPointHost'] = 'collector.invalid'
+    config = Config(properties)
+    return config, Batcher(config, send)
+
+
+def test_full_batch_is_sent_by_the_background_thread():
+    send = RecordingSend()
+    config, batcher = make_batcher(send)
+
+    # Would block until the release if the batch was sent right here
+    batcher.put_payload('utmp=%2Fa', account_id='UA-1-1')
+    batcher.put_payload('utmp=%2Fb', account_id='UA-1-1')
+    assert not send.requests
+
+    send.release.set()
+    assert send.sent.wait(5)
+    assert send.threads == ['analytics-batcher']
+    assert send.requests[0].data == b'utmp=%2Fa\nutmp=%2Fb'
+
+
+def test_batches_are_split_per_account_and_count_every_hit():
+    send = RecordingSend()
+    send.release.set()
+    config, batcher = make_batcher(send, BatchMaxHits=10)
+
+    batcher.put_payload('utmp=%2Fa', account_id='UA-1-1')
+    batcher.put_payload('utmp=%2Fb', account_id='UA-2-1')
+    batcher.put_payload('utmp=%2Fc', account_id='UA-1-1')
+    batcher.flush()
+
+    assert [(request.account_id, request.hit_count, request.data) for request in send.requests] == [
+        ('UA-1-1', 2, b'utmp=%2Fa\nutmp=%2Fc'),
+        ('UA-2-1', 1, b'utmp=%2Fb'),
+    ]
+
+
+def test_flush_sends_full_batches_not_taken_yet():
+    send = RecordingSend()
+    config, batcher = make_batcher(send)
+    for i in range(5):
+        batcher.put_payload('utmp=%%2F%d' % i)
+    assert batcher.stats()['pending'] >= 3
+
+    send.release.set()
+    batcher.flush()
+    # The background thread may still be finishing the batch it took
+    deadline = time.time() + 5
+    while len(send.requests) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+
+    sent = b'\n'.join(request.data for request in send.requests).split(b'\n')
+    assert sorted(sent) == [('utmp=%%2F%d' % i).encode('ascii') for i in range(5)]
+
+
+def test_token_bucket_takes_a_token_per_hit():
+    bucket = TokenBucket(10, 10)
+    assert bucket.reserve(4) == 0
+    assert bucket.reserve(8) == pytest.approx(0.2, abs=0.01)
@@ -0,0 +1,63 @@
+import time
+
+from analytics.internals.CircuitBreaker import CircuitBreaker
+
+
+def test_opens_after_threshold_consecutive_failures():
+    breaker = CircuitBreaker('breaker-open', threshold=3, reset_timeout=60)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert not breaker.allow()
+    assert breaker.stats() == {'state': CircuitBreaker.OPEN, 'failures': 3, 'trips': 1, 'rejected': 2}
+
+
+def test_half_open_lets_exactly_one_probe_through():
+    breaker = CircuitBreaker('breaker-half-open', threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_failed_probe_reopens_the_circuit():
+    breaker = CircuitBreaker('breaker-probe-failure', threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.trips == 2
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes_the_circuit():
+    breaker = CircuitBreaker('breaker-probe-success', threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+    assert breaker.stats()['failures'] == 0
+
+
+def test_stats_all():
+    breaker = CircuitBreaker.for_host('breaker-stats', threshold=1)
+    breaker.record_failure()
+
+    assert CircuitBreaker.stats_all()['breaker-stats']['state'] == CircuitBreaker.OPEN
@@ -0,0 +1,46 @@
+import errno
+import socket
+import time
+
+import pytest
+
+from analytics.internals.ConnectionPool import ConnectError, ConnectionPool
+from analytics.internals.compat import httplib
+
+from StubCollector import StubCollector
+
+
+def test_timeout_on_reused_connection_is_not_resent():
+    with StubCollector() as collector:
+        pool = ConnectionPool(collector.endpoint_host)
+        response, data = pool.request('GET', '/__utm.gif?utmp=%2Ffirst', timeout=5)
+        assert data == StubCollector.GIF
+
+        collector.latency = 0.5
+        with pytest.raises(socket.timeout):
+            pool.request('GET', '/__utm.gif?utmp=%2Fsecond', timeout=0.1)
+
+        # Give a wrongly resent request the chance to arrive
+        time.sleep(0.3)
+        assert [hit['utmp'] for hit in collector.hits()] == ['/first', '/second']
+        pool.close()
+
+
+def test_is_stale():
+    assert ConnectionPool.is_stale(httplib.BadStatusLine(''))
+    assert ConnectionPool.is_stale(socket.error(errno.ECONNRESET, 'Connection reset by peer'))
+    assert not ConnectionPool.is_stale(socket.timeout('timed out'))
+    assert not ConnectionPool.is_stale(socket.error(errno.ECONNREFUSED, 'Connection refused'))
+    assert not ConnectionPool.is_stale(httplib.IncompleteRead(b''))
+
+
+def test_failing_to_connect_raises_connect_error():
+    # Bound but never listening, so connecting gets refused
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    pool = ConnectionPool('127.0.0.1:%d' % sock.getsockname()[1])
+    try:
+        with pytest.raises(ConnectError):
+            pool.request('GET', '/__utm.gif', timeout=1)
+    finally:
+        sock.close()
@@ -0,0 +1,194 @@
+import gc
+import os
+import threading
+import time
+
+import pytest
+
+from analytics.Config import Config
+from analytics.internals.Batcher import Batcher
+from analytics.internals.Dispatcher import Dispatcher
+
+
+class BlockingSend(object):
+
+    def __init__(self):
+        self.sent = []
+        self.requests = []
+        self.release = threading.Event()
+
+    def __call__(self, config, request):
+        self.release.wait(5)
+        # Whether the config was still there, without keeping it alive
+        self.sent.append(config is not None)
+        self.requests.append(request)
+
+
+def make_config(**properties):
+    properties['EndPointHost'] = 'collector.invalid'
+    return Config(properties)
+
+
+def count_threads(prefix):
+    return len([thread for thread in threading.enumerate() if thread.name.startswith(prefix)])
+
+
+def wait_for(condition):
+    deadline = time.time() + 5
+    while not condition() and time.time() < deadline:
+        gc.collect()
+        time.sleep(0.01)
+    return condition()
+
+
+def test_idle_dispatchers_release_their_config_and_threads():
+    send = BlockingSend()
+    send.release.set()
+    threads = count_threads('analytics-dispatcher-')
+
+    configs = [make_config(DispatchThreads=2) for i in range(20)]
+    for config in configs:
+        dispatcher = Dispatcher.for_config(config, send)
+        dispatcher.put(object())
+        assert dispatcher.join(5)
+    assert count_threads('analytics-dispatcher-') == threads + 40
+
+    del config, configs, dispatcher
+    assert wait_for(lambda: count_threads('analytics-dispatcher-') == threads)
+    assert send.sent == [True] * 20
+
+
+def fill_queue(policy, **properties):
+    """
+    Returns a dispatcher whose only sender thread is stuck sending request 0,
+    with requests 1 and 2 filling its queue.
+    """
+    send = BlockingSend()
+    config = make_config(DispatchThreads=1, DispatchQueueSize=2, DispatchOverflowPolicy=policy, **properties)
+    dispatcher = Dispatcher(config, send)
+    dispatcher.put(0)
+    assert wait_for(lambda: dispatcher.stats()['pending'] == 0)
+    assert dispatcher.put(1)
+    assert dispatcher.put(2)
+    # The threads of the dispatcher stop once the config got garbage collected
+    return config, dispatcher
+
+
+def test_overflow_drops_the_oldest_request():
+    config, dispatcher = fill_queue(Config.DISPATCH_OVERFLOW_DROP_OLDEST)
+
+    assert dispatcher.put(3)
+    dispatcher.send.release.set()
+    assert dispatcher.join(5)
+
+    assert dispatcher.send.requests == [0, 2, 3]
+    assert dispatcher.stats() == {'queued': 4, 'sent': 3, 'failed': 0, 'dropped': 1, 'pending': 0}
+
+
+def test_overflow_drops_the_newest_request():
+    config, dispatcher = fill_queue(Config.DISPATCH_OVERFLOW_DROP_NEWEST)
+
+    assert not dispatcher.put(3)
+    dispatcher.send.release.set()
+    assert dispatcher.join(5)
+
+    assert dispatcher.send.requests == [0, 1, 2]
+    assert dispatcher.stats() == {'queued': 3, 'sent': 3, 'failed': 0, 'dropped': 1, 'pending': 0}
+
+
+def test_overflow_blocks_until_the_queue_has_room():
+    config, dispatcher = fill_queue(Config.DISPATCH_OVERFLOW_BLOCK, DispatchBlockTimeout=5)
+
+    timer = threading.Timer(0.1, dispatcher.send.release.set)
+    timer.start()
+    started = time.time()
+    assert dispatcher.put(3)
+    assert time.time() - started >= 0.05
+    assert dispatcher.join(5)
+    timer.join()
+
+    assert dispatcher.send.requests == [0, 1, 2, 3]
+    assert dispatcher.stats() == {'queued': 4, 'sent': 4, 'failed': 0, 'dropped': 0, 'pending': 0}
+
+
+def test_overflow_drops_the_request_once_blocking_timed_out():
+    config, dispatcher = fill_queue(Config.DISPATCH_OVERFLOW_BLOCK, DispatchBlockTimeout=0.1)
+
+    started = time.time()
+    assert not dispatcher.put(3)
+    assert time.time() - started >= 0.05
+    dispatcher.send.release.set()
+    assert dispatcher.join(5)
+
+    assert dispatcher.send.requests == [0, 1, 2]
+    assert dispatcher.stats() == {'queued': 3, 'sent': 3, 'failed': 0, 'dropped': 1, 'pending': 0}
+
+
+def test_failed_requests_are_counted():
+    def send(config, request):
+        if request % 2:
+            raise IOError('Connection refused')
+
+    config = make_config(DispatchThreads=2)
+    dispatcher = Dispatcher(config, send)
+    for request in range(5):
+        assert dispatcher.put(request)
+    assert dispatcher.join(5)
+
+    assert dispatcher.stats() == {'queued': 5, 'sent': 3, 'failed': 2, 'dropped': 0, 'pending': 0}
+
+
+def test_idle_batchers_release_their_config_and_thread():
+    threads = count_threads('analytics-batcher')
+
+    config = make_config(BatchFlushInterval=0.05)
+    batcher = Batcher.for_config(config, BlockingSend())
+    batcher.send.release.set()
+    batcher.put_payload('utmp=%2F')
+    assert count_threads('analytics-batcher') == threads + 1
+
+    # The pending hit keeps the config alive until it got sent
+    del config
+    assert wait_for(lambda: batcher.send.sent == [True])
+    assert wait_for(lambda: count_threads('analytics-batcher') == threads)
+    assert batcher.config is None
+
+
+def test_queued_requests_keep_the_config_alive():
+    send = BlockingSend()
+    config = make_config(DispatchThreads=1)
+    dispatcher = Dispatcher.for_config(config, send)
+    dispatcher.put(object())
+    dispatcher.put(object())
+
+    del config
+    gc.collect()
+    send.release.set()
+    assert dispatcher.join(5)
+
+    assert send.sent == [True, True]
+    assert wait_for(lambda: dispatcher.config is None)
+    assert wait_for(lambda: not any(thread.is_alive() for thread in dispatcher._threads))
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires os.fork()')
+def test_forked_child_does_not_resend_queued_requests():
+    send = BlockingSend()
+    config = make_config(DispatchThreads=1)
+    dispatcher = Dispatcher.for_config(config, send)
+    dispatcher.put(object())
+    dispatcher.put(object())
+
+    pid = os.fork()
+    if not pid:
+        try:
+            send.release.set()
+            dispatcher.put(object())
+            ok = dispatcher.join(5) and send.sent == [True] and dispatcher.stats()['pending'] == 0
+        finally:
+            os._exit(0 if ok else 1)
+
+    assert os.waitpid(pid, 0)[1] == 0
+    send.release.set()
+    assert dispatcher.join(5)
+    assert send.sent == [True, True]
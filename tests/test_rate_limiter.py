@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from analytics.Config import Config
+from analytics.internals.RateLimiter import RateLimiter, RateLimitError, TokenBucket
+
+
+def make_limiter(**properties):
+    config = Config(properties)
+    # The limiter only keeps a proxy of its config
+    return config, RateLimiter(config)
+
+
+def test_bucket_lets_requests_larger_than_the_burst_through_once_full():
+    bucket = TokenBucket(5, 10)
+    assert bucket.reserve(20) == 0
+    # The hits beyond the burst are paid for by the next request
+    assert bucket.reserve(1) == pytest.approx(2.2, abs=0.01)
+
+    bucket = TokenBucket(5, 10)
+    assert bucket.reserve(5) == 0
+    assert bucket.reserve(20) == pytest.approx(1, abs=0.01)
+
+
+def test_acquire_grants_batches_larger_than_the_burst():
+    config, limiter = make_limiter(RateLimit=5, RateLimitBurst=10, RateLimitMaxWait=1)
+
+    limiter.acquire(tokens=20)
+
+    assert limiter.stats()['acquired'] == 1
+    assert limiter.stats()['delayed'] == 0
+
+
+def test_acquire_waits_for_a_token():
+    config, limiter = make_limiter(RateLimit=20, RateLimitBurst=1, RateLimitMaxWait=1)
+
+    started = time.time()
+    limiter.acquire()
+    limiter.acquire()
+
+    assert time.time() - started >= 0.04
+    stats = limiter.stats()
+    assert stats['acquired'] == 2
+    assert stats['delayed'] == 1
+    assert stats['waited'] == pytest.approx(0.05, abs=0.01)
+
+
+def test_acquire_rejects_and_returns_the_tokens():
+    config, limiter = make_limiter(RateLimit=4, RateLimitBurst=2, RateLimitMaxWait=0.3)
+
+    limiter.acquire(tokens=2)
+    with pytest.raises(RateLimitError):
+        limiter.acquire(tokens=2)
+
+    # Had the rejected request kept its tokens, this one would have to wait too long as well
+    limiter.acquire()
+    assert limiter.stats()['rejected'] == 1
+    assert limiter.stats()['acquired'] == 2
+
+
+def test_account_limit_applies_per_account():
+    config, limiter = make_limiter(AccountRateLimit=1, AccountRateLimitBurst=1, RateLimitMaxWait=0)
+
+    limiter.acquire('UA-1')
+    limiter.acquire('UA-2')
+    with pytest.raises(RateLimitError):
+        limiter.acquire('UA-1')
+
+
+def test_buckets_are_rebuilt_when_the_config_changes():
+    config, limiter = make_limiter(RateLimit=1, RateLimitBurst=1, RateLimitMaxWait=0)
+
+    limiter.acquire()
+    with pytest.raises(RateLimitError):
+        limiter.acquire()
+
+    config.setRateLimitBurst(5)
+    for i in range(5):
+        limiter.acquire()
+
+    config.setRateLimit(None)
+    for i in range(10):
+        limiter.acquire()
+    assert limiter.stats()['rejected'] == 1
@@ -0,0 +1,131 @@
+import errno
+import socket
+
+import pytest
+
+from analytics.Config import Config
+from analytics.internals.CircuitBreaker import CircuitBreaker, CircuitOpenError
+from analytics.internals.ConnectionPool import ConnectError
+from analytics.internals.RetryPolicy import RetryPolicy
+from analytics.internals.compat import urllib2
+
+
+class FailingSend(object):
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+def connect_error():
+    return ConnectError(errno.ECONNREFUSED, 'Connection refused')
+
+
+def http_error(code):
+    return urllib2.HTTPError('http://127.0.0.1/__utm.gif', code, 'Error', {}, None)
+
+
+def make_policy(**properties):
+    properties.setdefault('RetryBackoff', 0)
+    properties.setdefault('CircuitBreakerThreshold', 0)
+    config = Config(properties)
+    # The policy only keeps a proxy of its config
+    return config, RetryPolicy(config)
+
+
+def test_only_one_attempt_by_default():
+    config, policy = make_policy()
+    send = FailingSend(connect_error())
+
+    with pytest.raises(ConnectError):
+        policy.call('retry-default', send)
+
+    assert send.calls == 1
+    assert policy.stats() == {'requests': 1, 'retries': 0, 'failed': 1, 'rejected': 0}
+
+
+def test_failed_connections_are_retried():
+    config, policy = make_policy(RetryMaxAttempts=3)
+    send = FailingSend(connect_error(), urllib2.URLError(socket.error(errno.ECONNREFUSED, 'Connection refused')))
+
+    assert policy.call('retry-connect', send) == 'ok'
+
+    assert send.calls == 3
+    assert policy.stats() == {'requests': 1, 'retries': 2, 'failed': 0, 'rejected': 0}
+
+
+def test_retries_stop_at_max_attempts():
+    config, policy = make_policy(RetryMaxAttempts=3)
+    send = FailingSend(*[connect_error() for i in range(5)])
+
+    with pytest.raises(ConnectError):
+        policy.call('retry-max', send)
+
+    assert send.calls == 3
+    assert policy.stats()['failed'] == 1
+
+
+@pytest.mark.parametrize('error', [
+    socket.timeout('timed out'),
+    socket.error(errno.ECONNRESET, 'Connection reset by peer'),
+])
+def test_errors_after_sending_are_not_retried(error):
+    config, policy = make_policy(RetryMaxAttempts=3)
+    send = FailingSend(error)
+
+    with pytest.raises(type(error)):
+        policy.call('retry-sent', send)
+
+    # The hit may have been counted already
+    assert send.calls == 1
+    assert policy.stats()['retries'] == 0
+
+
+def test_only_statuses_from_retry_on_status_are_retried():
+    config, policy = make_policy(RetryMaxAttempts=3)
+    send = FailingSend(http_error(503))
+    assert policy.call('retry-status', send) == 'ok'
+    assert send.calls == 2
+
+    send = FailingSend(http_error(400))
+    with pytest.raises(urllib2.HTTPError):
+        policy.call('retry-status', send)
+    assert send.calls == 1
+
+
+def test_open_circuit_rejects_without_sending():
+    host = 'retry-circuit'
+    config, policy = make_policy(CircuitBreakerThreshold=2, CircuitBreakerResetTimeout=60)
+
+    for i in range(2):
+        with pytest.raises(socket.timeout):
+            policy.call(host, FailingSend(socket.timeout('timed out')))
+
+    send = FailingSend()
+    with pytest.raises(CircuitOpenError):
+        policy.call(host, send)
+
+    assert send.calls == 0
+    assert policy.stats()['rejected'] == 1
+    assert CircuitBreaker.stats_all()[host]['state'] == CircuitBreaker.OPEN
+
+
+def test_non_transient_errors_close_the_circuit():
+    host = 'retry-non-transient'
+    config, policy = make_policy(CircuitBreakerThreshold=2)
+
+    with pytest.raises(socket.timeout):
+        policy.call(host, FailingSend(socket.timeout('timed out')))
+    # The host answered, so it is up
+    with pytest.raises(urllib2.HTTPError):
+        policy.call(host, FailingSend(http_error(400)))
+    with pytest.raises(socket.timeout):
+        policy.call(host, FailingSend(socket.timeout('timed out')))
+
+    assert CircuitBreaker.stats_all()[host]['state'] == CircuitBreaker.CLOSED
@@ -0,0 +1,74 @@
+import gc
+import os
+import threading
+import time
+
+import pytest
+
+from analytics.Page import Page
+from analytics.SenderPool import SenderPool
+from analytics.Session import Session
+from analytics.Tracker import Tracker
+from analytics.Visitor import Visitor
+from analytics.internals.Dispatcher import Dispatcher
+
+from StubCollector import StubCollector
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires os.fork()')
+
+
+def wait_for_unsafe_threads():
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        gc.collect()
+        if not [thread for thread in threading.enumerate()
+                if thread.name.startswith(SenderPool.UNSAFE_THREAD_PREFIXES)]:
+            return
+        time.sleep(0.01)
+
+
+def pageviews(count):
+    hits = []
+    for i in range(count):
+        visitor = Visitor()
+        hits.append((Tracker.HIT_PAGEVIEW, Page('/%d' % i), Session(), visitor))
+    return hits
+
+
+def test_track_many(make_tracker, collector):
+    wait_for_unsafe_threads()
+    pool = SenderPool(make_tracker(), processes=2)
+
+    results = pool.track_many(pageviews(10))
+
+    assert results == [StubCollector.GIF] * 10
+    assert sorted(hit['utmp'] for hit in collector.hits()) == sorted('/%d' % i for i in range(10))
+
+
+def test_refuses_to_fork_while_dispatcher_threads_run(make_tracker):
+    tracker = make_tracker(FireAndForget=True)
+    tracker.track_pageview(Page('/'), Session(), Visitor())
+    assert Dispatcher.for_config(tracker.config).join(5)
+
+    with pytest.raises(RuntimeError):
+        SenderPool(tracker, processes=2).track_many(pageviews(2))
+
+
+def test_workers_send_distinct_campaign_response_counts(make_tracker, make_transaction, collector):
+    from analytics.Campaign import Campaign
+
+    wait_for_unsafe_threads()
+    tracker = make_tracker()
+    tracker.campaign = Campaign(Campaign.TYPE_DIRECT)
+    tracker.campaign.setResponselen(5)
+    hits = pageviews(10)
+    hits.append((Tracker.HIT_TRANSACTION, make_transaction('order-1', ['a', 'b']), Session(), Visitor()))
+
+    SenderPool(tracker, processes=3).track_many(hits)
+
+    responses = [int(hit['utmcc'].split('__utmz=')[1].split('.')[3]) for hit in collector.hits()]
+    assert len(responses) == 13
+    assert len(set(responses)) == 13
+    assert min(responses) > 5
+    # The parent continues after every count the workers may have used
+    assert tracker.campaign.getResponselen() >= max(responses)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+import pytest
+
+from analytics.Campaign import Campaign
+from analytics.Session import Session
+from analytics.Visitor import Visitor
+from analytics.internals.compat import to_native
+
+
+# Whole seconds, as to_bytes() truncates times to them
+THEN = datetime(2011, 3, 13, 7, 6, 40)
+LATER = datetime(2011, 3, 14, 9, 0, 0)
+NOW = datetime(2011, 3, 20, 18, 30, 5)
+
+UNICODE = u'Café 日本 \U0001f600'
+
+
+def test_session_round_trip():
+    session = Session()
+    session.setSessionId(123456789)
+    session.setTracklen(42)
+    session.setStartTime(THEN)
+
+    restored = Session.from_bytes(session.to_bytes())
+
+    assert restored.getSessionId() == 123456789
+    assert restored.getTracklen() == 42
+    assert restored.getStartTime() == THEN
+
+
+def test_session_truncates_the_start_time_to_seconds():
+    session = Session()
+    session.setStartTime(THEN.replace(microsecond=999999))
+
+    assert Session.from_bytes(session.to_bytes()).getStartTime() == THEN
+
+
+@pytest.mark.parametrize('data', [b'', b'\x00', Session().to_bytes()[:-1], Session().to_bytes() + b'\x00'])
+def test_session_rejects_malformed_data(data):
+    with pytest.raises(ValueError):
+        Session.from_bytes(data)
+
+
+def campaign_fields(campaign):
+    return (campaign.getType(), campaign.getCreationTime(), campaign.getResponselen(), campaign.getId(),
+            campaign.getSource(), campaign.getGClickId(), campaign.getDClickId(), campaign.getName(),
+            campaign.getMedium(), campaign.getTerm(), campaign.getContent())
+
+
+def test_campaign_round_trip():
+    campaign = Campaign(Campaign.TYPE_REFERRAL)
+    campaign.setCreationTime(THEN)
+    campaign.setResponselen(7)
+    campaign.setId(1234)
+    campaign.setSource('www.example.com')
+    campaign.setGClickId('gclid-1')
+    campaign.setDClickId('dclid-1')
+    campaign.setName('Spring Sale')
+    campaign.setTerm('shoes')
+    campaign.setContent('banner')
+
+    restored = Campaign.from_bytes(campaign.to_bytes())
+
+    assert campaign_fields(restored) == campaign_fields(campaign)
+    assert restored.get_utmz_data() == campaign.get_utmz_data()
+
+
+def test_campaign_round_trip_with_unicode_empty_and_none_fields():
+    campaign = Campaign(Campaign.TYPE_DIRECT)
+    campaign.setCreationTime(THEN)
+    campaign.setName(UNICODE)
+    campaign.setTerm('')
+    campaign.setContent(None)
+
+    restored = Campaign.from_bytes(campaign.to_bytes())
+
+    assert restored.getName() == to_native(UNICODE)
+    assert restored.getTerm() == ''
+    assert restored.getContent() is None
+    assert restored.getId() is None
+    assert restored.getGClickId() is None
+    assert restored.getSource() == '(direct)'
+
+
+@pytest.mark.parametrize('data', [b'', b'\x00', Campaign(Campaign.TYPE_DIRECT).to_bytes()[:-1]])
+def test_campaign_rejects_malformed_data(data):
+    with pytest.raises(ValueError):
+        Campaign.from_bytes(data)
+
+
+def visitor_fields(visitor):
+    return (visitor.unique_id, visitor.first_visit_time, visitor.previous_visit_time, visitor.current_visit_time,
+            visitor.visit_count, visitor.ip_address, visitor.user_agent, visitor.locale, visitor.flash_version,
+            visitor.java_enabled, visitor.screen_color_depth, visitor.screen_resolution)
+
+
+def test_visitor_round_trip():
+    visitor = Visitor()
+    visitor.unique_id = 123456789
+    visitor.first_visit_time = THEN
+    visitor.previous_visit_time = LATER
+    visitor.current_visit_time = NOW
+    visitor.visit_count = 3
+    visitor.ip_address = '203.0.113.0'
+    visitor.user_agent = 'Mozilla/5.0 (X11; Linux x86_64)'
+    visitor.locale = 'de_DE'
+    visitor.flash_version = '9.0 r28'
+    visitor.java_enabled = False
+    visitor.screen_color_depth = 24
+    visitor.screen_resolution = '1920x1080'
+
+    restored = Visitor.from_bytes(visitor.to_bytes())
+
+    assert visitor_fields(restored) == visitor_fields(visitor)
+
+
+def test_visitor_round_trip_with_unicode_empty_and_none_fields():
+    visitor = Visitor()
+    visitor.first_visit_time = visitor.previous_visit_time = visitor.current_visit_time = THEN
+    visitor.user_agent = UNICODE
+    visitor.locale = ''
+
+    restored = Visitor.from_bytes(visitor.to_bytes())
+
+    assert restored.user_agent == to_native(UNICODE)
+    assert restored.locale == ''
+    assert restored.ip_address is None
+    assert restored.flash_version is None
+    assert restored.java_enabled is None
+    assert restored.screen_color_depth is None
+    assert restored.current_visit_time == THEN
+
+
+@pytest.mark.parametrize('data', [b'', b'\x00', Visitor().to_bytes()[:-1]])
+def test_visitor_rejects_malformed_data(data):
+    with pytest.raises(ValueError):
+        Visitor.from_bytes(data)
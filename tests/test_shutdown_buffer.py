@@ -0,0 +1,43 @@
+import time
+
+import pytest
+
+from analytics.Page import Page
+from analytics.Session import Session
+from analytics.Visitor import Visitor
+from analytics.internals.ShutdownBuffer import ShutdownBuffer
+
+
+@pytest.mark.parametrize('batch', [False, True])
+def test_flush_timeout_caps_request_timeouts(make_tracker, collector, batch):
+    buffer = ShutdownBuffer.instance()
+    stats = buffer.stats()
+    tracker = make_tracker(SendOnShutdown=True, BatchRequests=batch,
+                           ShutdownFlushTimeout=0.3, RequestTimeout=5)
+    tracker.track_pageview(Page('/page'), Session(), Visitor())
+
+    collector.latency = 2
+    started = time.time()
+    buffer.flush()
+
+    assert time.time() - started < 1
+    assert buffer.stats()['failed'] == stats['failed'] + 1
+
+
+@pytest.mark.parametrize('batch', [False, True])
+def test_flush_sends_buffered_requests(make_tracker, collector, batch):
+    buffer = ShutdownBuffer.instance()
+    stats = buffer.stats()
+    tracker = make_tracker(SendOnShutdown=True, BatchRequests=batch, BatchMaxHits=2)
+    session = Session()
+    visitor = Visitor()
+    for i in range(5):
+        tracker.track_pageview(Page('/%d' % i), session, visitor)
+    assert collector.hits() == []
+
+    buffer.flush()
+
+    assert sorted(hit['utmp'] for hit in collector.hits()) == ['/%d' % i for i in range(5)]
+    assert buffer.stats()['sent'] == stats['sent'] + 5
+    if batch:
+        assert collector.batches == 3
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from analytics.Page import Page
+from analytics.Session import Session
+from analytics.Visitor import Visitor
+from analytics.internals.Spool import Spool
+from analytics.internals.compat import urllib2
+
+from StubCollector import StubCollector
+
+
+def track_pageviews(tracker, count):
+    session = Session()
+    visitor = Visitor()
+    for i in range(count):
+        try:
+            tracker.track_pageview(Page('/%d' % i), session, visitor)
+        except urllib2.HTTPError:
+            pass
+
+
+def test_replay_resends_requests_that_failed_in_this_run(make_tracker, collector, tmpdir):
+    tracker = make_tracker(SpoolDirectory=str(tmpdir), SpoolSegmentSize=512, RetryMaxAttempts=1,
+                           CircuitBreakerThreshold=0)
+    spool = Spool.for_config(tracker.config)
+
+    collector.error_rate = 1
+    track_pageviews(tracker, 10)
+    assert spool.stats()['failed'] == 10
+    assert spool.stats()['segments'] > 1
+
+    collector.error_rate = 0
+    collector.reset()
+    assert spool.replay(tracker.config) == 10
+    assert sorted(hit['utmp'] for hit in collector.hits()) == ['/%d' % i for i in range(10)]
+
+    # Once everything got delivered, all but the current segment are deleted
+    assert spool.stats() == {'segments': 1, 'unacknowledged': 0, 'failed': 0, 'dropped': 0}
+    assert spool.replay(tracker.config) == 0
+
+
+def test_replay_resends_requests_of_a_previous_run(make_tracker, collector, tmpdir):
+    tracker = make_tracker(SpoolDirectory=str(tmpdir), SpoolReplayOnStartup=False,
+                           RetryMaxAttempts=1, CircuitBreakerThreshold=0)
+    collector.error_rate = 1
+    track_pageviews(tracker, 3)
+    Spool.for_config(tracker.config).close()
+
+    collector.error_rate = 0
+    collector.reset()
+    spool = Spool.for_config(tracker.config)
+    assert spool.stats()['failed'] == 3
+    assert spool.replay(tracker.config) == 3
+    assert spool.stats()['unacknowledged'] == 0
+    assert len(collector.hits()) == 3
+
+
+def test_requests_dropped_by_the_shutdown_buffer_are_discarded(make_tracker, collector, tmpdir):
+    tracker = make_tracker(SpoolDirectory=str(tmpdir), SendOnShutdown=True,
+                           ShutdownBufferMaxBytes=1)
+    track_pageviews(tracker, 3)
+
+    spool = Spool.for_config(tracker.config)
+    assert spool.stats() == {'segments': 1, 'unacknowledged': 0, 'failed': 0, 'dropped': 0}
+    assert spool.replay(tracker.config) == 0
+    assert collector.hits() == []
+
+
+def test_requests_failing_for_good_are_dropped(make_tracker, collector, tmpdir):
+    tracker = make_tracker(SpoolDirectory=str(tmpdir), CircuitBreakerThreshold=0)
+    collector.error_rate = 1
+    collector.error_status = 400
+    track_pageviews(tracker, 3)
+
+    spool = Spool.for_config(tracker.config)
+    assert spool.stats() == {'segments': 1, 'unacknowledged': 0, 'failed': 0, 'dropped': 3}
+    assert spool.replay(tracker.config) == 0
+
+
+def test_recovery_skips_torn_records(tmpdir):
+    record = json.dumps(Spool.serialize(urllib2.Request('http://127.0.0.1/__utm.gif?utmp=%2F')))
+    # "A\t12" is what is left of "A\t123\n" if the process dies while writing it
+    tmpdir.join('%s%010d%s' % (Spool.SEGMENT_PREFIX, 0, Spool.SEGMENT_SUFFIX)).write(
+        'H\t12\t%s\nH\t123\t%s\nA\t12' % (record, record))
+
+    spool = Spool(str(tmpdir))
+    try:
+        assert spool.stats()['failed'] == 2
+        assert spool.append(urllib2.Request('http://127.0.0.1/__utm.gif')) == 124
+    finally:
+        spool.close()
@@ -0,0 +1,210 @@
+import threading
+
+import pytest
+
+from analytics.Config import Config
+from analytics.Event import Event
+from analytics.Page import Page
+from analytics.Session import Session
+from analytics.SocialInteraction import SocialInteraction
+from analytics.Tracker import Tracker
+from analytics.Visitor import Visitor
+
+from StubCollector import StubCollector
+
+
+def test_track_many_sends_every_kind_of_hit(make_tracker, make_transaction, collector):
+    tracker = make_tracker()
+    session = Session()
+    visitor = Visitor()
+
+    results = tracker.track_many([
+        (Tracker.HIT_PAGEVIEW, Page('/page'), session, visitor),
+        (Tracker.HIT_EVENT, Event('category', 'action', 'label', 3), session, visitor),
+        (Tracker.HIT_TRANSACTION, make_transaction('order-1', ['a', 'b']), session, visitor),
+        (Tracker.HIT_SOCIAL, (SocialInteraction('network', 'like'), Page('/social')), session, visitor),
+    ])
+
+    assert results[0] == StubCollector.GIF
+    assert results[1] == StubCollector.GIF
+    assert results[2] == [StubCollector.GIF] * 3
+    assert results[3] == StubCollector.GIF
+
+    hits = collector.hits()
+    assert [hit.get('utmt') for hit in hits] == [None, 'event', 'tran', 'item', 'item', 'social']
+    assert hits[0]['utmp'] == '/page'
+    assert hits[0]['utmac'] == 'UA-1234567-8'
+    assert hits[1]['utme'] == '5(category*action*label)(3)'
+    assert hits[2]['utmtid'] == 'order-1'
+    assert sorted(hit['utmipc'] for hit in hits[3:5]) == ['a', 'b']
+    assert hits[5]['utmsid'] == '/social'
+
+    # Every request counts towards the session, in order
+    assert [int(hit['utms']) for hit in hits] == [1, 2, 3, 4, 5, 6]
+    assert session.getTracklen() == 6
+
+
+def test_track_many_isolates_failing_hits(make_tracker, collector):
+    tracker = make_tracker()
+    session = Session()
+    visitor = Visitor()
+
+    results = tracker.track_many([
+        (Tracker.HIT_EVENT, Event('category'), session, visitor),
+        (Tracker.HIT_PAGEVIEW, Page('/page'), session, visitor),
+    ])
+
+    assert isinstance(results[0], Event.ValidationError)
+    assert results[1] == StubCollector.GIF
+    assert len(collector.hits()) == 1
+
+
+def test_track_many_drops_hits_over_the_session_limit(make_tracker, collector):
+    tracker = make_tracker(SessionHitLimit=2, SessionLimitPolicy=Config.SESSION_LIMIT_DROP)
+    session = Session()
+    visitor = Visitor()
+
+    results = tracker.track_many([(Tracker.HIT_PAGEVIEW, Page('/%d' % i), session, visitor) for i in range(3)])
+
+    assert results == [StubCollector.GIF, StubCollector.GIF, None]
+    assert [hit['utmp'] for hit in collector.hits()] == ['/0', '/1']
+
+
+def test_track_many_raises_over_the_session_limit(make_tracker, collector):
+    tracker = make_tracker(SessionHitLimit=1, SessionLimitPolicy=Config.SESSION_LIMIT_RAISE)
+    session = Session()
+    visitor = Visitor()
+
+    results = tracker.track_many([(Tracker.HIT_PAGEVIEW, Page('/%d' % i), session, visitor) for i in range(2)])
+
+    assert results[0] == StubCollector.GIF
+    assert isinstance(results[1], Session.LimitExceededError)
+    assert [hit['utmp'] for hit in collector.hits()] == ['/0']
+
+
+def test_track_many_rolls_sessions_over_the_session_limit(make_tracker, collector):
+    tracker = make_tracker(SessionHitLimit=2, SessionLimitPolicy=Config.SESSION_LIMIT_ROLLOVER)
+    session = Session()
+    session_id = session.getSessionId()
+    visitor = Visitor()
+    visit_count = visitor.visit_count
+
+    results = tracker.track_many([(Tracker.HIT_PAGEVIEW, Page('/%d' % i), session, visitor) for i in range(3)])
+
+    assert results == [StubCollector.GIF] * 3
+    # The third request is the first of a new session
+    assert [int(hit['utms']) for hit in collector.hits()] == [1, 2, 1]
+    assert session.getSessionId() != session_id
+    assert session.getTracklen() == 1
+    assert visitor.visit_count == visit_count + 1
+
+
+def test_track_transaction(make_tracker, make_transaction, collector):
+    tracker = make_tracker()
+
+    tracker.track_transaction(make_transaction('order-2', ['a', 'b', 'c']), Session(), Visitor())
+
+    hits = collector.hits()
+    # The transaction request is sent first, its items concurrently afterwards
+    assert hits[0]['utmt'] == 'tran'
+    assert sorted(hit['utmipc'] for hit in hits[1:]) == ['a', 'b', 'c']
+    assert set(hit['utmtid'] for hit in hits) == set(['order-2'])
+
+
+def test_track_transaction_skips_items_when_the_transaction_fails(make_tracker, make_transaction, collector):
+    from analytics.internals.compat import urllib2
+
+    tracker = make_tracker()
+    collector.error_rate = 1
+
+    with pytest.raises(urllib2.HTTPError):
+        tracker.track_transaction(make_transaction('order-5', ['a', 'b', 'c']), Session(), Visitor())
+
+    assert collector.stats()['requests'] == 1
+    assert collector.stats()['errors'] == 1
+
+
+def test_track_transaction_reports_failures_after_sending_everything(make_tracker, make_transaction, collector):
+    from analytics.internals.compat import urllib2
+
+    tracker = make_tracker(TransactionOrder=Config.TRANSACTION_ORDER_NONE)
+    collector.error_rate = 1
+
+    with pytest.raises(urllib2.HTTPError):
+        tracker.track_transaction(make_transaction('order-6', ['a', 'b', 'c']), Session(), Visitor())
+
+    # Without an order, the items are sent along with the transaction
+    assert collector.stats()['requests'] == 4
+
+
+def record_dispatch_threads(monkeypatch):
+    from analytics.internals.requests.HttpRequest import HttpRequest
+
+    names = []
+    dispatch = HttpRequest.dispatch
+    def recording_dispatch(config, request):
+        names.append(threading.current_thread().name)
+        return dispatch(config, request)
+
+    monkeypatch.setattr(HttpRequest, 'dispatch', staticmethod(recording_dispatch))
+    return names
+
+
+def test_track_transaction_sends_items_concurrently(make_tracker, make_transaction, monkeypatch):
+    names = record_dispatch_threads(monkeypatch)
+    tracker = make_tracker(TransactionConcurrency=4)
+
+    tracker.track_transaction(make_transaction('order-3', ['a', 'b', 'c', 'd']), Session(), Visitor())
+
+    assert len(names) == 5
+    assert any(name.startswith('analytics-transaction-') for name in names)
+
+
+def test_track_transaction_only_enqueues_when_batching(make_tracker, make_transaction, monkeypatch):
+    names = record_dispatch_threads(monkeypatch)
+    tracker = make_tracker(TransactionConcurrency=4, BatchRequests=True)
+
+    tracker.track_transaction(make_transaction('order-4', ['a', 'b', 'c', 'd']), Session(), Visitor())
+
+    assert names == [threading.current_thread().name] * 5
+
+
+def test_concurrent_hits_of_a_shared_session_send_consistent_counters():
+    from analytics.Campaign import Campaign
+    from analytics.internals.compat import request_selector, urlparse
+
+    requests = []
+    config = Config({'EndPointHost': None, 'SessionHitLimit': None})
+    config.setLoggingCallback(lambda request, response: requests.append(request))
+    tracker = Tracker('UA-1234567-8', 'www.example.com', config)
+    tracker.campaign = Campaign(Campaign.TYPE_DIRECT)
+    session = Session()
+    visitor = Visitor()
+
+    threads_count, hits_per_thread = 8, 100
+    barrier = threading.Event()
+    def track():
+        barrier.wait()
+        for i in range(hits_per_thread):
+            tracker.track_pageview(Page('/page'), session, visitor)
+
+    threads = [threading.Thread(target=track) for i in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    barrier.set()
+    for thread in threads:
+        thread.join()
+
+    total = threads_count * hits_per_thread
+    utms, utmb, responses = [], [], []
+    for request in requests:
+        parameters = dict(urlparse.parse_qsl(request_selector(request).partition('?')[2]))
+        cookies = dict(cookie.rstrip(';').split('=', 1) for cookie in parameters['utmcc'].split('+'))
+        utms.append(int(parameters['utms']))
+        utmb.append(int(parameters['__utmb'].split('.')[1]))
+        responses.append(int(cookies['__utmz'].split('.')[3]))
+
+    # Every hit sends the counts it incremented itself, each exactly once
+    assert sorted(utms) == list(range(1, total + 1))
+    assert utmb == utms
+    assert sorted(responses) == list(range(1, total + 1))
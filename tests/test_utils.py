@@ -0,0 +1,112 @@
+import pytest
+
+from analytics.Campaign import Campaign
+from analytics.Visitor import Visitor
+from analytics.internals import utils
+
+
+def test_unpack_strings_round_trip():
+    data = b'xx' + utils.pack_strings(['a', None, '', u'\xe4'])
+    values, offset = utils.unpack_strings(data, 2, 4)
+    assert values[:3] == ['a', None, '']
+    assert offset == len(data)
+
+
+def test_unpack_strings_raises_value_error_on_truncated_data():
+    data = utils.pack_strings(['abc', None, 'de'])
+    for length in range(len(data)):
+        with pytest.raises(ValueError):
+            utils.unpack_strings(data[:length], 0, 3)
+
+
+@pytest.mark.parametrize('make', [
+    lambda: Campaign(Campaign.TYPE_DIRECT),
+    lambda: Visitor(),
+])
+def test_from_bytes_raises_value_error_on_truncated_data(make):
+    instance = make()
+    data = instance.to_bytes()
+    for length in range(1, len(data)):
+        with pytest.raises(ValueError):
+            type(instance).from_bytes(data[:length])
+
+
+def random_strings(count, seed):
+    import random
+    rng = random.Random(seed)
+    alphabet = u'abcXYZ019 .-_/?&=%\xe4\xdf\u20ac\u4e2d\U0001f600'
+    strings = [u''.join(rng.choice(alphabet) for i in range(rng.randint(0, 80))) for i in range(count)]
+    # Long and single character strings stress the length ordering
+    return strings + [u'x' * 1000, u'a', u'', u'\U0001f600' * 3]
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_generate_hash_many_is_bit_exact(monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(utils, 'numpy', None)
+
+    strings = random_strings(2000, 9)
+    strings += [string.encode('utf-8') for string in strings[:500]]
+
+    assert utils.generate_hash_many(strings) == [utils._generate_hash(string) for string in strings]
+    assert utils.generate_hash_many([]) == []
+
+
+def old_quote(value):
+    """
+    urllib.quote() of Python 2, which the encoding used to be built on.
+    Python 3 leaves "~" alone, Python 2 escaped it.
+    """
+    try:
+        from urllib import quote
+        return quote(value)
+    except ImportError:
+        from urllib.parse import quote
+        return quote(value, safe='/').replace('~', '%7E')
+
+
+def old_urlencode(parameters):
+    try:
+        from urllib import urlencode
+        return urlencode(parameters)
+    except ImportError:
+        from urllib.parse import urlencode
+        return urlencode(parameters).replace('~', '%7E')
+
+
+def random_bytes(rng, max_length=40):
+    return bytes(bytearray(rng.randint(0, 255) for i in range(rng.randint(0, max_length))))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_encode_uri_component_matches_quote_and_replace_all(seed):
+    import random
+    rng = random.Random(seed)
+
+    for i in range(2000):
+        value = random_bytes(rng)
+        expected = utils.convert_to_uri_component_encoding(old_quote(value))
+        assert utils.encode_uri_component(value) == expected
+        # Text is encoded as UTF-8
+        text = value.decode('latin-1')
+        assert utils.encode_uri_component(text) == utils.encode_uri_component(text.encode('utf-8'))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_build_query_string_matches_urlencode_and_replace_all(seed):
+    import random
+    rng = random.Random(seed)
+
+    for i in range(500):
+        parameters = [(random_bytes(rng, 8) or b'k', random_bytes(rng)) for j in range(rng.randint(1, 8))]
+        parameters.append((b'utmn', rng.getrandbits(32)))
+        expected = utils.convert_to_uri_component_encoding(old_urlencode(parameters))
+        assert utils.build_query_string(parameters) == expected
+
+
+def test_encode_leaves_safe_values_alone():
+    assert utils.encode_uri_component('Ab0_.-!*\'()/') == 'Ab0_.-!*\'()/'
+    assert utils.encode_query_component('a b/c~') == 'a+b%2Fc%7E'
+    assert utils.encode_uri_component(u'\xe4 ') == '%C3%A4%20'
@@ -0,0 +1,43 @@
+from analytics.Visitor import Visitor
+
+
+def test_parse_accept_language_picks_the_highest_quality():
+    assert Visitor.parse_accept_language('de-DE') == 'de_DE'
+    assert Visitor.parse_accept_language('en;q=0.5, de-DE;q=0.8, fr;q=0.7') == 'de_DE'
+    assert Visitor.parse_accept_language('en-US, de;q=0.9') == 'en_US'
+    # Without a q-value, a range has the quality 1
+    assert Visitor.parse_accept_language('fr;q=0.9, en') == 'en'
+
+
+def test_parse_accept_language_keeps_the_first_range_on_ties():
+    assert Visitor.parse_accept_language('fr;q=0.5, de;q=0.5') == 'fr'
+    assert Visitor.parse_accept_language('fr , de') == 'fr'
+
+
+def test_parse_accept_language_allows_alphanumeric_subtags():
+    assert Visitor.parse_accept_language('es-419, es;q=0.9') == 'es_419'
+    assert Visitor.parse_accept_language('zh-Hant-TW') == 'zh_Hant_TW'
+
+
+def test_parse_accept_language_skips_malformed_ranges():
+    # Digits in the primary subtag, overlong subtags, empty subtags, the wildcard
+    assert Visitor.parse_accept_language('419, de;q=0.1') == 'de'
+    assert Visitor.parse_accept_language('abcdefghi, de;q=0.1') == 'de'
+    assert Visitor.parse_accept_language('en-, -US, en--US, *, de;q=0.1') == 'de'
+    assert Visitor.parse_accept_language('en_US, de;q=0.1') == 'de'
+
+
+def test_parse_accept_language_skips_malformed_quality_values():
+    assert Visitor.parse_accept_language('en;q=abc, de;q=0.1') == 'de'
+    assert Visitor.parse_accept_language('en;q=1.5, de;q=0.1') == 'de'
+    assert Visitor.parse_accept_language('en;q=-0.5, de;q=0.1') == 'de'
+    assert Visitor.parse_accept_language('en;level=1, de;q=0.1') == 'de'
+    # Not acceptable at all
+    assert Visitor.parse_accept_language('en;q=0, de;q=0.1') == 'de'
+    assert Visitor.parse_accept_language('en;q=0') is None
+
+
+def test_parse_accept_language_without_any_valid_range():
+    assert Visitor.parse_accept_language('') is None
+    assert Visitor.parse_accept_language(' , ;q=1') is None
+    assert Visitor.parse_accept_language('*') is None
@@ -0,0 +1,58 @@
+import pytest
+
+from analytics.VisitorBatch import VisitorBatch
+
+
+VALID = '1.123.1300000000.1300000100.1300000200.3'
+INVALID = [
+    '-1.123.1300000000.1300000100.1300000200.3',
+    '1.123.1300000000.1300000100.1300000200.-3',
+    '1.123.%d.1300000100.1300000200.3' % (VisitorBatch.SIGNED_MAX + 1),
+    '%d.123.1300000000.1300000100.1300000200.3' % (VisitorBatch.UNSIGNED_MAX + 1),
+    '1.-123.1300000000.1300000100.1300000200.3',
+    '1.123.x.1300000100.1300000200.3',
+    '1.123.1300000000',
+]
+
+
+@pytest.mark.parametrize('value', INVALID)
+def test_out_of_range_values_raise_value_error(value):
+    with pytest.raises(ValueError):
+        VisitorBatch.from_utma_many([value])
+
+
+def test_skipped_values_keep_the_columns_aligned():
+    batch = VisitorBatch.from_utma_many([VALID] + INVALID + [VALID], skip_invalid=True)
+
+    assert len(batch) == 2
+    assert batch.invalid == len(INVALID)
+    columns = [batch.domain_hashes, batch.unique_ids, batch.first_visit_times,
+               batch.previous_visit_times, batch.current_visit_times, batch.visit_counts]
+    assert [len(column) for column in columns] == [2] * 6
+    assert batch[1].visit_count == 3
+
+
+@pytest.mark.parametrize('value', [None, 1300000000, object()])
+def test_values_that_are_no_strings_raise_value_error(value):
+    with pytest.raises(ValueError):
+        VisitorBatch.from_utma_many([value])
+
+
+def test_values_that_are_no_strings_are_skipped():
+    batch = VisitorBatch.from_utma_many([None, VALID, 42, [VALID]], skip_invalid=True)
+
+    assert len(batch) == 1
+    assert batch.invalid == 3
+
+
+def test_slices_return_a_batch_of_the_selected_rows():
+    values = ['1.%d.1300000000.1300000100.1300000200.%d' % (i, i + 1) for i in range(5)]
+    batch = VisitorBatch.from_utma_many(values)
+
+    rows = batch[1:4]
+    assert isinstance(rows, VisitorBatch)
+    assert len(rows) == 3
+    assert [visitor.unique_id for visitor in rows] == [1, 2, 3]
+    assert list(rows.visit_counts) == [2, 3, 4]
+    assert [visitor.unique_id for visitor in batch[::-2]] == [4, 2, 0]
+    assert len(batch[5:]) == 0
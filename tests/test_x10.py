@@ -0,0 +1,19 @@
+from analytics.internals.X10 import X10
+
+
+def render(value):
+    x10 = X10()
+    x10.setKey(5, 1, 'key')
+    x10.setValue(5, 1, value)
+    return x10.renderUrlString()
+
+
+def test_equal_values_of_different_types_are_not_conflated():
+    assert render(1) == '5(key)(1)'
+    assert render(1.0) == '5(key)(1.0)'
+    assert render(True) == '5(key)(True)'
+    assert render(1) == '5(key)(1)'
+
+
+def test_values_are_escaped():
+    assert render("it's (*!)") == "5(key)(it'0s ('2'3'1)"
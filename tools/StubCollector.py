@@ -0,0 +1,390 @@
+
+
+""" 
+Generic Server-Side Google Analytics PHP Client
+
+This library is free software you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License (LGPL) as published by the Free Software Foundation either
+version 3 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA.
+
+Google Analytics is a registered trademark of Google Inc.
+
+@link      http://code.google.com/p/php-ga
+
+@license   http://www.gnu.org/licenses/lgpl.html
+@author    Thomas Bachem <tb@unitedprototype.com>
+@copyright Copyright (c) 2010 United Prototype GmbH (http://unitedprototype.com)
+"""
+
+import collections
+import logging
+import random
+import socket
+import struct
+import threading
+import time
+
+from analytics.internals.compat import BaseHTTPServer, SocketServer, to_native, urlparse
+
+
+logger = logging.getLogger(__name__)
+
+
+class StubCollector(object):
+    """ 
+    Minimal stand-in for the Google Analytics collector, serving the
+    "/__utm.gif" endpoint (GET and POST) and the batch endpoint on localhost,
+    for load tests and offline development. Point Config.endPointHost at
+    StubCollector.endpoint_host to have requests actually go over the network
+    instead of setting it to None.
+
+    Every hit of a successful request is decoded into a dict of its query
+    parameters and recorded. Failures can be injected: a share of the
+    requests may be answered with an error status or by resetting the
+    connection, and every response can be delayed.
+
+    Usage:
+        with StubCollector(latency=0.01, error_rate=0.05) as collector:
+            config = Config({'EndPointHost': collector.endpoint_host})
+            ...
+            print(collector.stats())
+
+    Or standalone, e.g. for a tracker running in another process:
+        PYTHONPATH=src python tools/StubCollector.py --port 8080
+
+    Not part of the analytics package, tests and benchmarks put tools/ on
+    sys.path to import it.
+
+    @ivar latency:
+        Seconds every response is delayed by, or a (min, max) tuple to delay
+        by a random amount within
+
+    @ivar error_rate:
+        Share of requests (0 to 1) answered with error_status
+
+    @ivar error_status:
+        HTTP status code of injected errors
+
+    @ivar reset_rate:
+        Share of requests (0 to 1) answered by resetting the connection
+
+    @ivar max_recorded:
+        Amount of the most recent hits kept in hits(), None to keep all
+    """
+
+    # Same 1x1 transparent GIF the Google Analytics collector returns
+    GIF = b'GIF89a\x01\x00\x01\x00\x80\xff\x00\xff\xff\xff\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0, error_rate=0, error_status=500,
+                 reset_rate=0, endpoint_path='/__utm.gif', batch_endpoint_path='/batch',
+                 max_recorded=100000, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reset_rate = reset_rate
+        self.endpoint_path = endpoint_path
+        self.batch_endpoint_path = batch_endpoint_path
+        self.max_recorded = max_recorded
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._hits = collections.deque(maxlen=max_recorded)
+        self._server = None
+        self._thread = None
+
+        self.reset()
+
+
+    @property
+    def endpoint_host(self):
+        """ 
+        "host:port" to use as Config.endPointHost, only available once started.
+
+        @rtype string
+        """
+        return '%s:%d' % (self.host, self.port)
+
+
+    @property
+    def server_address(self):
+        """ 
+        (host, port) the socket is bound to, only available once bound.
+
+        @rtype tuple
+        """
+        return self._server.server_address
+
+
+    def bind(self):
+        """ 
+        Binds the socket, on a free port if none was given, without serving yet.
+
+        @rtype StubCollector
+        """
+        if self._server is None:
+            self._server = _Server((self.host, self.port), _Handler)
+            self._server.collector = self
+            self.port = self._server.server_address[1]
+        return self
+
+
+    def start(self):
+        """ 
+        Starts serving in a background thread, on a free port if none was given.
+
+        @rtype StubCollector
+        """
+        self.bind()
+        self._thread = threading.Thread(target=self._server.serve_forever, name='analytics-stub-collector')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
+
+
+    def __enter__(self):
+        return self.start()
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+    def serve_forever(self):
+        """ 
+        Serves in the calling thread until interrupted.
+        """
+        self.bind()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self._server = None
+
+
+    def reset(self):
+        """ 
+        Forgets all recorded hits and sets all counters back to zero.
+        """
+        with self._lock:
+            self._hits.clear()
+            self.requests = 0
+            self.gets = 0
+            self.posts = 0
+            self.batches = 0
+            self.hit_count = 0
+            self.errors = 0
+            self.resets = 0
+            self.not_found = 0
+            self.bytes_received = 0
+
+
+    def hits(self):
+        """ 
+        @return list Recorded hits, oldest first, as dicts of their parameters
+        """
+        with self._lock:
+            return list(self._hits)
+
+
+    def _get_delay(self):
+        if isinstance(self.latency, tuple):
+            with self._lock:
+                return self._random.uniform(*self.latency)
+
+        return self.latency
+
+
+    def _choose_failure(self):
+        """ 
+        @return string|None "reset", "error" or None for a successful response
+        """
+        if not self.reset_rate and not self.error_rate:
+            return None
+
+        with self._lock:
+            chance = self._random.random()
+
+        if chance < self.reset_rate:
+            return 'reset'
+        if chance < self.reset_rate + self.error_rate:
+            return 'error'
+        return None
+
+
+    def handle(self, handler, method):
+        """ 
+        Answers a single request, called by the request handler threads.
+
+        @param BaseHTTPServer.BaseHTTPRequestHandler handler
+        @param string method "GET" or "POST"
+        """
+        path, _, query = handler.path.partition('?')
+
+        body = ''
+        if method == 'POST':
+            body = to_native(handler.rfile.read(int(handler.headers.get('Content-Length') or 0)))
+
+        if path == self.endpoint_path:
+            payloads = [body if method == 'POST' else query]
+        elif path == self.batch_endpoint_path and method == 'POST':
+            payloads = [payload for payload in body.split('\n') if payload]
+        else:
+            payloads = None
+
+        failure = self._choose_failure() if payloads is not None else None
+
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += len(handler.path) + len(body)
+            if method == 'POST':
+                self.posts += 1
+            else:
+                self.gets += 1
+
+            if payloads is None:
+                self.not_found += 1
+            elif failure == 'reset':
+                self.resets += 1
+            elif failure == 'error':
+                self.errors += 1
+            else:
+                if path == self.batch_endpoint_path:
+                    self.batches += 1
+                self.hit_count += len(payloads)
+                for payload in payloads:
+                    self._hits.append(dict(urlparse.parse_qsl(payload, keep_blank_values=True)))
+
+        delay = self._get_delay()
+        if delay:
+            time.sleep(delay)
+
+        if payloads is None:
+            handler.send_response(404)
+            handler.send_header('Content-Length', '0')
+            handler.end_headers()
+        elif failure == 'reset':
+            # Closing with a zero linger time makes the kernel send a RST instead of a FIN
+            handler.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            handler.close_connection = 1
+            handler.server.reset_requests.add(handler.connection)
+        elif failure == 'error':
+            handler.send_response(self.error_status)
+            handler.send_header('Content-Length', '0')
+            handler.end_headers()
+        else:
+            handler.send_response(200)
+            handler.send_header('Content-Type', 'image/gif')
+            handler.send_header('Content-Length', str(len(StubCollector.GIF)))
+            handler.send_header('Cache-Control', 'private, no-cache, no-cache=Set-Cookie, proxy-revalidate')
+            handler.end_headers()
+            handler.wfile.write(StubCollector.GIF)
+
+
+    def stats(self):
+        """ 
+        @return dict Counters of requests (in total, GET, POST and batch),
+                     recorded hits, injected errors and connection resets,
+                     requests to unknown paths and bytes received
+        """
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'gets': self.gets,
+                'posts': self.posts,
+                'batches': self.batches,
+                'hits': self.hit_count,
+                'errors': self.errors,
+                'resets': self.resets,
+                'not_found': self.not_found,
+                'bytes_received': self.bytes_received,
+            }
+
+
+
+class _Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, handler):
+        BaseHTTPServer.HTTPServer.__init__(self, address, handler)
+        self.collector = None
+        self.reset_requests = set()
+
+
+    def shutdown_request(self, request):
+        # Skips the graceful shutdown(SHUT_WR), which would send a FIN before the RST
+        if request in self.reset_requests:
+            self.reset_requests.discard(request)
+            self.close_request(request)
+        else:
+            BaseHTTPServer.HTTPServer.shutdown_request(self, request)
+
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    # Keep-alive, so ConnectionPool gets exercised
+    protocol_version = 'HTTP/1.1'
+
+    # Write the response in one go instead of one segment per header line,
+    # which would stall keep-alive clients on delayed ACKs
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.collector.handle(self, 'GET')
+
+
+    def do_POST(self):
+        self.server.collector.handle(self, 'POST')
+
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serves a stub Google Analytics collector.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0, help='Seconds to delay every response by')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of requests to fail with --error-status')
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--reset-rate', type=float, default=0, help='Share of requests to reset the connection of')
+    args = parser.parse_args()
+
+    collector = StubCollector(args.host, args.port, args.latency, args.error_rate,
+                              args.error_status, args.reset_rate)
+    collector.bind()
+    print('Serving on %s:%d, use it as Config.endPointHost' % collector.server_address)
+    try:
+        collector.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(collector.stats())